@@ -0,0 +1,22 @@
+"""
+Timing helpers shared by the benchmarks.
+"""
+
+import time
+
+
+def measure(func, count: int) -> list:
+    """
+    Measure the latency of repeated calls of a function.
+
+    :param func: the function to call, it gets the number of the call as argument
+    :param count: the number of calls
+    :return: the latencies of the calls in seconds
+    """
+
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - start)
+    return latencies
@@ -0,0 +1,77 @@
+"""
+Benchmark of the per-request latency of the DuckDNS API calls with and without connection reuse.
+
+A local HTTP stub answers the update requests, so the benchmark runs offline and only measures the client overhead
+(connection setup, request and response handling). Usage:
+
+    python -m benchmarks.session_reuse [--requests N]
+"""
+
+import argparse
+import statistics
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from benchmarks._timing import measure
+from certbot_dns_duckdns.duckdns.client import DuckDNSClient
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        body = b"OK"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+def _summary(latencies: list) -> str:
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    p95 = latencies_ms[int(len(latencies_ms) * 0.95) - 1]
+    return (
+        f"mean {statistics.mean(latencies_ms):.3f} ms, "
+        f"median {statistics.median(latencies_ms):.3f} ms, "
+        f"p95 {p95:.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/update"
+
+    def without_reuse(i):
+        # the previous behavior: a bare request with a new connection every time
+        params = {"token": "token", "domains": "example.duckdns.org", "txt": str(i)}
+        requests.get(url=url, params=params, timeout=10)
+
+    with DuckDNSClient("token", base_url=url) as client:
+
+        def with_reuse(i):
+            client.set_txt_record("example.duckdns.org", str(i))
+
+        print(
+            f"without connection reuse: {_summary(measure(without_reuse, args.requests))}"
+        )
+        print(
+            f"with connection reuse:    {_summary(measure(with_reuse, args.requests))}"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
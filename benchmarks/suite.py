@@ -0,0 +1,317 @@
+"""
+Benchmark suite of the hot paths of the plugin, run offline against the local DuckDNS emulator.
+
+The results are written as JSON, so they can be compared between releases. Usage:
+
+    python -m benchmarks.suite [--output results.json] [--cycle-sizes 1 10 1000]
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from unittest import mock
+
+from certbot.configuration import NamespaceConfig
+from certbot.display import util as display_util
+
+from benchmarks._timing import measure
+from certbot_dns_duckdns import __version__
+from certbot_dns_duckdns.cert.client import Authenticator, get_duckdns_domain
+from certbot_dns_duckdns.duckdns.client import (
+    DuckDNSClient,
+    classify_domain,
+    classify_domains,
+    is_valid_duckdns_domain,
+    is_valid_full_duckdns_domain,
+)
+from certbot_dns_duckdns.emulator import DuckDNSEmulator
+
+TOKEN = "benchmark-token"
+PLUGIN_MODULE = "certbot_dns_duckdns.cert.client"
+# modules certbot has already imported when it loads the plugin entry point
+CERTBOT_MODULES = [
+    "certbot.errors",
+    "certbot.display.util",
+    "certbot.plugins.dns_common",
+]
+VALIDATION_DOMAINS = [
+    "example.duckdns.org",
+    "sub.example.duckdns.org",
+    "a.b.c.example.duckdns.org",
+    "example",
+    "example.com",
+    "-123ad-sdas--45-as-.example.duckdns.org",
+    "$invalid",
+    "test.duckdns.com",
+]
+
+
+def _latency_result(latencies: list) -> dict:
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    return {
+        "unit": "ms",
+        "count": len(latencies_ms),
+        "mean": statistics.mean(latencies_ms),
+        "median": statistics.median(latencies_ms),
+        "p95": latencies_ms[max(int(len(latencies_ms) * 0.95) - 1, 0)],
+        "max": latencies_ms[-1],
+    }
+
+
+def measure_import(module: str, preload: list = None) -> dict:
+    """
+    Measure the import of a module in a fresh interpreter with "-X importtime".
+
+    :param module: the module to import
+    :param preload: modules imported before the measured module, their import time is not included
+
+    :return: mapping of every module imported by the measured module to its cumulative import time in microseconds
+    """
+
+    imports = "".join(f"import {name}; " for name in preload or [])
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{imports}import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+
+    # every line is written when an import finishes, so the modules imported by the measured module are listed
+    # after the preloaded modules and end with the measured module itself
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        name = name.strip()
+        if name in (preload or []):
+            modules = []
+        else:
+            modules.append((name, int(cumulative)))
+        if name == module:
+            break
+
+    return dict(modules)
+
+
+def bench_import() -> dict:
+    """
+    Measure the import time of the plugin entry point on top of the already imported certbot modules.
+    """
+
+    modules = measure_import(PLUGIN_MODULE, CERTBOT_MODULES)
+    return {"unit": "us", "value": modules[PLUGIN_MODULE], "modules": len(modules)}
+
+
+def bench_validation(iterations: int) -> dict:
+    """
+    Measure the throughput of the domain validation functions.
+    """
+
+    results = {}
+    for func in (is_valid_duckdns_domain, is_valid_full_duckdns_domain):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for domain in VALIDATION_DOMAINS:
+                func(domain)
+        duration = time.perf_counter() - start
+        results[func.__name__] = {
+            "unit": "calls/s",
+            "value": iterations * len(VALIDATION_DOMAINS) / duration,
+        }
+
+    # a large SAN list of distinct names, classified without warm cache
+    domains = [
+        f"host{i}.{domain}" for i in range(iterations) for domain in VALIDATION_DOMAINS
+    ]
+    classify_domain.cache_clear()
+    start = time.perf_counter()
+    classify_domains(domains)
+    duration = time.perf_counter() - start
+    results["classify_domains"] = {"unit": "calls/s", "value": len(domains) / duration}
+
+    return results
+
+
+def bench_client(emulator: DuckDNSEmulator, requests: int) -> dict:
+    """
+    Measure the per-request latency of the DuckDNSClient.
+    """
+
+    with DuckDNSClient(TOKEN, base_url=emulator.api_url) as client:
+        set_latencies = measure(
+            lambda i: client.set_txt_record("domain0.duckdns.org", f"value{i}"),
+            requests,
+        )
+        clear_latencies = measure(
+            lambda i: client.clear_txt_record("domain0.duckdns.org"), requests
+        )
+
+    return {
+        "set_txt_record": _latency_result(set_latencies),
+        "clear_txt_record": _latency_result(clear_latencies),
+    }
+
+
+def _config(work_dir: str, emulator: DuckDNSEmulator) -> NamespaceConfig:
+    return NamespaceConfig(
+        argparse.Namespace(
+            duckdns_token=TOKEN,
+            duckdns_no_txt_restore=False,
+            duckdns_api_url=emulator.api_url,
+            duckdns_propagation_seconds=0,
+            config_dir=work_dir,
+            work_dir=work_dir,
+            logs_dir=work_dir,
+            http01_port=80,
+            https_port=443,
+            domains=[],
+        )
+    )
+
+
+def bench_resolution(emulator: DuckDNSEmulator, lookups: int) -> dict:
+    """
+    Measure the latency of the duckdns domain resolution of delegated domains without the delegation cache and
+    with the warm delegation cache of an authenticator.
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir, emulator.default_resolver():
+        config = _config(work_dir, emulator)
+
+        cold_latencies = measure(
+            lambda i: get_duckdns_domain(f"delegated{i}.example.com"), lookups
+        )
+
+        authenticator = Authenticator(config, name="duckdns")
+        for i in range(lookups):
+            authenticator._get_duckdns_domain(f"delegated{i}.example.com")
+        warm_latencies = measure(
+            lambda i: authenticator._get_duckdns_domain(f"delegated{i}.example.com"),
+            lookups,
+        )
+
+    return {
+        "uncached": _latency_result(cold_latencies),
+        "cached": _latency_result(warm_latencies),
+    }
+
+
+def _achall(domain: str, validation: str):
+    achall = mock.Mock()
+    achall.identifier.value = domain
+    achall.validation_domain_name.return_value = f"_acme-challenge.{domain}"
+    achall.validation.return_value = validation
+    return achall
+
+
+def bench_cycle(emulator: DuckDNSEmulator, size: int) -> dict:
+    """
+    Measure a full perform and cleanup cycle of the authenticator for a number of domains.
+    """
+
+    achalls = [_achall(f"domain{i}.duckdns.org", f"validation{i}") for i in range(size)]
+
+    with (
+        tempfile.TemporaryDirectory() as work_dir,
+        emulator.default_resolver(),
+        mock.patch.object(display_util, "notify"),
+    ):
+        authenticator = Authenticator(_config(work_dir, emulator), name="duckdns")
+
+        start = time.perf_counter()
+        authenticator.perform(achalls)
+        perform_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        authenticator.cleanup(achalls)
+        cleanup_duration = time.perf_counter() - start
+
+    return {
+        "unit": "s",
+        "domains": size,
+        "perform": perform_duration,
+        "cleanup": cleanup_duration,
+        "total": perform_duration + cleanup_duration,
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    """
+    Run all benchmarks.
+
+    :param args: the parsed command line arguments
+    :return: the benchmark results
+    """
+
+    max_size = max(args.cycle_sizes + [1])
+    delegations = {
+        f"_acme-challenge.delegated{i}.example.com": f"domain{i % max_size}.duckdns.org"
+        for i in range(args.lookups)
+    }
+
+    results = {
+        "import": bench_import(),
+        "validation": bench_validation(args.iterations),
+    }
+
+    with DuckDNSEmulator(
+        TOKEN,
+        [f"domain{i}" for i in range(max_size)],
+        delegations=delegations,
+    ) as emulator:
+        results["client"] = bench_client(emulator, args.requests)
+        results["resolution"] = bench_resolution(emulator, args.lookups)
+        results["cycle"] = {
+            str(size): bench_cycle(emulator, size) for size in args.cycle_sizes
+        }
+
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "results": results,
+    }
+
+
+def main(argv: list = None) -> None:
+    """
+    Run the benchmark suite and write the results as JSON.
+
+    :param argv: the command line arguments without the program name
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.suite",
+        description="Benchmark suite of the hot paths of the plugin.",
+    )
+    parser.add_argument(
+        "--output", help="file for the JSON results, stdout if not provided"
+    )
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--cycle-sizes", type=int, nargs="+", default=[1, 10, 1000])
+    args = parser.parse_args(argv)
+
+    results = run(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+This module provides a persistent cache for the duckdns.org subdomains that delegated acme challenges point to and a
+cache of the DNS lookups shared by the certbot processes of a host.
+"""
+
+import logging
+import os
+import time
+
+from certbot_dns_duckdns.cert.storage import JSONFileStore
+
+DELEGATION_CACHE_FILE_NAME = "delegations.json"
+SHARED_CACHE_FILE_NAME = "cache.sqlite"
+DEFAULT_SHARED_CACHE_TIMEOUT = 10.0
+
+logger = logging.getLogger(__name__)
+
+
+class DelegationCache(JSONFileStore):
+    """
+    Cache of the delegation targets of domains, stored as JSON file. Every entry expires after the TTL of the
+    resolved CNAME records.
+    """
+
+    def get(self, domain: str):
+        """
+        Get the cached delegation target of a domain.
+
+        :param domain: the delegating domain
+
+        :return: the delegation target or None if the domain is not cached or the entry is expired
+        """
+
+        entry = self._load().get(domain)
+        if entry is None or entry["expires"] <= time.time():
+            return None
+
+        return entry["target"]
+
+    def set(self, domain: str, target: str, ttl: int) -> None:
+        """
+        Store the delegation target of a domain.
+
+        :param domain: the delegating domain
+        :param target: the duckdns.org subdomain the domain delegates to
+        :param ttl: the number of seconds the entry is valid
+        """
+
+        if ttl <= 0:
+            return
+
+        entries = self._load()
+        # drop expired entries so that the cache file does not grow forever
+        now = time.time()
+        for key in [key for key, entry in entries.items() if entry["expires"] <= now]:
+            del entries[key]
+
+        entries[domain] = {"target": target, "expires": now + ttl}
+        self._save()
+
+    def invalidate(self, domain: str) -> None:
+        """
+        Remove the cached delegation target of a domain.
+
+        :param domain: the delegating domain
+        """
+
+        if self._load().pop(domain, None) is not None:
+            self._save()
+
+
+class SharedCache:
+    """
+    Cache of DNS lookup results shared by the certbot processes of a host, stored in a SQLite database. SQLite locks
+    the database file for every access, so concurrent processes read and write the entries safely. Every entry
+    expires after its own TTL.
+    """
+
+    def __init__(
+        self, path: str, timeout: float = DEFAULT_SHARED_CACHE_TIMEOUT
+    ) -> None:
+        """
+        Creates a new SharedCache object.
+
+        :param path: the path of the SQLite database
+        :param timeout: the maximum time in seconds to wait for a lock of the database held by another process
+        """
+        self.path = path
+        self._timeout = timeout
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            # sqlite3 is only imported when the shared cache is used, not when certbot loads the plugin
+            import sqlite3  # pylint: disable=import-outside-toplevel
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # autocommit mode, every statement is a transaction of its own
+            connection = sqlite3.connect(
+                self.path, timeout=self._timeout, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (namespace TEXT NOT NULL, key TEXT NOT NULL, "
+                "value TEXT NOT NULL, expires REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            self._connection = connection
+
+        return self._connection
+
+    def _execute(self, sql: str, parameters: tuple):
+        """
+        Execute a statement, a failure is logged and treated like a cache miss.
+
+        :param sql: the SQL statement
+        :param parameters: the parameters of the statement
+        :return: the rows of the result or None if the statement failed
+        """
+
+        import sqlite3  # pylint: disable=import-outside-toplevel
+
+        try:
+            return self._connect().execute(sql, parameters).fetchall()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("Could not use the shared cache %s: %s", self.path, e)
+            return None
+
+    def get(self, namespace: str, key: str):
+        """
+        Get a cached value.
+
+        :param namespace: the kind of the cached value, e.g. delegation
+        :param key: the key of the value
+
+        :return: the value or None if the key is not cached or the entry is expired
+        """
+
+        rows = self._execute(
+            "SELECT value FROM entries WHERE namespace = ? AND key = ? AND expires > ?",
+            (namespace, key, time.time()),
+        )
+        return rows[0][0] if rows else None
+
+    def set(self, namespace: str, key: str, value: str, ttl: float) -> None:
+        """
+        Store a value.
+
+        :param namespace: the kind of the cached value, e.g. delegation
+        :param key: the key of the value
+        :param value: the value
+        :param ttl: the number of seconds the entry is valid, the key is removed if not positive
+        """
+
+        if ttl <= 0:
+            self.invalidate(namespace, key)
+            return
+
+        now = time.time()
+        # drop expired entries so that the database does not grow forever
+        self._execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        self._execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+            (namespace, key, value, now + ttl),
+        )
+
+    def invalidate(self, namespace: str, key: str) -> None:
+        """
+        Remove a cached value.
+
+        :param namespace: the kind of the cached value, e.g. delegation
+        :param key: the key of the value
+        """
+
+        self._execute(
+            "DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+        )
+
+    def namespace(self, namespace: str) -> "SharedCacheNamespace":
+        """
+        Get a view of the entries of one namespace.
+
+        :param namespace: the kind of the cached values, e.g. delegation
+
+        :return: the SharedCacheNamespace object
+        """
+        return SharedCacheNamespace(self, namespace)
+
+    def close(self) -> None:
+        """
+        Close the connection to the database.
+        """
+
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class SharedCacheNamespace:
+    """
+    The entries of one namespace of a shared cache, with the methods of the DelegationCache.
+    """
+
+    def __init__(self, cache: SharedCache, namespace: str) -> None:
+        """
+        Creates a new SharedCacheNamespace object.
+
+        :param cache: the shared cache
+        :param namespace: the kind of the cached values
+        """
+        self._cache = cache
+        self._namespace = namespace
+
+    def get(self, key: str):
+        """
+        Get a cached value.
+
+        :param key: the key of the value
+
+        :return: the value or None if the key is not cached or the entry is expired
+        """
+        return self._cache.get(self._namespace, key)
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        """
+        Store a value.
+
+        :param key: the key of the value
+        :param value: the value
+        :param ttl: the number of seconds the entry is valid
+        """
+        self._cache.set(self._namespace, key, value, ttl)
+
+    def invalidate(self, key: str) -> None:
+        """
+        Remove a cached value.
+
+        :param key: the key of the value
+        """
+        self._cache.invalidate(self._namespace, key)
@@ -2,39 +2,130 @@
 The certbot Authenticator implementation for DuckDNS domains.
 """
 
+# pylint: disable=too-many-lines
+
+import importlib
+import ipaddress
+import logging
 import os
+import time
 
 from certbot import errors
+from certbot.display import util as display_util
 from certbot.plugins import dns_common
-import dns.version
-import dns.resolver
 
+from certbot_dns_duckdns.cert.cache import (
+    DELEGATION_CACHE_FILE_NAME,
+    DelegationCache,
+    SharedCache,
+)
+from certbot_dns_duckdns.cert.delegation import get_duckdns_domain
+from certbot_dns_duckdns.cert.journal import JOURNAL_FILE_NAME, TXTJournal
+from certbot_dns_duckdns.cert.slots import (
+    DEFAULT_LEASE_TIMEOUT,
+    FileLockSlotBackend,
+    SlotLeaseError,
+    SlotPool,
+)
+from certbot_dns_duckdns.cert.snapshot import SNAPSHOT_FILE_NAME, TXTSnapshotStore
+from certbot_dns_duckdns.cert.tokens import TokenRouter
 from certbot_dns_duckdns.duckdns.client import (
+    BASE_URL,
+    DUCKDNS_SUFFIX,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_RETRY_ATTEMPTS,
+    DEFAULT_RETRY_BACKOFF,
+    DEFAULT_RETRY_DEADLINE,
+    DEFAULT_RETRY_JITTER,
+    BulkUpdateError,
     DuckDNSClient,
     NotValidDuckdnsDomainError,
-    is_valid_full_duckdns_domain,
+    RetryPolicy,
+    classify_domain,
+    create_session,
+)
+from certbot_dns_duckdns.duckdns.ratelimit import DEFAULT_BURST, RateLimiter
+from certbot_dns_duckdns.events import EventStream
+from certbot_dns_duckdns.metrics import (
+    DNS_LOOKUP_DURATION,
+    NULL_METRICS,
+    SKIPPED_WRITES,
+    Metrics,
 )
 
 DEFAULT_PROPAGATION_SECONDS = 30
+DEFAULT_RESOLVER_TIMEOUT = 2.0
+DEFAULT_RESOLVER_LIFETIME = 5.0
 TXT_MAX_LEN = 255
-ACME_CHALLENGE_TXT_PREFIX = "_acme-challenge"
 
 TOKEN_ENV_NAME = "DUCKDNS_TOKEN"
+# directory below the certbot work directory for the persistent state of the plugin
+STATE_DIR_NAME = "duckdns"
+RATE_LIMIT_FILE_NAME = "rate-limit"
+SLOT_LOCK_DIR_NAME = "slots"
+# namespaces of the shared cache
+DELEGATION_NAMESPACE = "delegation"
+TXT_NAMESPACE = "txt"
+# lifetime of the TXT values stored in the shared cache after an update, the TTL of the DuckDNS TXT records
+TXT_CACHE_TTL = 60
 
+logger = logging.getLogger(__name__)
 
-class Authenticator(dns_common.DNSAuthenticator):
+
+class Authenticator(dns_common.DNSAuthenticator):  # pylint: disable=too-many-instance-attributes
     """
     Authenticator class to handle dns-01 challenge for DuckDNS domains.
     """
 
     description = "Obtain certificates using a DNS TXT record for DuckDNS domains"
 
+    # HTTP sessions keyed by API URL and pool size, shared by all authenticators of the certbot process to reuse the
+    # kept alive connections, while every authenticator creates its clients from its own options
+    _sessions = {}
+    # cache of the DNS answers shared by all authenticators of the certbot process, if enabled
+    _resolver_cache = None
+    # metrics of the certbot process, created if the metrics are enabled, and the names of the added span hooks
+    _metrics = None
+    _span_hooks = set()
+
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
 
-        self._old_txt_value = ""
         self._credentials = None
         self._token = None
+        # DuckDNS clients keyed by token, created on first use
+        self._duckdns_clients = {}
+        # routes of the DuckDNS root domains to the tokens of a multi-token credentials file
+        self._token_router = None
+        # TXT values set during this run, keyed by the duckdns domain
+        self._txt_records = {}
+        # current TXT values of the root domains known from the lookups and updates of this run
+        self._current_txt_values = {}
+        # root domains whose TXT record already held the validation value
+        self._unchanged_root_domains = set()
+        # root domains whose TXT record this run has set or tried to set
+        self._written_root_domains = set()
+        # resolvers created on first use and shared by all lookups of this authenticator
+        self._resolver = None
+        self._snapshot_resolver = None
+        state_dir = os.path.join(self.config.work_dir, STATE_DIR_NAME)
+        self._delegation_cache = DelegationCache(
+            os.path.join(state_dir, DELEGATION_CACHE_FILE_NAME)
+        )
+        # cache of the delegations and TXT values shared by the certbot processes using the same file, if enabled,
+        # a missing file is reported by perform
+        self._shared_cache = None
+        if self._option("shared-cache") and self._option("shared-cache-file"):
+            self._shared_cache = SharedCache(self._option("shared-cache-file"))
+            self._delegation_cache = self._shared_cache.namespace(DELEGATION_NAMESPACE)
+        # original TXT values of the root domains, kept until they are restored
+        self._snapshots = TXTSnapshotStore(os.path.join(state_dir, SNAPSHOT_FILE_NAME))
+        # TXT records set but not yet restored, replayed by the next run if this run is killed
+        self._journal = TXTJournal(os.path.join(state_dir, JOURNAL_FILE_NAME))
+        # pool of the challenge slots leased for this run, created on first use if a slot pool is configured
+        self._slot_pool = None
 
     @classmethod
     def add_parser_arguments(
@@ -62,6 +153,193 @@ class Authenticator(dns_common.DNSAuthenticator):
             action="store_true",
             help="Do not restore the original TXT record",
         )
+        add(
+            "propagation-poll",
+            default=False,
+            action="store_true",
+            help="Poll the DuckDNS nameservers until they serve the TXT record instead of always waiting the "
+            "full propagation seconds, which are then only used as upper bound",
+        )
+        add(
+            "propagation-resolvers",
+            default=None,
+            help="Comma separated IP addresses of public resolvers, which are queried concurrently after the TXT "
+            "records are set until a quorum of them serves the validation values, with the propagation seconds "
+            "as upper bound",
+        )
+        add(
+            "propagation-quorum",
+            default=None,
+            type=int,
+            help="Number of the propagation resolvers which must serve the validation values, by default all of "
+            "them",
+        )
+        add(
+            "txt-read-back",
+            default=False,
+            action="store_true",
+            help="Read the current TXT value before every update and skip updates which would not change it, "
+            "combine it with --dns-duckdns-resolver-authoritative to avoid cached TXT values",
+        )
+        add(
+            "api-url",
+            default=BASE_URL,
+            help="URL of the DuckDNS update API, e.g. of a local emulator",
+        )
+        add(
+            "pool-size",
+            default=DEFAULT_POOL_SIZE,
+            type=int,
+            help="Maximum number of kept alive connections to the DuckDNS API",
+        )
+        add(
+            "connect-timeout",
+            default=DEFAULT_CONNECT_TIMEOUT,
+            type=float,
+            help="Timeout in seconds for connecting to the DuckDNS API",
+        )
+        add(
+            "read-timeout",
+            default=DEFAULT_READ_TIMEOUT,
+            type=float,
+            help="Timeout in seconds for reading the response of the DuckDNS API",
+        )
+        add(
+            "retry-attempts",
+            default=DEFAULT_RETRY_ATTEMPTS,
+            type=int,
+            help="Maximum number of attempts of a DuckDNS API call, 1 disables retries",
+        )
+        add(
+            "retry-backoff",
+            default=DEFAULT_RETRY_BACKOFF,
+            type=float,
+            help="Delay in seconds before the first retry of a failed DuckDNS API call, doubled for every further "
+            "retry",
+        )
+        add(
+            "retry-jitter",
+            default=DEFAULT_RETRY_JITTER,
+            type=float,
+            help="Maximum random delay in seconds added to every retry delay",
+        )
+        add(
+            "retry-deadline",
+            default=DEFAULT_RETRY_DEADLINE,
+            type=float,
+            help="Maximum time in seconds after the first attempt of a DuckDNS API call in which retries are started",
+        )
+        add(
+            "rate-limit",
+            default=None,
+            type=float,
+            help="Maximum number of DuckDNS API requests per second of all certbot processes sharing the rate limit "
+            "file, lowered automatically while the API throttles the requests, by default the requests are not "
+            "limited",
+        )
+        add(
+            "rate-limit-burst",
+            default=DEFAULT_BURST,
+            type=float,
+            help="Maximum number of DuckDNS API requests sent at once after an idle period",
+        )
+        add(
+            "rate-limit-file",
+            default=None,
+            help="State file of the rate limit shared by the certbot processes, required with the rate limit",
+        )
+        add(
+            "slot-pool",
+            default=None,
+            help="Comma separated DuckDNS root domains the acme challenges are delegated to, every slot is leased "
+            "exclusively while its TXT record is used, so concurrent certbot runs delegating to the same slot wait "
+            "for each other",
+        )
+        add(
+            "slot-lock-dir",
+            default=None,
+            help="Directory of the slot leases shared by the certbot processes, required with the slot pool",
+        )
+        add(
+            "slot-lease-timeout",
+            default=DEFAULT_LEASE_TIMEOUT,
+            type=float,
+            help="Maximum time in seconds to wait for a slot leased by another certbot run",
+        )
+        add(
+            "slot-backend",
+            default=None,
+            help="Slot lease backend as module:factory, called with the lock directory and returning an object "
+            "with the methods try_acquire(slot) and release(slot), by default file locks are used",
+        )
+        add(
+            "resolver-nameservers",
+            default=None,
+            help="Comma separated IP addresses of the nameservers for the DNS lookups, by default the nameservers "
+            "of the system are used",
+        )
+        add(
+            "resolver-authoritative",
+            default=False,
+            action="store_true",
+            help="Query the current TXT values directly from the authoritative DuckDNS nameservers instead of the "
+            "configured nameservers",
+        )
+        add(
+            "resolver-timeout",
+            default=DEFAULT_RESOLVER_TIMEOUT,
+            type=float,
+            help="Timeout in seconds for a single DNS query to one nameserver",
+        )
+        add(
+            "resolver-lifetime",
+            default=DEFAULT_RESOLVER_LIFETIME,
+            type=float,
+            help="Maximum time in seconds for a DNS lookup, including the queries to further nameservers",
+        )
+        add(
+            "resolver-cache",
+            default=False,
+            action="store_true",
+            help="Cache the DNS answers for their TTL, shared by all certificates of the certbot process",
+        )
+        add(
+            "shared-cache",
+            default=False,
+            action="store_true",
+            help="Share the resolved delegations and TXT values with the other certbot processes using the same "
+            "shared cache file, the TXT values are updated with every change of a TXT record",
+        )
+        add(
+            "shared-cache-file",
+            default=None,
+            help="SQLite database of the shared cache, required with the shared cache",
+        )
+        add(
+            "metrics-file",
+            default=None,
+            help="File to write the metrics of the DuckDNS API calls, DNS lookups and challenge phases to after "
+            "each cleanup, e.g. for the textfile collector of the Prometheus node exporter",
+        )
+        add(
+            "metrics-format",
+            default="prometheus",
+            choices=["prometheus", "openmetrics"],
+            help="Text format of the metrics file",
+        )
+        add(
+            "span-hook",
+            default=None,
+            help="Span hook as module:function, called with the name and attributes of every timed phase and "
+            "returning a context manager wrapping it, e.g. for OpenTelemetry tracing",
+        )
+        add(
+            "event-log",
+            default=None,
+            help="File or open file descriptor as fd:N to stream an event of every finished phase of the challenges "
+            "to as JSON lines, with the domain, the root domain, the timings, the HTTP status and the number of "
+            "attempts of the DuckDNS API calls",
+        )
 
     def more_info(self) -> str:
         """
@@ -72,6 +350,410 @@ class Authenticator(dns_common.DNSAuthenticator):
         """
         return "This plugin configures a DNS TXT record to respond to a DNS-01 challenge using the DuckDNS API."
 
+    def _option(self, key: str, default=None):
+        """
+        Get the value of a plugin option or the default value if the option is not present in the config.
+
+        :param key: the name of the plugin option
+        :param default: the value to use if the option is not present
+
+        :return: the value of the option
+        """
+        return getattr(self.config, self.dest(key), default)
+
+    def _validate_options(self) -> None:
+        """
+        Validate the plugin options which are only used after TXT records are set, so an invalid option fails the run
+        before any DuckDNS API call.
+
+        :raise PluginError: if an option is invalid
+        """
+
+        # certbot locks its work directory, so a cache in it would never be shared with another certbot process
+        if self._option("shared-cache") and not self._option("shared-cache-file"):
+            raise errors.PluginError(
+                f"The shared cache needs a database file shared by the certbot processes, set "
+                f"--{self.option_name('shared-cache-file')}."
+            )
+        self._get_propagation_resolvers()
+
+    def perform(self, achalls: list) -> list:
+        """
+        Perform the dns-01 challenges and wait until the TXT records are propagated. Challenges sharing the TXT record
+        of a DuckDNS root domain are only performed once.
+
+        :param achalls: the annotated challenges to perform
+        :raise PluginError: if challenges with different values need the same TXT record
+        :return: the challenge responses
+        """
+
+        self._setup_credentials()
+        self._validate_options()
+
+        # DuckDNS only supports one TXT record per root domain, so group the challenges by their root domain
+        challenges = {}
+        responses = []
+        for achall in achalls:
+            domain = _get_achall_domain(achall)
+            validation_domain_name = achall.validation_domain_name(domain)
+            validation = achall.validation(achall.account_key)
+
+            root_domain = self._get_root_domain(domain)
+            challenge = challenges.get(root_domain)
+            if challenge is not None and challenge[2] != validation:
+                raise errors.PluginError(
+                    f'The domains "{challenge[0]}" and "{domain}" both need the TXT record of the DuckDNS domain '
+                    f'"{root_domain}", but DuckDNS only supports one TXT record per domain. Request separate '
+                    "certificates for these domains."
+                )
+            # fail before any TXT record is changed if a domain has no token
+            self._get_token(root_domain)
+            challenges[root_domain] = (domain, validation_domain_name, validation)
+            responses.append(achall.response(achall.account_key))
+
+        self._lease_slots(challenges)
+        try:
+            self._perform_challenges(challenges)
+        except BaseException:
+            # the slots whose TXT records were set stay leased until the cleanup restores them
+            self._release_slots(exclude=self._written_root_domains)
+            raise
+
+        return responses
+
+    def _perform_challenges(self, challenges: dict) -> None:
+        """
+        Set the TXT records of the challenges and wait until they are propagated, after the TXT records left over by a
+        killed run are restored.
+
+        :param challenges: mapping of the DuckDNS root domains to the challenges using their TXT record
+        :raise PluginError: if a TXT record can not be set
+        """
+
+        # TXT records left over by a killed run, the root domains of this run are restored by its cleanup
+        restored, failures = self._recover_pending(exclude=challenges)
+        if restored:
+            logger.info(
+                "Restored the TXT records of %d root domains of an earlier run",
+                len(restored),
+            )
+        for failure in failures:
+            logger.warning(
+                "Could not restore a TXT record of an earlier run: %s", failure
+            )
+
+        self._attempt_cleanup = True
+
+        for challenge in challenges.values():
+            self._perform(*challenge)
+
+        if challenges and self._unchanged_root_domains.issuperset(challenges):
+            logger.info(
+                "All TXT records already hold the validation values, skipping the propagation wait"
+            )
+            return
+
+        with self._get_metrics().span("propagation") as span:
+            span["domains"] = sorted(self._txt_records)
+            self._wait_for_propagation()
+
+    def cleanup(self, achalls: list) -> None:
+        """
+        Clean up the TXT records of the dns-01 challenges in one pass over all root domains. Every TXT record is only
+        restored once, even if it was used by multiple challenges. The TXT records which were not set, e.g. because
+        perform failed before their root domain, are kept as they are. The snapshots of the restored TXT values are
+        removed at the end and the leased slots are released, also if the cleanup fails.
+
+        :param achalls: the annotated challenges to clean up
+        :raise PluginError: if any TXT record could not be restored
+        """
+
+        if not self._attempt_cleanup:
+            self._release_slots()
+            return
+
+        try:
+            self._cleanup_challenges(achalls)
+        finally:
+            # a slot kept leased after a failed cleanup would block every later run of a persistent process
+            self._release_slots()
+
+    def _cleanup_challenges(self, achalls: list) -> None:
+        """
+        Restore the TXT records of the challenges, grouped by token and restored value.
+
+        :param achalls: the annotated challenges to clean up
+        :raise PluginError: if any TXT record could not be restored
+        """
+
+        challenges = {}
+        for achall in achalls:
+            domain = _get_achall_domain(achall)
+            challenges.setdefault(
+                self._get_root_domain(domain),
+                (
+                    domain,
+                    achall.validation_domain_name(domain),
+                    achall.validation(achall.account_key),
+                ),
+            )
+
+        challenges = self._select_set_challenges(challenges)
+        restores, restored_root_domains = self._group_restores(challenges)
+
+        failures = []
+        for (_, old_txt_value), group in restores.items():
+            if len(group) == 1:
+                root_domain, challenge = next(iter(group.items()))
+                try:
+                    self._cleanup(*challenge)
+                    restored_root_domains.append(root_domain)
+                except errors.PluginError as e:
+                    failures.append(e)
+            else:
+                restored, error = self._restore_bulk(list(group), old_txt_value)
+                restored_root_domains += restored
+                if error is not None:
+                    failures.append(error)
+                    for root_domain, challenge in group.items():
+                        if root_domain not in restored:
+                            # the delegation may have changed since it was cached
+                            self._delegation_cache.invalidate(challenge[0])
+
+        self._finish_cleanup(restored_root_domains)
+
+        if failures:
+            raise errors.PluginError("\n".join(str(e) for e in failures))
+
+    def _select_set_challenges(self, challenges: dict) -> dict:
+        """
+        Select the challenges whose TXT record was set by this run or by a killed run, which left a journal entry or a
+        snapshot. A failed perform may have stopped before some root domains, whose TXT records are kept as they are.
+
+        :param challenges: mapping of the DuckDNS root domains to the challenges using their TXT record
+        :return: the mapping of the root domains whose TXT record must be restored
+        """
+
+        written = (self._written_root_domains, self._journal.pending(), self._snapshots)
+        selected = {}
+        for root_domain, challenge in challenges.items():
+            if any(root_domain in root_domains for root_domains in written):
+                selected[root_domain] = challenge
+            else:
+                logger.debug(
+                    "The TXT record of %s was not set, skipping its cleanup",
+                    root_domain,
+                )
+
+        return selected
+
+    def _group_restores(self, challenges: dict) -> tuple:
+        """
+        Group the root domains of the same token restored to the same value, which are updated together.
+
+        :param challenges: mapping of the DuckDNS root domains to the challenges using their TXT record
+        :return: tuple of the groups keyed by token and TXT value and the root domains already holding their value
+        """
+
+        restores = {}
+        unchanged = []
+        for root_domain, challenge in challenges.items():
+            old_txt_value = ""
+            if not self.conf("no-txt-restore"):
+                old_txt_value = self._snapshots.get(root_domain) or ""
+            if self._is_unchanged(root_domain, challenge[0], old_txt_value, "cleanup"):
+                unchanged.append(root_domain)
+                continue
+            restores.setdefault((self._get_token(root_domain), old_txt_value), {})[
+                root_domain
+            ] = challenge
+
+        return restores, unchanged
+
+    def _lease_slots(self, challenges: dict) -> None:
+        """
+        Lease the slots of the root domains of the challenges, if a slot pool is configured.
+
+        :param challenges: mapping of the DuckDNS root domains to the challenges using their TXT record
+        :raise PluginError: if a delegated challenge does not use a slot of the pool or a slot can not be leased
+        """
+
+        slot_pool = self._get_slot_pool()
+        if slot_pool is None:
+            return
+
+        for root_domain, challenge in challenges.items():
+            delegated = classify_domain(challenge[0]).needs_delegation
+            if delegated and root_domain not in slot_pool:
+                raise errors.PluginError(
+                    f'The acme challenge of "{challenge[0]}" is delegated to "{root_domain}", which is not in '
+                    "the slot pool."
+                )
+
+        try:
+            slot_pool.lease([d for d in challenges if d in slot_pool])
+        except SlotLeaseError as e:
+            raise errors.PluginError(e) from e
+
+    def _release_slots(self, exclude=()) -> None:
+        """
+        Release the leased slots, if a slot pool is configured.
+
+        :param exclude: root domains whose slots stay leased
+        """
+
+        if self._slot_pool is not None:
+            self._slot_pool.release(
+                [d for d in self._slot_pool.slots if d not in exclude]
+            )
+
+    def _finish_cleanup(self, restored_root_domains: list) -> None:
+        """
+        Forget the state of the restored root domains and export the metrics.
+
+        :param restored_root_domains: the root domains whose TXT records are restored
+        """
+
+        self._snapshots.discard(restored_root_domains)
+        self._journal.record_done(restored_root_domains)
+        self._journal.compact()
+        self._export_metrics()
+
+    def _wait_for_propagation(self) -> None:
+        """
+        Wait until the TXT records set during this run are propagated. Without polling this waits the configured
+        propagation seconds, otherwise the DuckDNS nameservers and the propagation resolvers are polled and the
+        configured propagation seconds are only used as upper bound of both.
+        """
+
+        propagation_seconds = self.conf("propagation-seconds")
+        deadline = time.monotonic() + propagation_seconds
+        resolvers = self._get_propagation_resolvers()
+
+        polled = False
+        if self._option("propagation-poll") and self._txt_records:
+            polled = self._poll_nameservers(propagation_seconds)
+
+        if resolvers and self._txt_records:
+            self._verify_quorum(resolvers, max(0.0, deadline - time.monotonic()))
+            return
+
+        if polled:
+            return
+
+        display_util.notify(
+            f"Waiting {propagation_seconds} seconds for DNS changes to propagate"
+        )
+        time.sleep(propagation_seconds)
+
+    def _poll_nameservers(self, propagation_seconds: float) -> bool:
+        """
+        Poll the DuckDNS nameservers until all of them serve the TXT records set during this run.
+
+        :param propagation_seconds: the maximum time to wait in seconds
+        :return: True if the nameservers were polled, False if they could not be looked up
+        """
+
+        # pylint: disable-next=import-outside-toplevel
+        from certbot_dns_duckdns.cert.propagation import (
+            get_authoritative_nameservers,
+            wait_for_txt_records,
+        )
+
+        nameservers = get_authoritative_nameservers(resolver=self._get_resolver())
+        if not nameservers:
+            logger.warning(
+                "Could not get the DuckDNS nameservers, falling back to a fixed propagation wait"
+            )
+            return False
+
+        display_util.notify(
+            f"Waiting up to {propagation_seconds} seconds for DNS changes to propagate"
+        )
+        # the nameservers are queried on the port of the configured resolver, which differs from 53 for emulators
+        if not wait_for_txt_records(
+            self._txt_records,
+            nameservers,
+            propagation_seconds,
+            port=self._get_resolver().port,
+        ):
+            logger.warning(
+                "The TXT records were not served by all DuckDNS nameservers within %d seconds",
+                propagation_seconds,
+            )
+        return True
+
+    def _get_propagation_resolvers(self) -> list:
+        """
+        Get the public resolvers of the propagation verification from the plugin options.
+
+        :raise PluginError: if a resolver is not an IP address or the quorum is not between 1 and the number of
+            resolvers
+        :return: the IP addresses of the resolvers, empty if the propagation is not verified on resolvers
+        """
+
+        resolvers = self._option("propagation-resolvers")
+        if not resolvers:
+            return []
+
+        resolvers = [r.strip() for r in resolvers.split(",") if r.strip()]
+        try:
+            for resolver in resolvers:
+                ipaddress.ip_address(resolver)
+        except ValueError as e:
+            raise errors.PluginError(f"Invalid propagation resolvers: {e}") from e
+
+        quorum = self._option("propagation-quorum")
+        if quorum is not None and not 1 <= quorum <= len(resolvers):
+            raise errors.PluginError(
+                f"The propagation quorum must be between 1 and the number of propagation resolvers "
+                f"({len(resolvers)})."
+            )
+
+        return resolvers
+
+    def _verify_quorum(self, resolvers: list, timeout: float) -> None:
+        """
+        Query the public resolvers concurrently until a quorum of them serves the TXT records set during this run.
+        The lag of every resolver is logged.
+
+        :param resolvers: the IP addresses of the resolvers
+        :param timeout: the maximum time to wait in seconds
+        """
+
+        # pylint: disable-next=import-outside-toplevel
+        from certbot_dns_duckdns.cert.propagation import wait_for_quorum
+
+        quorum = self._option("propagation-quorum") or len(resolvers)
+        display_util.notify(
+            f"Waiting up to {timeout:.0f} seconds until {quorum} of {len(resolvers)} resolvers serve the DNS changes"
+        )
+        lags = wait_for_quorum(
+            self._txt_records,
+            resolvers,
+            quorum,
+            timeout,
+            port=self._get_resolver().port,
+        )
+
+        for resolver in resolvers:
+            if resolver in lags:
+                logger.info(
+                    "Resolver %s served the TXT records after %.1f seconds",
+                    resolver,
+                    lags[resolver],
+                )
+            else:
+                logger.info("Resolver %s did not serve the TXT records", resolver)
+
+        if len(lags) < quorum:
+            logger.warning(
+                "Only %d of the %d required resolvers served the TXT records within %d seconds",
+                len(lags),
+                quorum,
+                timeout,
+            )
+
     def _setup_credentials(self) -> None:
         # If token cli param is provided we do not need a credentials file
         self._token = self.conf("token")
@@ -85,10 +767,13 @@ class Authenticator(dns_common.DNSAuthenticator):
             self._credentials = self._configure_credentials(
                 "credentials",
                 "DuckDNS credentials INI file",
-                {
-                    "token": "DuckDNS token",
-                },
+                validator=self._validate_credentials,
             )
+            routes = self._credentials.conf("tokens")
+            if routes:
+                self._token_router = TokenRouter(
+                    routes, default=self._credentials.conf("token")
+                )
         else:
             # If no credentials file is provided, we try to get the token from the environment
             token = os.environ.get(self.conf("token-env"))
@@ -97,6 +782,38 @@ class Authenticator(dns_common.DNSAuthenticator):
 
             self._token = token
 
+    @staticmethod
+    def _validate_credentials(credentials: dns_common.CredentialsConfiguration) -> None:
+        """
+        Validate that a credentials file contains a token or a section of tokens per domain.
+
+        :param credentials: the loaded credentials file
+        :raise PluginError: if the credentials file contains no valid token
+        """
+
+        routes = credentials.conf("tokens")
+        if routes is None:
+            if not credentials.conf("token"):
+                raise errors.PluginError(
+                    f'Missing property "{credentials.mapper("token")}" or section '
+                    f'"[{credentials.mapper("tokens")}]" in the credentials file '
+                    f"{credentials.confobj.filename}."
+                )
+            return
+
+        if not isinstance(routes, dict):
+            raise errors.PluginError(
+                f'"{credentials.mapper("tokens")}" in the credentials file {credentials.confobj.filename} must be '
+                "a section mapping domains to tokens."
+            )
+        try:
+            TokenRouter(routes)
+        except ValueError as e:
+            raise errors.PluginError(
+                f"Invalid section [{credentials.mapper('tokens')}] in the credentials file "
+                f"{credentials.confobj.filename}: {e}"
+            ) from e
+
     def _perform(self, domain: str, validation_name: str, validation: str) -> None:
         """
         Add the TXT record of the provided DuckDNS domain.
@@ -107,34 +824,89 @@ class Authenticator(dns_common.DNSAuthenticator):
         :raise PluginError: if the TXT record can not be set of something goes wrong
         """
 
+        metrics = self._get_metrics()
+
         # get the duckdns domain
-        duckdns_domain = self._get_duckdns_domain(domain)
+        with metrics.span("resolve", domain=domain) as span:
+            duckdns_domain = self._get_duckdns_domain(domain)
+            span["duckdns_domain"] = duckdns_domain
 
-        if not self.conf("no-txt-restore"):
-            # get the current TXT record
-            custom_resolver = dns.resolver.Resolver()
-            try:
-                if dns.version.MAJOR > 1:
-                    txt_values = custom_resolver.resolve(duckdns_domain, "TXT")
-                else:
-                    txt_values = custom_resolver.query(duckdns_domain, "TXT")
+        root_domain = self._get_root_domain(domain)
+        # a snapshot of a crashed run still holds the original value, so it is neither resolved nor overwritten
+        if not self.conf("no-txt-restore") and root_domain not in self._snapshots:
+            with metrics.span("snapshot", domain=domain):
+                txt_value = self._get_txt_value(duckdns_domain)
+            self._snapshots.record(root_domain, txt_value)
+            self._current_txt_values[root_domain] = txt_value
 
-                # there should only be one single TXT record
-                if len(txt_values) != 1:
-                    raise errors.PluginError("issue resoling TXT record")
+        self._written_root_domains.add(root_domain)
+        try:
+            self._journal.record_set(
+                root_domain,
+                "" if self.conf("no-txt-restore") else self._snapshots.get(root_domain),
+            )
+        except OSError as e:
+            logger.warning("Could not write the journal %s: %s", self._journal.path, e)
 
-                # remove the additional quotes around the TXT value
-                self._old_txt_value = txt_values[0].to_text()[1:-1]
-            except dns.resolver.NoAnswer:
-                self._old_txt_value = ""
-            except Exception as e:
-                raise errors.PluginError(e)
+        self._txt_records[duckdns_domain] = validation
+        if self._is_unchanged(root_domain, domain, validation, "perform"):
+            self._unchanged_root_domains.add(root_domain)
+            return
 
+        # the TXT value is unknown if the update fails, e.g. after a timeout
+        self._set_current_txt_value(root_domain, None)
         try:
-            self._get_duckdns_client().set_txt_record(duckdns_domain, validation)
+            self._get_duckdns_client(root_domain).set_txt_record(
+                duckdns_domain, validation
+            )
         except Exception as e:
+            # the delegation may have changed since it was cached
+            self._delegation_cache.invalidate(domain)
             raise errors.PluginError(e)
 
+        self._set_current_txt_value(root_domain, validation)
+
+    def _is_unchanged(
+        self, root_domain: str, domain: str, txt_value: str, phase: str
+    ) -> bool:
+        """
+        Check whether the TXT record of a root domain already holds a value, if the read-back is enabled. The value
+        known from the lookups and updates of this run is used, otherwise the current value is resolved.
+
+        :param root_domain: the DuckDNS root domain
+        :param domain: the domain of the challenge using the TXT record
+        :param txt_value: the TXT value which would be written
+        :param phase: the phase of the update for the skipped writes counter, perform or cleanup
+        :return: True if the update can be skipped, False if the value differs or could not be resolved
+        """
+
+        if not self._option("txt-read-back"):
+            return False
+
+        current_txt_value = self._current_txt_values.get(root_domain)
+        if current_txt_value is None:
+            try:
+                with self._get_metrics().span("read-back", domain=domain):
+                    current_txt_value = self._get_txt_value(
+                        self._get_duckdns_domain(domain)
+                    )
+            except errors.PluginError as e:
+                logger.debug(
+                    "Could not read back the TXT record of %s: %s", root_domain, e
+                )
+                return False
+            self._current_txt_values[root_domain] = current_txt_value
+
+        if current_txt_value != txt_value:
+            return False
+
+        logger.info(
+            "The TXT record of %s already holds the value, skipping the update",
+            root_domain,
+        )
+        self._get_metrics().increment(SKIPPED_WRITES, phase=phase)
+        return True
+
     def _cleanup(self, domain: str, validation_name: str, validation: str) -> None:
         """
         Clear the dns validation from the TXT record of the provided DuckDNS domain. Restore the previous TXT value if
@@ -149,89 +921,555 @@ class Authenticator(dns_common.DNSAuthenticator):
         # get the duckdns domain
         duckdns_domain = self._get_duckdns_domain(domain)
 
+        root_domain = self._get_root_domain(domain)
+        old_txt_value = ""
+        if not self.conf("no-txt-restore"):
+            old_txt_value = self._snapshots.get(root_domain) or ""
+
+        self._set_current_txt_value(root_domain, None)
+        with self._get_metrics().span("cleanup", domain=domain) as span:
+            span["root_domain"] = root_domain
+            try:
+                if old_txt_value == "":
+                    # setting an empty TXT value does not work with the DuckDNS API
+                    self._get_duckdns_client(root_domain).clear_txt_record(
+                        duckdns_domain
+                    )
+                else:
+                    self._get_duckdns_client(root_domain).set_txt_record(
+                        duckdns_domain, old_txt_value
+                    )
+            except Exception as e:
+                self._delegation_cache.invalidate(domain)
+                raise errors.PluginError(e)
+
+        self._set_current_txt_value(root_domain, old_txt_value)
+
+    def recover(self) -> tuple:
+        """
+        Restore the TXT records of all root domains which were set by runs killed before their cleanup, e.g. by the
+        certbot-duckdns-recover command. The root domains of one token restored to the same value are updated in bulk.
+
+        :raise PluginError: if no DuckDNS token is configured
+        :return: tuple of the restored root domains and the list of PluginErrors of the failed root domains
+        """
+
+        self._setup_credentials()
+        return self._recover_pending()
+
+    def _recover_pending(self, exclude=()) -> tuple:
+        """
+        Restore the TXT records of the pending root domains of the journal. The slots of the root domains in the slot
+        pool are leased for the restore, a root domain whose slot is leased by another run is restored later.
+
+        :param exclude: root domains which are not restored
+        :return: tuple of the restored root domains and the list of PluginErrors of the failed root domains
+        """
+
+        groups = {}
+        failures = []
+        leased = []
+        for root_domain, restore in self._journal.pending().items():
+            if root_domain in exclude:
+                continue
+            try:
+                token = self._get_token(root_domain)
+                if not self._lease_pending_slot(root_domain, leased):
+                    continue
+            except errors.PluginError as e:
+                failures.append(e)
+                continue
+            groups.setdefault((token, restore), []).append(root_domain)
+
+        restored_root_domains = []
         try:
-            if self._old_txt_value == "":
-                # setting an empty TXT value does not work with the DuckDNS API
-                self._get_duckdns_client().clear_txt_record(duckdns_domain)
-            else:
-                self._get_duckdns_client().set_txt_record(
-                    duckdns_domain, self._old_txt_value
+            for (_, restore), root_domains in groups.items():
+                restored, error = self._restore_bulk(root_domains, restore)
+                restored_root_domains += restored
+                if error is not None:
+                    failures.append(error)
+        finally:
+            if leased:
+                self._slot_pool.release(leased)
+
+        if restored_root_domains:
+            self._snapshots.discard(restored_root_domains)
+            self._journal.record_done(restored_root_domains)
+            self._journal.compact()
+
+        return restored_root_domains, failures
+
+    def _lease_pending_slot(self, root_domain: str, leased: list) -> bool:
+        """
+        Lease the slot of a pending root domain of the journal without waiting, if it is in the slot pool.
+
+        :param root_domain: the DuckDNS root domain
+        :param leased: the list of the slots leased for the restore, the leased slot is appended
+        :raise PluginError: if the slot pool options are invalid or the slot can not be leased
+        :return: False if another run validates a challenge with the TXT record, otherwise True
+        """
+
+        slot_pool = self._get_slot_pool()
+        if slot_pool is None or root_domain not in slot_pool:
+            return True
+
+        try:
+            if not slot_pool.try_lease(root_domain):
+                logger.info(
+                    "The slot %s is leased by another certbot run, its TXT record is restored later",
+                    root_domain,
                 )
+                return False
+        except SlotLeaseError as e:
+            raise errors.PluginError(e) from e
+
+        leased.append(root_domain)
+        return True
+
+    def _restore_bulk(self, root_domains: list, txt_value: str) -> tuple:
+        """
+        Restore the same TXT value of multiple root domains of one token with as few API requests as possible.
+
+        :param root_domains: the DuckDNS root domains
+        :param txt_value: the TXT value to restore, the TXT records are cleared if empty
+        :return: tuple of the restored root domains and the PluginError of the failed root domains or None
+        """
+
+        client = self._get_duckdns_client(root_domains[0])
+        for root_domain in root_domains:
+            self._set_current_txt_value(root_domain, None)
+        with self._get_metrics().span("cleanup") as span:
+            span["root_domains"] = root_domains
+            try:
+                if txt_value == "":
+                    client.bulk_clear_txt_record(root_domains)
+                else:
+                    client.bulk_set_txt_record(root_domains, txt_value)
+            except BulkUpdateError as e:
+                succeeded = {f"{name}{DUCKDNS_SUFFIX}" for name in e.succeeded}
+                restored, error = (
+                    [d for d in root_domains if d in succeeded],
+                    errors.PluginError(e),
+                )
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                restored, error = [], errors.PluginError(e)
+            else:
+                restored, error = root_domains, None
+
+            if error is not None:
+                # the error is returned, so the outcome of the phase is set explicitly
+                span["outcome"] = "error"
+                span["error"] = str(error)
+
+        for root_domain in restored:
+            self._set_current_txt_value(root_domain, txt_value)
+
+        return restored, error
+
+    def _set_current_txt_value(self, root_domain: str, txt_value) -> None:
+        """
+        Remember the current TXT value of a root domain after an update, also in the shared cache if enabled.
+
+        :param root_domain: the DuckDNS root domain
+        :param txt_value: the current TXT value or None if it is unknown, e.g. after a failed update
+        """
+
+        if txt_value is None:
+            self._current_txt_values.pop(root_domain, None)
+            if self._shared_cache is not None:
+                self._shared_cache.invalidate(TXT_NAMESPACE, root_domain)
+            return
+
+        self._current_txt_values[root_domain] = txt_value
+        if self._shared_cache is not None:
+            self._shared_cache.set(TXT_NAMESPACE, root_domain, txt_value, TXT_CACHE_TTL)
+
+    def _get_txt_value(self, duckdns_domain: str) -> str:
+        """
+        Get the current TXT value of a DuckDNS domain. With the shared cache, a value resolved or set by another
+        certbot process within its TTL is used without a lookup.
+
+        :param duckdns_domain: the DuckDNS domain
+        :raise PluginError: if the TXT record can not be resolved
+        :return: the TXT value, empty if there is no TXT record
+        """
+
+        if self._shared_cache is None:
+            return self._resolve_txt_value(duckdns_domain)[0]
+
+        root_domain = classify_domain(duckdns_domain).root_domain
+        txt_value = self._shared_cache.get(TXT_NAMESPACE, root_domain)
+        if txt_value is None:
+            txt_value, ttl = self._resolve_txt_value(duckdns_domain)
+            self._shared_cache.set(TXT_NAMESPACE, root_domain, txt_value, ttl)
+
+        return txt_value
+
+    def _resolve_txt_value(self, duckdns_domain: str) -> tuple:
+        """
+        Resolve the current TXT value of a DuckDNS domain.
+
+        :param duckdns_domain: the DuckDNS domain
+        :raise PluginError: if the TXT record can not be resolved
+        :return: tuple of the TXT value, empty if there is no TXT record, and its TTL in seconds
+        """
+
+        import dns.resolver  # pylint: disable=import-outside-toplevel
+
+        # pylint: disable-next=import-outside-toplevel
+        from certbot_dns_duckdns.cert.resolver import resolve
+
+        resolver = self._get_snapshot_resolver()
+        start = time.perf_counter()
+        try:
+            txt_values = resolve(duckdns_domain, "TXT", resolver)
+
+            # there should only be one single TXT record
+            if len(txt_values) != 1:
+                raise errors.PluginError("issue resoling TXT record")
+
+            # remove the additional quotes around the TXT value
+            return txt_values[0].to_text()[1:-1], txt_values.rrset.ttl
+        except dns.resolver.NoAnswer:
+            return "", TXT_CACHE_TTL
         except Exception as e:
             raise errors.PluginError(e)
+        finally:
+            self._get_metrics().observe(
+                DNS_LOOKUP_DURATION, time.perf_counter() - start, record="txt"
+            )
 
-    def _get_duckdns_client(self) -> DuckDNSClient:
+    def _get_resolver(self):
         """
-        Create a new DuckDNSClient with the provided API token.
+        Get the resolver for the DNS lookups of this authenticator, configured by the resolver options.
+        The resolver is created on first use.
 
-        :return: the created DuckDNSClient object
+        :raise PluginError: if the resolver options are invalid
+        :return: the dns.resolver.Resolver object
         """
 
-        token = self.conf("token") or (
-            self._credentials.conf("token") if self._credentials else None
-        )
+        if self._resolver is not None:
+            return self._resolver
+
+        import dns.exception  # pylint: disable=import-outside-toplevel
+        import dns.resolver  # pylint: disable=import-outside-toplevel
+
+        # pylint: disable-next=import-outside-toplevel
+        from certbot_dns_duckdns.cert.resolver import create_resolver
+
+        if self._option("resolver-cache") and Authenticator._resolver_cache is None:
+            Authenticator._resolver_cache = dns.resolver.Cache()
+
+        nameservers = self._option("resolver-nameservers")
+        try:
+            self._resolver = create_resolver(
+                [ns.strip() for ns in nameservers.split(",") if ns.strip()]
+                if nameservers
+                else [],
+                self._option("resolver-timeout", DEFAULT_RESOLVER_TIMEOUT),
+                self._option("resolver-lifetime", DEFAULT_RESOLVER_LIFETIME),
+                self._resolver_cache if self._option("resolver-cache") else None,
+            )
+        except ValueError as e:
+            raise errors.PluginError(f"Invalid resolver nameservers: {e}") from e
+        except dns.exception.DNSException as e:
+            # e.g. NoResolverConfiguration if the system nameservers are used without /etc/resolv.conf
+            raise errors.PluginError(
+                f"Could not configure the DNS resolver: {e}"
+            ) from e
+
+        return self._resolver
+
+    def _get_snapshot_resolver(self):
+        """
+        Get the resolver for the lookups of the current TXT values. If enabled, the authoritative DuckDNS
+        nameservers are queried directly, otherwise the resolver of this authenticator is used.
+
+        :raise PluginError: if the resolver options are invalid
+        :return: the dns.resolver.Resolver object
+        """
+
+        if self._snapshot_resolver is not None:
+            return self._snapshot_resolver
+
+        resolver = self._get_resolver()
+        if self._option("resolver-authoritative"):
+            # pylint: disable-next=import-outside-toplevel
+            from certbot_dns_duckdns.cert.propagation import (
+                get_authoritative_nameservers,
+            )
+
+            # pylint: disable-next=import-outside-toplevel
+            from certbot_dns_duckdns.cert.resolver import create_resolver
+
+            nameservers = get_authoritative_nameservers(resolver=resolver)
+            if nameservers:
+                resolver = create_resolver(
+                    nameservers,
+                    resolver.timeout,
+                    resolver.lifetime,
+                    resolver.cache,
+                    port=resolver.port,
+                )
+            else:
+                logger.warning(
+                    "Could not get the DuckDNS nameservers, falling back to the configured resolver"
+                )
+
+        self._snapshot_resolver = resolver
+        return resolver
+
+    def _get_token(self, root_domain: str = None) -> str:
+        """
+        Get the DuckDNS token for a root domain. The token of the command line takes precedence, then the token of a
+        matching route of the credentials file, then the single token of the credentials file or the environment.
+
+        :param root_domain: the DuckDNS root domain, the default token is used if not provided
+        :raise PluginError: if there is no token for the root domain
+        :return: the DuckDNS token
+        """
+
+        token = self.conf("token")
+        if not token and self._token_router is not None and root_domain is not None:
+            token = self._token_router.get_token(root_domain)
+        if not token and self._credentials:
+            token = self._credentials.conf("token")
         if not token:
             token = self._token
+        if not token:
+            raise errors.PluginError(
+                f'No DuckDNS token found for the domain "{root_domain}".'
+            )
+
+        return token
+
+    def _get_duckdns_client(self, root_domain: str = None) -> DuckDNSClient:
+        """
+        Get the DuckDNSClient for the API token of a root domain. There is one client per token, created on first use
+        from the options of this authenticator. The clients of all authenticators of the certbot process share the
+        connection pool of their API URL.
+
+        :param root_domain: the DuckDNS root domain, the default token is used if not provided
+        :raise PluginError: if there is no token for the root domain or the client options are invalid
+        :return: the DuckDNSClient object
+        """
+
+        token = self._get_token(root_domain)
+
+        client = self._duckdns_clients.get(token)
+        if client is None:
+            base_url = self._option("api-url", BASE_URL)
+            pool_size = self._option("pool-size", DEFAULT_POOL_SIZE)
+            session = Authenticator._sessions.get((base_url, pool_size))
+            if session is None:
+                session = create_session(pool_size)
+                Authenticator._sessions[(base_url, pool_size)] = session
+
+            client = DuckDNSClient(
+                token,
+                session=session,
+                timeout=(
+                    self._option("connect-timeout", DEFAULT_CONNECT_TIMEOUT),
+                    self._option("read-timeout", DEFAULT_READ_TIMEOUT),
+                ),
+                base_url=base_url,
+                retry_policy=self._get_retry_policy(),
+                metrics=self._get_metrics(),
+                rate_limiter=self._get_rate_limiter(),
+            )
+            self._duckdns_clients[token] = client
+
+        return client
+
+    def _get_metrics(self) -> Metrics:
+        """
+        Get the metrics of the certbot process. The metrics are only recorded if a metrics file, a span hook or an
+        event log is configured, otherwise the returned metrics discard everything.
+
+        :raise PluginError: if the span hook can not be loaded or the event log can not be opened
+        :return: the Metrics object
+        """
+
+        metrics_file = self._option("metrics-file")
+        span_hook = self._option("span-hook")
+        event_log = self._option("event-log")
+        if not metrics_file and not span_hook and not event_log:
+            return NULL_METRICS
+
+        if Authenticator._metrics is None:
+            Authenticator._metrics = Metrics()
+
+        if span_hook and span_hook not in self._span_hooks:
+            Authenticator._metrics.add_span_hook(_load_object(span_hook, "span hook"))
+            self._span_hooks.add(span_hook)
+
+        # the event log is added like a span hook, keyed by its target
+        event_hook = f"event-log:{event_log}"
+        if event_log and event_hook not in self._span_hooks:
+            try:
+                Authenticator._metrics.add_span_hook(EventStream.open(event_log))
+            except (OSError, ValueError) as e:
+                raise errors.PluginError(
+                    f'Could not open the event log "{event_log}": {e}'
+                ) from e
+            self._span_hooks.add(event_hook)
+
+        return Authenticator._metrics
+
+    def _export_metrics(self) -> None:
+        """
+        Write the metrics to the configured metrics file, if any. Failures are only logged, because the metrics must
+        not fail the certificate renewal.
+        """
+
+        metrics_file = self._option("metrics-file")
+        if not metrics_file:
+            return
+
+        try:
+            self._get_metrics().write_textfile(
+                metrics_file,
+                openmetrics=self._option("metrics-format") == "openmetrics",
+            )
+        except OSError as e:
+            logger.warning("Could not write the metrics file %s: %s", metrics_file, e)
+
+    def _get_retry_policy(self) -> RetryPolicy:
+        """
+        Create the retry policy for the DuckDNS API calls from the plugin options.
+
+        :raise PluginError: if the retry options are invalid
+        :return: the created RetryPolicy object
+        """
+
+        try:
+            return RetryPolicy(
+                attempts=self._option("retry-attempts", DEFAULT_RETRY_ATTEMPTS),
+                backoff=self._option("retry-backoff", DEFAULT_RETRY_BACKOFF),
+                jitter=self._option("retry-jitter", DEFAULT_RETRY_JITTER),
+                deadline=self._option("retry-deadline", DEFAULT_RETRY_DEADLINE),
+            )
+        except ValueError as e:
+            raise errors.PluginError(e) from e
+
+    def _get_slot_pool(self):
+        """
+        Create the slot pool from the plugin options.
+
+        :raise PluginError: if the slot pool options are invalid or the lock directory is not set
+        :return: the SlotPool object or None if no slot pool is configured
+        """
+
+        slots = self._option("slot-pool")
+        if not slots:
+            return None
+
+        if self._slot_pool is None:
+            # certbot locks its work directory, so leases in it would never exclude another certbot process
+            lock_dir = self._option("slot-lock-dir")
+            if not lock_dir:
+                raise errors.PluginError(
+                    f"The slot pool needs a lock directory shared by the certbot processes, set "
+                    f"--{self.option_name('slot-lock-dir')}."
+                )
+            backend = self._option("slot-backend")
+            factory = (
+                _load_object(backend, "slot backend")
+                if backend
+                else FileLockSlotBackend
+            )
+            try:
+                self._slot_pool = SlotPool(
+                    slots.split(","),
+                    factory(lock_dir),
+                    self._option("slot-lease-timeout", DEFAULT_LEASE_TIMEOUT),
+                )
+            except ValueError as e:
+                raise errors.PluginError(f"Invalid slot pool: {e}") from e
+
+        return self._slot_pool
+
+    def _get_rate_limiter(self):
+        """
+        Create the rate limiter for the DuckDNS API calls from the plugin options.
+
+        :raise PluginError: if the rate limit options are invalid or the state file is not set
+        :return: the created RateLimiter object or None if the requests are not limited
+        """
 
-        return DuckDNSClient(token)
+        rate = self._option("rate-limit")
+        if not rate:
+            return None
+
+        # certbot locks its work directory, so a file in it would never be shared with another certbot process
+        path = self._option("rate-limit-file")
+        if not path:
+            raise errors.PluginError(
+                f"The rate limit needs a state file shared by the certbot processes, set "
+                f"--{self.option_name('rate-limit-file')}."
+            )
+        try:
+            return RateLimiter(
+                rate, burst=self._option("rate-limit-burst", DEFAULT_BURST), path=path
+            )
+        except (ValueError, OSError) as e:
+            raise errors.PluginError(f"Invalid rate limit: {e}") from e
+
+    def _get_root_domain(self, domain: str) -> str:
+        """
+        Gets the DuckDNS root domain whose TXT record is used for the acme challenge of the domain.
+
+        :param domain: the domain to validate
+        :raise PluginError: if the domain has no valid DuckDNS root domain
+        :return: the DuckDNS root domain
+        """
+
+        try:
+            return DuckDNSClient.__get_validated_root_domain__(
+                self._get_duckdns_domain(domain)
+            )
+        except NotValidDuckdnsDomainError as e:
+            raise errors.PluginError(e) from e
 
     def _get_duckdns_domain(self, domain: str) -> str:
         """
         Gets the duckdns.org subdomain name used for the acme challenge, even if the challenge is delegated.
-        See delegated acme challenge https://letsencrypt.org/docs/challenge-types/#dns-01-challenge
 
         :param domain: the domain to validate
         :raise PluginError:  if not delegated to a duckdns.org domain.
         :return: the duckdns.org subdomain
         """
 
-        # valid duckdns.org subdomain
-        if is_valid_full_duckdns_domain(domain):
-            return domain
+        return get_duckdns_domain(domain, self._delegation_cache, self._get_resolver())
 
-        # delegated acme challenge (ipv4)
-        try:
-            if dns.version.MAJOR > 1:
-                result = dns.resolver.resolve(
-                    f"{ACME_CHALLENGE_TXT_PREFIX}.{domain}", "A"
-                )
-            else:
-                result = dns.resolver.query(
-                    f"{ACME_CHALLENGE_TXT_PREFIX}.{domain}", "A"
-                )
-            delegated_domain = result.canonical_name.to_text().rstrip(".")
 
-            # check if the delegated domain is a valid duckdns.org domain
-            if is_valid_full_duckdns_domain(delegated_domain):
-                return delegated_domain
+def _get_achall_domain(achall) -> str:
+    """
+    Get the domain of an annotated challenge. Certbot 5.3 added the identifier of the challenge and deprecated its
+    domain attribute, which is the only one of older certbot versions.
 
-            raise errors.PluginError(NotValidDuckdnsDomainError(delegated_domain))
-        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
-            pass
+    :param achall: the annotated challenge
+    :return: the domain of the challenge
+    """
+
+    identifier = getattr(achall, "identifier", None)
+    if identifier is not None:
+        return identifier.value
+    return achall.domain
 
-        # delegated acme challenge (ipv6)
-        try:
-            if dns.version.MAJOR > 1:
-                result = dns.resolver.resolve(
-                    f"{ACME_CHALLENGE_TXT_PREFIX}.{domain}", "AAAA"
-                )
-            else:
-                result = dns.resolver.query(
-                    f"{ACME_CHALLENGE_TXT_PREFIX}.{domain}", "AAAA"
-                )
-            delegated_domain = result.canonical_name.to_text().rstrip(".")
 
-            # check if the delegated domain is a valid duckdns.org domain
-            if is_valid_full_duckdns_domain(delegated_domain):
-                return delegated_domain
+def _load_object(reference: str, kind: str):
+    """
+    Load an object given as module:name, e.g. a span hook function.
 
-            raise errors.PluginError(NotValidDuckdnsDomainError(delegated_domain))
-        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
-            pass
+    :param reference: the module and name of the object
+    :param kind: the kind of the object for the error message
+    :raise PluginError: if the object can not be loaded
+    :return: the loaded object
+    """
 
-        # invalid domain
-        e = Exception(
-            f'The given domain "{domain}" is neither a duckdns subdomain nor '
-            f" delegates _acme-challenge.{domain} to a duckdns subdomain."
-        )
-        raise errors.PluginError(e)
+    module_name, _, name = reference.partition(":")
+    try:
+        return getattr(importlib.import_module(module_name), name)
+    except (ImportError, AttributeError, ValueError) as e:
+        raise errors.PluginError(f'Could not load the {kind} "{reference}": {e}') from e
@@ -0,0 +1,110 @@
+"""
+This module resolves the DuckDNS domain whose TXT record is used by the acme challenge of a domain, following the
+delegation of the acme challenge with a CNAME record.
+"""
+
+import time
+
+from certbot import errors
+
+from certbot_dns_duckdns.cert.cache import DelegationCache
+from certbot_dns_duckdns.duckdns.client import (
+    NotValidDuckdnsDomainError,
+    is_valid_full_duckdns_domain,
+)
+from certbot_dns_duckdns.metrics import DNS_LOOKUP_DURATION, NULL_METRICS, Metrics
+
+ACME_CHALLENGE_TXT_PREFIX = "_acme-challenge"
+
+
+def _resolve_delegation(domain: str, resolver=None) -> tuple:
+    """
+    Resolve the CNAME chain of the acme challenge domain with a single lookup.
+
+    :param domain: the domain to validate
+    :param resolver: the dns.resolver.Resolver for the lookup, the default resolver if not provided
+    :raise PluginError: if the challenge is not delegated to a duckdns.org domain
+    :return: tuple of the duckdns.org subdomain and the TTL of the delegation in seconds
+    """
+
+    # dnspython is only imported when a challenge is performed, not when certbot loads the plugin
+    import dns.rdatatype  # pylint: disable=import-outside-toplevel
+    import dns.resolver  # pylint: disable=import-outside-toplevel
+
+    # pylint: disable-next=import-outside-toplevel
+    from certbot_dns_duckdns.cert.resolver import resolve
+
+    challenge_domain = f"{ACME_CHALLENGE_TXT_PREFIX}.{domain}"
+
+    # the answer of a TXT query contains the whole CNAME chain, even if the final TXT record is empty
+    try:
+        answer = resolve(challenge_domain, "TXT", resolver, raise_on_no_answer=False)
+    except dns.resolver.NXDOMAIN:
+        answer = None
+
+    delegated_domain = (
+        answer.canonical_name.to_text().rstrip(".") if answer is not None else None
+    )
+    if delegated_domain is None or delegated_domain == challenge_domain:
+        # invalid domain
+        e = Exception(
+            f'The given domain "{domain}" is neither a duckdns subdomain nor '
+            f" delegates {challenge_domain} to a duckdns subdomain."
+        )
+        raise errors.PluginError(e)
+
+    # check if the delegated domain is a valid duckdns.org domain
+    if not is_valid_full_duckdns_domain(delegated_domain):
+        raise errors.PluginError(NotValidDuckdnsDomainError(delegated_domain))
+
+    ttl = min(
+        (
+            rrset.ttl
+            for rrset in answer.response.answer
+            if rrset.rdtype == dns.rdatatype.CNAME
+        ),
+        default=0,
+    )
+
+    return delegated_domain, ttl
+
+
+def get_duckdns_domain(
+    domain: str,
+    cache: DelegationCache = None,
+    resolver=None,
+    metrics: Metrics = NULL_METRICS,
+) -> str:
+    """
+    Gets the duckdns.org subdomain name used for the acme challenge, even if the challenge is delegated.
+    See delegated acme challenge https://letsencrypt.org/docs/challenge-types/#dns-01-challenge
+
+    :param domain: the domain to validate
+    :param cache: optional cache for the delegation targets
+    :param resolver: the dns.resolver.Resolver for the lookup, the default resolver if not provided
+    :param metrics: the metrics recording the lookup latency
+    :raise PluginError:  if not delegated to a duckdns.org domain.
+    :return: the duckdns.org subdomain
+    """
+
+    # valid duckdns.org subdomain
+    if is_valid_full_duckdns_domain(domain):
+        return domain
+
+    if cache is not None:
+        delegated_domain = cache.get(domain)
+        if delegated_domain is not None:
+            return delegated_domain
+
+    start = time.perf_counter()
+    try:
+        delegated_domain, ttl = _resolve_delegation(domain, resolver)
+    finally:
+        metrics.observe(
+            DNS_LOOKUP_DURATION, time.perf_counter() - start, record="delegation"
+        )
+
+    if cache is not None:
+        cache.set(domain, delegated_domain, ttl)
+
+    return delegated_domain
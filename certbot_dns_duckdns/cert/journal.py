@@ -0,0 +1,123 @@
+"""
+This module provides an append-only journal of the TXT records changed by the challenges.
+"""
+
+import json
+import logging
+import os
+import tempfile
+
+JOURNAL_FILE_NAME = "txt-journal.jsonl"
+
+logger = logging.getLogger(__name__)
+
+
+class TXTJournal:
+    """
+    Journal of the pending TXT changes, stored as JSON lines file. Before a TXT record of a root domain is set, the
+    value to restore is appended, and after the TXT records are restored, their root domains are appended as done.
+    Every entry is written with a single append to the file, so the journal survives a killed certbot process and a
+    later run can restore the TXT records of all root domains which are set but not done.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Creates a new TXTJournal object.
+
+        :param path: the path of the journal file
+        """
+        self._path = path
+
+    @property
+    def path(self) -> str:
+        """
+        The path of the journal file.
+        """
+        return self._path
+
+    def _append(self, entry: dict) -> None:
+        directory = os.path.dirname(self._path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd = os.open(self._path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, (json.dumps(entry) + "\n").encode("utf-8"))
+        finally:
+            os.close(fd)
+
+    def record_set(self, root_domain: str, restore: str) -> None:
+        """
+        Append that the TXT record of a root domain is about to be set.
+
+        :param root_domain: the DuckDNS root domain
+        :param restore: the TXT value to restore, empty to clear the TXT record
+
+        :raise OSError: if the journal can not be written
+        """
+        self._append({"op": "set", "domain": root_domain, "restore": restore})
+
+    def record_done(self, root_domains: list) -> None:
+        """
+        Append that the TXT records of root domains are restored.
+
+        :param root_domains: the DuckDNS root domains
+
+        :raise OSError: if the journal can not be written
+        """
+        if root_domains:
+            self._append({"op": "done", "domains": list(root_domains)})
+
+    def pending(self) -> dict:
+        """
+        Replay the journal to get the root domains whose TXT record is set but not restored. The first value to
+        restore of a root domain is kept, later sets are the challenge values of crashed runs. An incomplete last
+        line of a killed process is ignored.
+
+        :return: mapping of the root domains to the TXT value to restore
+        """
+
+        pending = {}
+        try:
+            with open(self._path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        logger.warning(
+                            "Ignoring invalid line in %s: %r", self._path, line
+                        )
+                        continue
+
+                    if entry.get("op") == "set":
+                        pending.setdefault(entry["domain"], entry.get("restore", ""))
+                    elif entry.get("op") == "done":
+                        for root_domain in entry.get("domains", []):
+                            pending.pop(root_domain, None)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Could not read the journal %s: %s", self._path, e)
+
+        return pending
+
+    def compact(self) -> None:
+        """
+        Replace the journal with the set entries of the pending root domains, or remove it if nothing is pending, so
+        the journal does not grow over the runs.
+        """
+
+        pending = self.pending()
+        try:
+            if not pending:
+                if os.path.exists(self._path):
+                    os.unlink(self._path)
+                return
+
+            directory = os.path.dirname(self._path) or "."
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for root_domain, restore in pending.items():
+                    entry = {"op": "set", "domain": root_domain, "restore": restore}
+                    f.write(f"{json.dumps(entry)}\n")
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.warning("Could not compact the journal %s: %s", self._path, e)
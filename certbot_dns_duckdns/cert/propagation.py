@@ -0,0 +1,243 @@
+"""
+This module provides helpers to actively check the propagation of TXT records on the DuckDNS nameservers and on a
+quorum of public resolvers.
+"""
+
+import concurrent.futures
+import logging
+import threading
+import time
+
+import dns.exception
+import dns.message
+import dns.query
+import dns.rdatatype
+import dns.resolver
+
+from certbot_dns_duckdns.cert.resolver import DNS_PORT, resolve
+
+logger = logging.getLogger(__name__)
+
+DUCKDNS_ZONE = "duckdns.org"
+DEFAULT_QUERY_TIMEOUT = 2.0
+DEFAULT_INITIAL_DELAY = 1.0
+DEFAULT_MAX_DELAY = 8.0
+DEFAULT_BACKOFF_FACTOR = 2.0
+
+
+def get_authoritative_nameservers(
+    zone: str = DUCKDNS_ZONE, resolver: dns.resolver.Resolver = None
+) -> list:
+    """
+    Get the IPv4 addresses of the authoritative nameservers of a zone.
+
+    :param zone: the zone for which the nameservers should be looked up
+    :param resolver: the resolver for the lookups, the default resolver if not provided
+
+    :return: list of nameserver IP addresses, empty if the lookup failed
+    """
+
+    addresses = []
+    try:
+        nameservers = [ns.to_text().rstrip(".") for ns in resolve(zone, "NS", resolver)]
+    except dns.exception.DNSException as e:
+        logger.debug("Could not resolve the nameservers of %s: %s", zone, e)
+        return addresses
+
+    for nameserver in nameservers:
+        try:
+            addresses.extend(a.to_text() for a in resolve(nameserver, "A", resolver))
+        except dns.exception.DNSException as e:
+            logger.debug("Could not resolve the address of %s: %s", nameserver, e)
+
+    return addresses
+
+
+def is_txt_record_served(
+    name: str,
+    value: str,
+    nameserver: str,
+    timeout: float = DEFAULT_QUERY_TIMEOUT,
+    port: int = DNS_PORT,
+) -> bool:
+    """
+    Check if a nameserver serves the given value as TXT record of a domain.
+
+    :param name: the domain name of the TXT record
+    :param value: the expected TXT value
+    :param nameserver: the IP address of the nameserver to query
+    :param timeout: the timeout for the query in seconds
+    :param port: the port of the nameserver
+
+    :return: True if the value is served by the nameserver, otherwise False
+    """
+
+    query = dns.message.make_query(name, dns.rdatatype.TXT)
+    try:
+        response = dns.query.udp(query, nameserver, timeout=timeout, port=port)
+    except (dns.exception.DNSException, OSError) as e:
+        logger.debug("TXT query for %s at %s failed: %s", name, nameserver, e)
+        return False
+
+    for rrset in response.answer:
+        if rrset.rdtype != dns.rdatatype.TXT:
+            continue
+        for rdata in rrset:
+            if b"".join(rdata.strings).decode() == value:
+                return True
+
+    return False
+
+
+# pylint: disable-next=too-many-arguments
+def wait_for_txt_records(
+    records: dict,
+    nameservers: list,
+    timeout: float,
+    initial_delay: float = DEFAULT_INITIAL_DELAY,
+    max_delay: float = DEFAULT_MAX_DELAY,
+    *,
+    port: int = DNS_PORT,
+) -> bool:
+    """
+    Poll the nameservers until every one of them serves the expected TXT values.
+    The delay between the polling rounds grows exponentially up to the maximum delay.
+
+    :param records: mapping of domain names to the expected TXT value
+    :param nameservers: the IP addresses of the nameservers to query
+    :param timeout: the maximum time to wait in seconds
+    :param initial_delay: the delay before the second polling round in seconds
+    :param max_delay: the upper bound of the delay between two polling rounds in seconds
+    :param port: the port of the nameservers
+
+    :return: True if all nameservers serve all records before the timeout, otherwise False
+    """
+
+    deadline = time.monotonic() + timeout
+    pending = {
+        (name, ns): value for name, value in records.items() for ns in nameservers
+    }
+    delay = initial_delay
+
+    while True:
+        pending = {
+            key: value
+            for key, value in pending.items()
+            if not is_txt_record_served(key[0], value, key[1], port=port)
+        }
+        if not pending:
+            return True
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.debug(
+                "TXT records not served before the deadline: %s",
+                ", ".join(f"{name}@{ns}" for name, ns in pending),
+            )
+            return False
+
+        time.sleep(min(delay, remaining))
+        delay = min(delay * DEFAULT_BACKOFF_FACTOR, max_delay)
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+def _poll_resolver(
+    records: dict,
+    resolver: str,
+    port: int,
+    deadline: float,
+    stop: threading.Event,
+    delays: tuple,
+):
+    """
+    Poll a resolver until it serves all TXT values, the deadline is reached or the polling is stopped.
+
+    :param records: mapping of domain names to the expected TXT value
+    :param resolver: the IP address of the resolver to query
+    :param port: the port of the resolver
+    :param deadline: the monotonic time of the deadline
+    :param stop: event which stops the polling, e.g. when the quorum is reached
+    :param delays: tuple of the delay before the second polling round and the maximum delay in seconds
+
+    :return: the time in seconds until the resolver served all values or None if it did not serve them
+    """
+
+    start = time.monotonic()
+    pending = dict(records)
+    delay, max_delay = delays
+
+    while not stop.is_set():
+        pending = {
+            name: value
+            for name, value in pending.items()
+            if not is_txt_record_served(name, value, resolver, port=port)
+        }
+        if not pending:
+            return time.monotonic() - start
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or stop.wait(min(delay, remaining)):
+            break
+        delay = min(delay * DEFAULT_BACKOFF_FACTOR, max_delay)
+
+    return None
+
+
+# pylint: disable-next=too-many-arguments
+def wait_for_quorum(
+    records: dict,
+    resolvers: list,
+    quorum: int,
+    timeout: float,
+    *,
+    initial_delay: float = DEFAULT_INITIAL_DELAY,
+    max_delay: float = DEFAULT_MAX_DELAY,
+    port: int = DNS_PORT,
+) -> dict:
+    """
+    Poll the resolvers concurrently until a quorum of them serves the expected TXT values, like the multiple vantage
+    points of the ACME validation. Every resolver is polled in its own thread with an exponentially growing delay, and
+    the polling of all resolvers stops as soon as the quorum is reached.
+
+    :param records: mapping of domain names to the expected TXT value
+    :param resolvers: the IP addresses of the resolvers to query
+    :param quorum: the number of resolvers which must serve the values
+    :param timeout: the maximum time to wait in seconds
+    :param initial_delay: the delay before the second polling round of a resolver in seconds
+    :param max_delay: the upper bound of the delay between two polling rounds of a resolver in seconds
+    :param port: the port of the resolvers
+
+    :return: mapping of the resolvers which served all values to their lag in seconds, the quorum is reached if it
+        contains at least quorum resolvers
+    """
+
+    deadline = time.monotonic() + timeout
+    stop = threading.Event()
+    lags = {}
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(resolvers))
+    try:
+        futures = {
+            executor.submit(
+                _poll_resolver,
+                records,
+                resolver,
+                port,
+                deadline,
+                stop,
+                (initial_delay, max_delay),
+            ): resolver
+            for resolver in resolvers
+        }
+        for future in concurrent.futures.as_completed(futures):
+            lag = future.result()
+            if lag is not None:
+                lags[futures[future]] = lag
+                if len(lags) >= quorum:
+                    break
+    finally:
+        # the pending queries of the other resolvers are not awaited
+        stop.set()
+        executor.shutdown(wait=False)
+
+    return lags
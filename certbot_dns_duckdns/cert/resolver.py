@@ -0,0 +1,64 @@
+"""
+This module provides the configurable DNS resolver for the TXT snapshot, delegation and nameserver lookups.
+"""
+
+import dns.resolver
+import dns.version
+
+DNS_PORT = 53
+
+
+def create_resolver(
+    nameservers: list, timeout: float, lifetime: float, cache=None, port: int = None
+) -> dns.resolver.Resolver:
+    """
+    Create a resolver querying the given nameservers. Without nameservers, the nameservers and the port of the
+    default resolver of dnspython are used, which are read from the system configuration.
+
+    :param nameservers: the IP addresses of the nameservers to query, the system nameservers if empty
+    :param timeout: the timeout of a single query to one nameserver in seconds
+    :param lifetime: the maximum time of a whole lookup, including the retries on other nameservers, in seconds
+    :param cache: optional cache of the answers shared by all resolvers using it
+    :param port: the port of the given nameservers, DNS_PORT if not provided
+
+    :raise ValueError: if a nameserver is not a valid IP address
+    :raise DNSException: if no nameservers are given and the system configuration can not be read
+    :return: the created resolver
+    """
+
+    resolver = dns.resolver.Resolver(configure=False)
+    if nameservers:
+        resolver.nameservers = list(nameservers)
+        resolver.port = DNS_PORT if port is None else port
+    else:
+        default_resolver = dns.resolver.get_default_resolver()
+        resolver.nameservers = list(default_resolver.nameservers)
+        resolver.port = default_resolver.port
+    resolver.timeout = timeout
+    resolver.lifetime = lifetime
+    resolver.cache = cache
+
+    return resolver
+
+
+def resolve(qname: str, rdtype: str, resolver: dns.resolver.Resolver = None, **kwargs):
+    """
+    Resolve a record with the given resolver or the default resolver of dnspython.
+
+    :param qname: the name to resolve
+    :param rdtype: the record type to resolve
+    :param resolver: the resolver to use, the default resolver if not provided
+    :param kwargs: further arguments of the lookup, e.g. raise_on_no_answer
+
+    :raise DNSException: if the record can not be resolved
+    :return: the answer of the lookup
+    """
+
+    if resolver is None:
+        if dns.version.MAJOR > 1:
+            return dns.resolver.resolve(qname, rdtype, **kwargs)
+        return dns.resolver.query(qname, rdtype, **kwargs)
+
+    if dns.version.MAJOR > 1:
+        return resolver.resolve(qname, rdtype, **kwargs)
+    return resolver.query(qname, rdtype, **kwargs)
@@ -0,0 +1,195 @@
+"""
+This module provides a pool of DuckDNS challenge slots, which are leased exclusively for the challenges using them.
+
+Every DuckDNS root domain has a single TXT record, its challenge slot. Domains delegate their acme challenges with a
+CNAME record of _acme-challenge.<domain> to a slot of the pool, so spreading the delegations of many domains over many
+slots lets their validations run in parallel. Before a TXT record of a slot is set, the slot is leased, so concurrent
+certbot runs delegating to the same slot wait for each other instead of overwriting each other's validation values.
+"""
+
+import os
+import time
+
+from certbot_dns_duckdns.duckdns.client import classify_domain
+
+try:
+    import fcntl
+except ImportError:
+    # without file locks, e.g. on Windows, the slots are not leased across processes
+    fcntl = None
+
+DEFAULT_LEASE_TIMEOUT = 600.0
+# maximum delay between two attempts to lease a slot in seconds
+MAX_POLL_INTERVAL = 1.0
+
+
+class SlotLeaseError(Exception):
+    """
+    Exception if a slot can not be leased.
+    """
+
+
+class FileLockSlotBackend:
+    """
+    Backend leasing the slots with exclusive locks of one file per slot. The operating system releases the locks of a
+    killed process, so a crashed run never blocks a slot.
+    """
+
+    def __init__(self, lock_dir: str) -> None:
+        """
+        Creates a new FileLockSlotBackend object.
+
+        :param lock_dir: the directory of the lock files shared by the certbot processes
+        """
+        self.lock_dir = lock_dir
+        self._fds = {}
+
+    def try_acquire(self, slot: str) -> bool:
+        """
+        Try to lease a slot without waiting.
+
+        :param slot: the root domain of the slot
+
+        :raise OSError: if the lock file can not be opened
+        :return: True if the slot is leased, False if it is leased by another process
+        """
+
+        if slot in self._fds:
+            return True
+
+        os.makedirs(self.lock_dir, exist_ok=True)
+        fd = os.open(
+            os.path.join(self.lock_dir, f"{slot}.lock"), os.O_RDWR | os.O_CREAT, 0o600
+        )
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+
+        self._fds[slot] = fd
+        return True
+
+    def release(self, slot: str) -> None:
+        """
+        Release a leased slot.
+
+        :param slot: the root domain of the slot
+        """
+
+        fd = self._fds.pop(slot, None)
+        if fd is not None:
+            # closing the file releases the lock
+            os.close(fd)
+
+
+class SlotPool:
+    """
+    Pool of DuckDNS root domains used as challenge slots by the delegated acme challenges.
+    """
+
+    def __init__(
+        self, slots: list, backend, timeout: float = DEFAULT_LEASE_TIMEOUT
+    ) -> None:
+        """
+        Creates a new SlotPool object.
+
+        :param slots: the root domains of the slots, with or without the ".duckdns.org" suffix
+        :param backend: the backend leasing the slots with the methods try_acquire(slot) and release(slot)
+        :param timeout: the maximum time in seconds to wait for a slot leased by another process
+
+        :raise ValueError: if a slot is not a valid DuckDNS root domain
+        """
+
+        self.slots = set()
+        for slot in slots:
+            full_domain = classify_domain(slot.strip().lower()).full_domain
+            root_domain = (
+                classify_domain(full_domain).root_domain if full_domain else None
+            )
+            if root_domain is None or root_domain != full_domain:
+                raise ValueError(f'The slot "{slot}" is not a DuckDNS root domain.')
+            self.slots.add(full_domain)
+
+        self._backend = backend
+        self._timeout = timeout
+        self._leased = set()
+
+    def __contains__(self, root_domain: str) -> bool:
+        return root_domain in self.slots
+
+    def lease(self, root_domains: list) -> None:
+        """
+        Lease the slots of root domains, waiting for the slots leased by other processes. The slots are leased in
+        sorted order, so processes leasing overlapping slots can not deadlock.
+
+        :param root_domains: the root domains of the slots
+
+        :raise SlotLeaseError: if a root domain is not in the pool or a slot is not released within the timeout, no
+            slot of the root domains is leased then
+        """
+
+        missing = [d for d in root_domains if d not in self.slots]
+        if missing:
+            raise SlotLeaseError(
+                f"The challenges are delegated to {', '.join(sorted(missing))}, which is not in the slot pool."
+            )
+
+        deadline = time.monotonic() + self._timeout
+        leased = []
+        try:
+            for slot in sorted(set(root_domains) - self._leased):
+                self._acquire(slot, deadline)
+                leased.append(slot)
+        except (SlotLeaseError, OSError) as e:
+            for slot in leased:
+                self._backend.release(slot)
+            raise SlotLeaseError(e) from e
+
+        self._leased.update(leased)
+
+    def try_lease(self, root_domain: str) -> bool:
+        """
+        Lease the slot of a root domain without waiting for another process.
+
+        :param root_domain: the root domain of the slot
+
+        :raise SlotLeaseError: if the root domain is not in the pool or the slot can not be leased
+        :return: True if the slot is leased, False if it is leased by another process
+        """
+
+        if root_domain not in self.slots:
+            raise SlotLeaseError(f'"{root_domain}" is not in the slot pool.')
+        if root_domain in self._leased:
+            return True
+
+        try:
+            leased = self._backend.try_acquire(root_domain)
+        except OSError as e:
+            raise SlotLeaseError(e) from e
+        if leased:
+            self._leased.add(root_domain)
+        return leased
+
+    def _acquire(self, slot: str, deadline: float) -> None:
+        interval = 0.05
+        while not self._backend.try_acquire(slot):
+            if time.monotonic() + interval > deadline:
+                raise SlotLeaseError(
+                    f'The slot "{slot}" is leased by another certbot run.'
+                )
+            time.sleep(interval)
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+    def release(self, root_domains: list = None) -> None:
+        """
+        Release leased slots.
+
+        :param root_domains: the root domains of the slots, all leased slots if not provided
+        """
+
+        for slot in list(self._leased if root_domains is None else root_domains):
+            if slot in self._leased:
+                self._backend.release(slot)
+                self._leased.discard(slot)
@@ -0,0 +1,61 @@
+"""
+This module provides a persistent store of the original TXT values of DuckDNS domains.
+"""
+
+from certbot_dns_duckdns.cert.storage import JSONFileStore
+
+SNAPSHOT_FILE_NAME = "txt-snapshots.json"
+
+
+class TXTSnapshotStore(JSONFileStore):
+    """
+    Store of the TXT values DuckDNS root domains had before a challenge, stored as JSON file. A snapshot is kept
+    until the original value is restored, so a later run can restore the values of a crashed run.
+    """
+
+    def get(self, root_domain: str):
+        """
+        Get the original TXT value of a root domain.
+
+        :param root_domain: the DuckDNS root domain
+
+        :return: the original TXT value or None if there is no snapshot of the root domain
+        """
+        return self._load().get(root_domain)
+
+    def __contains__(self, root_domain: str) -> bool:
+        return root_domain in self._load()
+
+    def items(self) -> list:
+        """
+        Get all snapshots.
+
+        :return: list of tuples of the root domain and its original TXT value
+        """
+        return list(self._load().items())
+
+    def record(self, root_domain: str, txt: str) -> None:
+        """
+        Store the original TXT value of a root domain. An existing snapshot is not overwritten, because the current
+        value may be a left over challenge value of a crashed run.
+
+        :param root_domain: the DuckDNS root domain
+        :param txt: the original TXT value, empty if there was no TXT value
+        """
+
+        entries = self._load()
+        if root_domain not in entries:
+            entries[root_domain] = txt
+            self._save()
+
+    def discard(self, root_domains: list) -> None:
+        """
+        Remove the snapshots of root domains whose original TXT value was restored.
+
+        :param root_domains: the DuckDNS root domains
+        """
+
+        entries = self._load()
+        removed = [entries.pop(d) for d in root_domains if d in entries]
+        if removed:
+            self._save()
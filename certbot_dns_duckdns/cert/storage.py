@@ -0,0 +1,57 @@
+"""
+This module provides the base for the JSON files the plugin keeps in the certbot work directory.
+"""
+
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+class JSONFileStore:  # pylint: disable=too-few-public-methods
+    """
+    Dictionary stored as JSON file. The file is only read on first use and replaced atomically on every save, so
+    concurrent readers never see a partially written file.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Creates a new JSONFileStore object.
+
+        :param path: the path of the JSON file
+        """
+        self._path = path
+        self._entries = None
+
+    @property
+    def path(self) -> str:
+        """
+        The path of the JSON file.
+        """
+        return self._path
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            try:
+                with open(self._path, encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except FileNotFoundError:
+                self._entries = {}
+            except (OSError, ValueError) as e:
+                logger.warning("Ignoring unreadable file %s: %s", self._path, e)
+                self._entries = {}
+
+        return self._entries
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self._path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.warning("Could not write the file %s: %s", self._path, e)
@@ -0,0 +1,77 @@
+"""
+This module provides the routing of DuckDNS domains to the tokens of the DuckDNS accounts owning them.
+"""
+
+import fnmatch
+import re
+
+from certbot_dns_duckdns.duckdns.client import DUCKDNS_SUFFIX
+
+
+def _normalize(domain: str) -> str:
+    domain = domain.strip().lower().rstrip(".")
+    if domain != DUCKDNS_SUFFIX[1:] and not domain.endswith(DUCKDNS_SUFFIX):
+        domain += DUCKDNS_SUFFIX
+    return domain
+
+
+class TokenRouter:  # pylint: disable=too-few-public-methods
+    """
+    Lookup of the token for a DuckDNS root domain. The routes map domain patterns to tokens, a pattern is either a
+    root domain, e.g. "example.duckdns.org" or "example", or a glob pattern, e.g. "team-*". Exact domains are looked up
+    in a dict and take precedence over the glob patterns. All glob patterns are compiled into a single regular
+    expression, so the first matching pattern in the order of the routes wins. Domains without a matching route use
+    the default token.
+    """
+
+    def __init__(self, routes: dict, default: str = None) -> None:
+        """
+        Creates a new TokenRouter object.
+
+        :param routes: mapping of domain patterns to tokens
+        :param default: the token for domains without a matching route
+
+        :raise ValueError: if a route has no token
+        """
+
+        self.default = default
+        self._exact = {}
+        self._pattern_tokens = []
+        patterns = []
+
+        for pattern, token in routes.items():
+            if not isinstance(token, str) or not token.strip():
+                raise ValueError(f'The domain pattern "{pattern}" has no token.')
+
+            pattern = _normalize(pattern)
+            if any(c in pattern for c in "*?["):
+                patterns.append(
+                    f"(?P<p{len(self._pattern_tokens)}>{fnmatch.translate(pattern)})"
+                )
+                self._pattern_tokens.append(token.strip())
+            else:
+                self._exact.setdefault(pattern, token.strip())
+
+        self._patterns = re.compile("|".join(patterns)) if patterns else None
+
+    def get_token(self, root_domain: str):
+        """
+        Get the token for a DuckDNS root domain.
+
+        :param root_domain: the DuckDNS root domain, with or without the ".duckdns.org" suffix
+
+        :return: the token of the first matching route, the default token if no route matches
+        """
+
+        domain = _normalize(root_domain)
+
+        token = self._exact.get(domain)
+        if token is not None:
+            return token
+
+        if self._patterns is not None:
+            match = self._patterns.match(domain)
+            if match is not None:
+                return self._pattern_tokens[int(match.lastgroup[1:])]
+
+        return self.default
@@ -0,0 +1,3 @@
+"""
+Command line tools to run the DuckDNS plugin for many certificates.
+"""
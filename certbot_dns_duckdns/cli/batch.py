@@ -0,0 +1,613 @@
+"""
+Renew many DuckDNS certificates in parallel.
+
+Each DuckDNS root domain has only a single TXT record, so certificates whose domains share a DuckDNS root domain are
+renewed one after another by the same worker. All other certificates are renewed concurrently, limited by a global
+number of workers, even if they share a certbot config directory.
+
+Certbot locks its config, work and logs directories for the whole run, so a certbot process per certificate would
+serialize all certificates of a config directory. Instead, the batch process takes the certbot lock of every config
+directory for the duration of the renewals and the workers call certbot in-process in a pool of worker processes,
+sharing the lock of the batch process. Every worker has its own work and logs directory per config directory.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import logging
+import os
+import queue
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import NamedTuple
+
+import certbot
+import configobj
+import dns.exception
+from certbot import errors
+from certbot import util as certbot_util
+from cryptography import x509
+
+from certbot_dns_duckdns.cert.cache import SHARED_CACHE_FILE_NAME
+from certbot_dns_duckdns.cert.client import (
+    RATE_LIMIT_FILE_NAME,
+    SLOT_LOCK_DIR_NAME,
+    STATE_DIR_NAME,
+    Authenticator,
+    get_duckdns_domain,
+)
+from certbot_dns_duckdns.duckdns.client import DuckDNSClient, NotValidDuckdnsDomainError
+from certbot_dns_duckdns.metrics import Metrics
+
+DEFAULT_CONFIG_DIR = "/etc/letsencrypt"
+DEFAULT_WORK_DIR = "/var/lib/letsencrypt"
+DEFAULT_LOGS_DIR = "/var/log/letsencrypt"
+DEFAULT_MAX_WORKERS = 10
+# major versions of certbot whose private lock registry is shared with the workers, see check_certbot_locks
+SUPPORTED_CERTBOT_MAJOR_VERSIONS = range(1, 6)
+# plugin options of the state shared by all workers, which default to a path below the base work directory
+SHARED_STATE_OPTIONS = {
+    "--dns-duckdns-rate-limit-file": RATE_LIMIT_FILE_NAME,
+    "--dns-duckdns-slot-lock-dir": SLOT_LOCK_DIR_NAME,
+    "--dns-duckdns-shared-cache-file": SHARED_CACHE_FILE_NAME,
+}
+METRICS_FILE_OPTION = "--dns-duckdns-metrics-file"
+METRICS_FORMAT_OPTION = "--dns-duckdns-metrics-format"
+# metrics file of a worker below its work directory, the metrics of all workers are written to the metrics file by the
+# parent process
+WORKER_METRICS_FILE_NAME = "metrics.prom"
+
+logger = logging.getLogger(__name__)
+
+
+class Lineage(NamedTuple):
+    """
+    A certificate lineage managed by certbot.
+    """
+
+    name: str
+    config_dir: str
+    domains: list
+    # expiry of the current certificate as POSIX timestamp
+    expires: float = None
+
+
+class RenewalResult(NamedTuple):
+    """
+    The result of the renewal of a single certificate lineage.
+    """
+
+    lineage: Lineage
+    returncode: int
+    duration: float
+    # the process id of the worker and the snapshot of all metrics recorded by the worker process so far
+    metrics: tuple = None
+
+
+def load_lineage(lineage: str, config_dir: str = DEFAULT_CONFIG_DIR) -> Lineage:
+    """
+    Load the domains of a certificate lineage.
+
+    :param lineage: the certificate name or the path to the renewal configuration file of the lineage
+    :param config_dir: the certbot config directory used if only the certificate name is given
+
+    :raise Error: if the renewal configuration or the certificate can not be loaded
+    :return: the loaded lineage
+    """
+
+    if lineage.endswith(".conf") and os.path.isfile(lineage):
+        renewal_file = os.path.abspath(lineage)
+        config_dir = os.path.dirname(os.path.dirname(renewal_file))
+        name = os.path.splitext(os.path.basename(renewal_file))[0]
+    else:
+        name = lineage
+        renewal_file = os.path.join(config_dir, "renewal", f"{name}.conf")
+
+    try:
+        renewal_config = configobj.ConfigObj(
+            renewal_file, file_error=True, encoding="utf-8"
+        )
+        with open(renewal_config["cert"], "rb") as f:
+            cert = x509.load_pem_x509_certificate(f.read())
+    except (OSError, KeyError, ValueError, configobj.ConfigObjError) as e:
+        raise errors.Error(
+            f'Could not load the certificate lineage "{lineage}": {e}'
+        ) from e
+
+    try:
+        san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName)
+        domains = san.value.get_values_for_type(x509.DNSName)
+    except x509.ExtensionNotFound:
+        domains = []
+
+    return Lineage(
+        name,
+        os.path.abspath(config_dir),
+        domains,
+        cert.not_valid_after_utc.timestamp(),
+    )
+
+
+# errors if the DuckDNS root domain of a domain can not be determined
+ROOT_DOMAIN_ERRORS = (
+    errors.PluginError,
+    NotValidDuckdnsDomainError,
+    dns.exception.DNSException,
+)
+
+
+def get_root_domain(domain: str) -> str:
+    """
+    Get the DuckDNS root domain whose TXT record is used for the challenge of a domain.
+
+    :param domain: a domain of a certificate, the challenge of a wildcard domain uses the TXT record of its base domain
+
+    :raise PluginError: if the domain is not delegated to a DuckDNS domain
+    :raise NotValidDuckdnsDomainError: if the DuckDNS domain is not valid
+    :raise DNSException: if the delegation can not be resolved
+    :return: the root domain
+    """
+
+    if domain.startswith("*."):
+        domain = domain[2:]
+
+    return DuckDNSClient.__get_validated_root_domain__(get_duckdns_domain(domain))
+
+
+def get_root_domains(domains: list) -> set:
+    """
+    Get the DuckDNS root domains whose TXT records are used for the challenges of the domains.
+    If the root domain of a domain can not be determined, the domain itself is used.
+
+    :param domains: the domains of a certificate
+
+    :return: set of the root domains
+    """
+
+    root_domains = set()
+    for domain in domains:
+        try:
+            root_domains.add(get_root_domain(domain))
+        except ROOT_DOMAIN_ERRORS as e:
+            logger.warning("Could not get the DuckDNS root domain of %s: %s", domain, e)
+            root_domains.add(domain)
+
+    return root_domains
+
+
+def group_lineages(lineages: list) -> list:
+    """
+    Group the lineages which can not be renewed concurrently, because they share the TXT record of a DuckDNS root
+    domain. Lineages sharing only a certbot config directory or a DuckDNS token are renewed concurrently.
+
+    :param lineages: the lineages to group
+
+    :return: list of the groups, each a list of lineages, the largest group first
+    """
+
+    groups = []
+    for lineage in lineages:
+        resources = get_root_domains(lineage.domains)
+        group_lineages_ = [lineage]
+
+        remaining_groups = []
+        for group_resources, group_members in groups:
+            if group_resources & resources:
+                resources |= group_resources
+                group_lineages_ = group_members + group_lineages_
+            else:
+                remaining_groups.append((group_resources, group_members))
+
+        groups = remaining_groups + [(resources, group_lineages_)]
+
+    return sorted((members for _, members in groups), key=len, reverse=True)
+
+
+def _dir_for(base_dir: str, config_dir: str, worker: int) -> str:
+    # every worker gets its own work and logs directory per certbot config directory, because certbot locks them too
+    config_hash = hashlib.sha256(config_dir.encode()).hexdigest()[:16]
+    return os.path.join(base_dir, f"{config_hash}-{worker}")
+
+
+def certbot_command(
+    lineage: Lineage, args: argparse.Namespace, worker: int = 0
+) -> list:
+    """
+    Build the certbot arguments to renew a single lineage.
+
+    :param lineage: the lineage to renew
+    :param args: the parsed arguments of the batch command
+    :param worker: the index of the worker renewing the lineage
+
+    :return: the certbot arguments as list
+    """
+
+    work_dir = _dir_for(args.work_dir, lineage.config_dir, worker)
+    return [
+        "renew",
+        "--non-interactive",
+        "--cert-name",
+        lineage.name,
+        "--config-dir",
+        lineage.config_dir,
+        "--work-dir",
+        work_dir,
+        "--logs-dir",
+        _dir_for(args.logs_dir, lineage.config_dir, worker),
+        *_shared_state_args(args),
+        *_worker_certbot_args(args, work_dir),
+    ]
+
+
+def _shared_state_args(args: argparse.Namespace) -> list:
+    # the work directory of every worker is locked by certbot, so the state shared by the workers is kept below the
+    # base work directory unless it is set explicitly
+    shared_state_args = []
+    for option, name in SHARED_STATE_OPTIONS.items():
+        if not any(
+            arg == option or arg.startswith(f"{option}=") for arg in args.certbot_args
+        ):
+            shared_state_args += [
+                option,
+                os.path.join(args.work_dir, STATE_DIR_NAME, name),
+            ]
+    return shared_state_args
+
+
+def check_certbot_locks() -> None:
+    """
+    Check that the installed certbot has the private lock registry the batch renewal relies on. The workers share the
+    locks of the parent process by replacing the registered locks of certbot.util, which is not part of the public
+    API of certbot and only known to work with the supported major versions.
+
+    :raise Error: if the installed certbot is not supported
+    """
+
+    major_version = certbot.__version__.split(".", 1)[0]
+    major_version = int(major_version) if major_version.isdigit() else None
+    if major_version not in SUPPORTED_CERTBOT_MAJOR_VERSIONS:
+        raise errors.Error(
+            f"certbot {certbot.__version__} is not supported, the certbot locks can not be shared with the workers"
+        )
+    if not all(
+        hasattr(certbot_util, name)
+        for name in ("_LOCKS", "_release_locks", "lock_dir_until_exit")
+    ):
+        raise errors.Error(
+            f"certbot {certbot.__version__} has no lock registry, the certbot locks can not be shared with the workers"
+        )
+
+
+def _worker_certbot_args(args: argparse.Namespace, work_dir: str) -> list:
+    # every worker process only records its own renewals, so the workers write their metrics below their own work
+    # directory and the parent process writes the metrics of all workers to the metrics file, see MetricsAggregator
+    metrics_file = os.path.join(work_dir, STATE_DIR_NAME, WORKER_METRICS_FILE_NAME)
+    worker_args = []
+    for arg in args.certbot_args:
+        if worker_args and worker_args[-1] == METRICS_FILE_OPTION:
+            worker_args.append(metrics_file)
+        elif arg.startswith(f"{METRICS_FILE_OPTION}="):
+            worker_args.append(f"{METRICS_FILE_OPTION}={metrics_file}")
+        else:
+            worker_args.append(arg)
+    return worker_args
+
+
+def _certbot_option(certbot_args: list, option: str) -> str:
+    # the value of an option given to certbot as separate argument or after "=", the last one wins like in certbot
+    value = None
+    for i, arg in enumerate(certbot_args):
+        if arg == option and i + 1 < len(certbot_args):
+            value = certbot_args[i + 1]
+        elif arg.startswith(f"{option}="):
+            value = arg.split("=", 1)[1]
+    return value
+
+
+class MetricsAggregator:
+    """
+    Metrics file of the renewals in the worker processes. Every worker process records the metrics of its own
+    renewals, so the metrics file is written by the parent process from the latest metrics of every worker process.
+    """
+
+    def __init__(self, certbot_args: list) -> None:
+        """
+        Creates a new MetricsAggregator object.
+
+        :param certbot_args: the arguments passed to certbot, the metrics file and format are taken from them
+        """
+
+        self.path = _certbot_option(certbot_args, METRICS_FILE_OPTION)
+        self.openmetrics = (
+            _certbot_option(certbot_args, METRICS_FORMAT_OPTION) == "openmetrics"
+        )
+        # latest snapshot of the metrics by process id of the worker
+        self._snapshots = {}
+
+    def add(self, results: list) -> None:
+        """
+        Add the metrics of the worker processes of renewals.
+
+        :param results: the results of the renewals
+        """
+
+        for result in results:
+            if result.metrics is not None:
+                pid, snapshot = result.metrics
+                self._snapshots[pid] = snapshot
+
+    def write(self) -> None:
+        """
+        Write the sum of the metrics of all worker processes to the metrics file, if any. Failures are only logged,
+        like by the plugin itself.
+        """
+
+        if not self.path:
+            return
+
+        metrics = Metrics()
+        for snapshot in self._snapshots.values():
+            metrics.merge(snapshot)
+        try:
+            metrics.write_textfile(self.path, openmetrics=self.openmetrics)
+        except OSError as e:
+            logger.warning("Could not write the metrics file %s: %s", self.path, e)
+
+
+class _ParentLock:  # pylint: disable=too-few-public-methods
+    """
+    Certbot lock of a directory held by the parent process.
+    """
+
+    def release(self) -> None:
+        """
+        Keep the lock, it is released by the parent process.
+        """
+
+
+@contextlib.contextmanager
+def lock_config_dirs(lineages: list):
+    """
+    Take the certbot lock of the config directories of the lineages for the duration of their renewals, so no other
+    certbot instance uses them meanwhile. The renewals in the worker processes share the lock of this process.
+
+    :param lineages: the lineages to renew
+
+    :raise LockError: if a config directory is locked by another certbot instance
+    :raise Error: if the installed certbot is not supported
+    """
+
+    check_certbot_locks()
+    try:
+        for config_dir in sorted({lineage.config_dir for lineage in lineages}):
+            certbot_util.lock_dir_until_exit(config_dir)
+        yield
+    finally:
+        certbot_util._release_locks()  # pylint: disable=protected-access
+
+
+def renew_in_process(
+    lineage: Lineage, args: argparse.Namespace, worker: int = 0
+) -> RenewalResult:
+    """
+    Renew a single lineage by calling certbot in the current worker process. The config directory of the lineage must
+    be locked by the parent process with lock_config_dirs.
+
+    :param lineage: the lineage to renew
+    :param args: the parsed arguments of the batch command
+    :param worker: the index of the worker renewing the lineage
+
+    :return: the result of the renewal
+    """
+
+    root_logger = logging.getLogger()
+    handlers = list(root_logger.handlers)
+    level = root_logger.level
+    excepthook = sys.excepthook
+
+    # the locks inherited from the parent process must not be released here, and certbot shares the lock of the
+    # config directory held by the parent process instead of failing to lock it again
+    # pylint: disable=protected-access
+    certbot_util._LOCKS.clear()
+    certbot_util._LOCKS[lineage.config_dir] = _ParentLock()
+
+    # certbot.main is only imported by the workers, not by the commands only grouping the lineages
+    from certbot import main as certbot_main  # pylint: disable=import-outside-toplevel
+
+    start = time.monotonic()
+    try:
+        result = certbot_main.main(certbot_command(lineage, args, worker))
+        if isinstance(result, str):
+            logger.error(result)
+        returncode = 1 if result else 0
+    except errors.Error as e:
+        logger.error("Renewal of %s failed: %s", lineage.name, e)
+        returncode = 1
+    except SystemExit as e:
+        returncode = 1 if e.code else 0
+    finally:
+        # certbot configures the logging and locks its directories for the life of the process,
+        # so undo both for the next renewal in this process
+        for handler in root_logger.handlers:
+            if handler not in handlers:
+                root_logger.removeHandler(handler)
+                handler.close()
+        root_logger.setLevel(level)
+        sys.excepthook = excepthook
+        certbot_util._release_locks()
+
+    # the metrics of the renewals of this process, summed up with the other workers by MetricsAggregator
+    metrics = Authenticator._metrics
+    return RenewalResult(
+        lineage,
+        returncode,
+        time.monotonic() - start,
+        None if metrics is None else (os.getpid(), metrics.snapshot()),
+    )
+
+
+def renew_lineages(groups: list, args: argparse.Namespace, renew) -> list:
+    """
+    Renew the groups of lineages concurrently. The lineages of a group are renewed one after another.
+
+    :param groups: the groups of lineages
+    :param args: the parsed arguments of the batch command
+    :param renew: function renewing a single lineage, called with the lineage, the arguments and the index of the
+        worker, no two concurrent calls get the same index
+
+    :return: list of the results of all renewals
+    """
+
+    workers = queue.SimpleQueue()
+    for worker in range(args.max_workers):
+        workers.put(worker)
+
+    def renew_group(group):
+        worker = workers.get()
+        try:
+            return [renew(lineage, args, worker) for lineage in group]
+        finally:
+            workers.put(worker)
+
+    with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
+        return [
+            result
+            for group_results in executor.map(renew_group, groups)
+            for result in group_results
+        ]
+
+
+def split_certbot_args(argv: list) -> tuple:
+    """
+    Split the command line arguments at "--" into the own arguments and the arguments passed to certbot.
+
+    :param argv: the command line arguments without the program name
+
+    :return: tuple of the own arguments and the certbot arguments
+    """
+
+    if "--" not in argv:
+        return argv, []
+
+    separator = argv.index("--")
+    # the separator itself is dropped
+    return argv[:separator], argv[separator:][1:]
+
+
+def add_renewal_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the arguments of the certbot directories and the renewal concurrency to a parser.
+
+    :param parser: the parser to add the arguments to
+    """
+
+    parser.add_argument(
+        "--config-dir",
+        default=DEFAULT_CONFIG_DIR,
+        help="certbot config directory of the certificate names",
+    )
+    parser.add_argument(
+        "--work-dir",
+        default=DEFAULT_WORK_DIR,
+        help="base directory of the certbot work directories",
+    )
+    parser.add_argument(
+        "--logs-dir",
+        default=DEFAULT_LOGS_DIR,
+        help="base directory of the certbot logs directories",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="maximum number of concurrent renewals",
+    )
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    """
+    Parse the command line arguments. All arguments after "--" are passed to certbot.
+
+    :param argv: the command line arguments without the program name
+
+    :return: the parsed arguments
+    """
+
+    argv, certbot_args = split_certbot_args(argv)
+
+    parser = argparse.ArgumentParser(
+        prog="certbot-duckdns-batch",
+        description="Renew many DuckDNS certificates in parallel. "
+        'All arguments after "--" are passed to certbot.',
+    )
+    parser.add_argument(
+        "lineages",
+        nargs="+",
+        help="certificate names or paths to renewal configuration files",
+    )
+    add_renewal_arguments(parser)
+
+    args = parser.parse_args(argv)
+    args.certbot_args = certbot_args
+
+    return args
+
+
+def main(argv: list = None) -> int:
+    """
+    Entry point of the certbot-duckdns-batch command.
+
+    :param argv: the command line arguments without the program name
+
+    :return: the exit code
+    """
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    try:
+        lineages = [load_lineage(lineage, args.config_dir) for lineage in args.lineages]
+    except errors.Error as e:
+        logger.error(e)
+        return 1
+
+    groups = group_lineages(lineages)
+    logger.info(
+        "Renewing %d certificates in %d independent groups", len(lineages), len(groups)
+    )
+
+    try:
+        with (
+            lock_config_dirs(lineages),
+            ProcessPoolExecutor(max_workers=args.max_workers) as executor,
+        ):
+            results = renew_lineages(
+                groups,
+                args,
+                renew=lambda lineage, args_, worker: executor.submit(
+                    renew_in_process, lineage, args_, worker
+                ).result(),
+            )
+    except errors.Error as e:
+        logger.error(e)
+        return 1
+
+    aggregator = MetricsAggregator(args.certbot_args)
+    aggregator.add(results)
+    aggregator.write()
+
+    for result in results:
+        logger.info(
+            "%s: %s after %.1f seconds",
+            result.lineage.name,
+            "succeeded" if result.returncode == 0 else "failed",
+            result.duration,
+        )
+
+    return 0 if all(result.returncode == 0 for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
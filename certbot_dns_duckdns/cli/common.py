@@ -0,0 +1,36 @@
+"""
+Helpers shared by the command line tools.
+"""
+
+import os
+
+import dns.resolver
+
+
+def find_lineages(config_dir: str) -> list:
+    """
+    Find the names of all certificate lineages of a certbot config directory.
+
+    :param config_dir: the certbot config directory
+
+    :return: sorted list of the certificate names
+    """
+
+    renewal_dir = os.path.join(config_dir, "renewal")
+    if not os.path.isdir(renewal_dir):
+        return []
+
+    return sorted(
+        os.path.splitext(file_name)[0]
+        for file_name in os.listdir(renewal_dir)
+        if file_name.endswith(".conf")
+    )
+
+
+def enable_resolver_cache() -> None:
+    """
+    Cache the answers of the default resolver of dnspython, which looks up the root domains for grouping the
+    lineages. The delegations rarely change, so the cache is kept for the life of the process.
+    """
+
+    dns.resolver.get_default_resolver().cache = dns.resolver.LRUCache()
@@ -0,0 +1,315 @@
+"""
+Long-running daemon renewing DuckDNS certificates when they approach their expiry.
+
+The renewals run in a pool of persistent worker processes which call certbot in-process, so certbot and the plugin
+are only imported once per worker and the DuckDNS API connections stay warm between renewals. With the
+--dns-duckdns-resolver-cache certbot argument, the DNS answers are cached between the renewals of a worker as well.
+Every lineage is scheduled from the expiry of its current certificate minus a random jitter. The lineages which can
+not be renewed concurrently are grouped like for the certbot-duckdns-batch command, and while they are renewed the
+daemon holds the certbot lock of their config directories, which the workers share.
+"""
+
+import argparse
+import logging
+import random
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from certbot import errors
+
+from certbot_dns_duckdns.cli.batch import (
+    MetricsAggregator,
+    RenewalResult,
+    add_renewal_arguments,
+    check_certbot_locks,
+    group_lineages,
+    load_lineage,
+    lock_config_dirs,
+    renew_in_process,
+    renew_lineages,
+    split_certbot_args,
+)
+from certbot_dns_duckdns.cli.common import enable_resolver_cache, find_lineages
+
+DEFAULT_RENEW_BEFORE_DAYS = 30
+DEFAULT_JITTER = 3600
+DEFAULT_RETRY_INTERVAL = 3600
+DEFAULT_RESCAN_INTERVAL = 3600
+
+logger = logging.getLogger(__name__)
+
+
+def renewal_time(lineage, renew_before: float, jitter: float) -> float:
+    """
+    Get the time at which a lineage should be renewed.
+
+    :param lineage: the lineage to renew
+    :param renew_before: the number of seconds before the expiry of the certificate to renew it
+    :param jitter: the maximum random number of seconds the renewal is moved forward, so that the renewals of
+        certificates issued at the same time are spread
+
+    :return: the renewal time as POSIX timestamp
+    """
+
+    return lineage.expires - renew_before - random.uniform(0, jitter)
+
+
+class RenewalDaemon:
+    """
+    Scheduler renewing the certificate lineages when they are due.
+    """
+
+    def __init__(self, args: argparse.Namespace, renew=None) -> None:
+        """
+        Creates a new RenewalDaemon object.
+
+        :param args: the parsed arguments of the daemon
+        :param renew: function renewing a single lineage, called with the lineage, the arguments and the index of the
+            worker, by default the lineage is renewed in a worker process
+        """
+
+        self.args = args
+        # scheduled renewals as mapping of (config dir, name) to (lineage, renewal time)
+        self.schedule = {}
+        self._renew = renew
+        self._executor = None
+        self._metrics = MetricsAggregator(args.certbot_args)
+        self._stopped = threading.Event()
+
+    def refresh(self) -> None:
+        """
+        Load the lineages and schedule the new lineages and the lineages with a changed certificate.
+        """
+
+        names = self.args.lineages or find_lineages(self.args.config_dir)
+
+        schedule = {}
+        for name in names:
+            try:
+                lineage = load_lineage(name, self.args.config_dir)
+            except errors.Error as e:
+                logger.error(e)
+                continue
+
+            key = (lineage.config_dir, lineage.name)
+            scheduled = self.schedule.get(key)
+            if scheduled is not None and scheduled[0].expires == lineage.expires:
+                schedule[key] = scheduled
+            else:
+                renew_at = renewal_time(
+                    lineage, self.args.renew_before * 86400, self.args.jitter
+                )
+                schedule[key] = (lineage, renew_at)
+                logger.info(
+                    "Scheduled renewal of %s at %s",
+                    lineage.name,
+                    time.strftime("%Y-%m-%d %H:%M:%S %Z", time.localtime(renew_at)),
+                )
+
+        self.schedule = schedule
+
+    def run_due(self, now: float = None) -> list:
+        """
+        Renew all due lineages. Failed renewals and renewals which did not change the certificate are retried after
+        the retry interval.
+
+        :param now: the current time as POSIX timestamp
+
+        :return: list of the results of the renewals
+        """
+
+        now = time.time() if now is None else now
+        due = [
+            lineage for lineage, renew_at in self.schedule.values() if renew_at <= now
+        ]
+        if not due:
+            return []
+
+        groups = group_lineages(due)
+        logger.info(
+            "Renewing %d certificates in %d independent groups", len(due), len(groups)
+        )
+        try:
+            with lock_config_dirs(due):
+                results = renew_lineages(groups, self.args, renew=self._renew_lineage)
+        except errors.LockError as e:
+            logger.error(e)
+            for lineage in due:
+                self.schedule[(lineage.config_dir, lineage.name)] = (
+                    lineage,
+                    time.time() + self.args.retry_interval,
+                )
+            return []
+
+        self._metrics.add(results)
+        self._metrics.write()
+
+        for result in results:
+            lineage = result.lineage
+            logger.info(
+                "%s: %s after %.1f seconds",
+                lineage.name,
+                "succeeded" if result.returncode == 0 else "failed",
+                result.duration,
+            )
+
+            key = (lineage.config_dir, lineage.name)
+            if result.returncode == 0:
+                try:
+                    renewed = load_lineage(lineage.name, lineage.config_dir)
+                except errors.Error as e:
+                    logger.error(e)
+                    renewed = lineage
+                if renewed.expires != lineage.expires:
+                    # scheduled again from the new certificate by the next refresh
+                    self.schedule.pop(key, None)
+                    continue
+
+            self.schedule[key] = (lineage, time.time() + self.args.retry_interval)
+
+        return results
+
+    def _renew_lineage(
+        self, lineage, args: argparse.Namespace, worker: int
+    ) -> RenewalResult:
+        if self._renew is not None:
+            return self._renew(lineage, args, worker)
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=args.max_workers)
+        return self._executor.submit(renew_in_process, lineage, args, worker).result()
+
+    def next_wakeup(self, now: float = None) -> float:
+        """
+        Get the number of seconds until the next scheduled renewal, at most the rescan interval.
+
+        :param now: the current time as POSIX timestamp
+
+        :return: the number of seconds to wait
+        """
+
+        now = time.time() if now is None else now
+        next_renewal = min(
+            (renew_at for _, renew_at in self.schedule.values()),
+            default=now + self.args.rescan_interval,
+        )
+        return max(0, min(next_renewal - now, self.args.rescan_interval))
+
+    def run(self) -> None:
+        """
+        Renew the lineages when they are due until the daemon is stopped.
+        """
+
+        try:
+            while not self._stopped.is_set():
+                self.refresh()
+                self.run_due()
+                self._stopped.wait(self.next_wakeup())
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def stop(self) -> None:
+        """
+        Stop the daemon after the running renewals.
+        """
+        self._stopped.set()
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    """
+    Parse the command line arguments. All arguments after "--" are passed to certbot.
+
+    :param argv: the command line arguments without the program name
+
+    :return: the parsed arguments
+    """
+
+    argv, certbot_args = split_certbot_args(argv)
+
+    parser = argparse.ArgumentParser(
+        prog="certbot-duckdns-daemon",
+        description="Renew DuckDNS certificates when they approach their expiry. "
+        'All arguments after "--" are passed to certbot.',
+    )
+    parser.add_argument(
+        "lineages",
+        nargs="*",
+        help="certificate names or paths to renewal configuration files, "
+        "all certificates of the config directory if not provided",
+    )
+    add_renewal_arguments(parser)
+    parser.add_argument(
+        "--renew-before",
+        type=float,
+        default=DEFAULT_RENEW_BEFORE_DAYS,
+        help="days before the expiry of a certificate to renew it",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=DEFAULT_JITTER,
+        help="maximum random seconds every renewal is moved forward",
+    )
+    parser.add_argument(
+        "--retry-interval",
+        type=float,
+        default=DEFAULT_RETRY_INTERVAL,
+        help="seconds until a failed renewal is attempted again",
+    )
+    parser.add_argument(
+        "--rescan-interval",
+        type=float,
+        default=DEFAULT_RESCAN_INTERVAL,
+        help="seconds after which the config directory is checked for new or changed certificates",
+    )
+
+    args = parser.parse_args(argv)
+    # the daemon only renews the lineages it scheduled as due, which certbot would skip if they are not yet within
+    # its own renewal window. Forcing the renewal is only correct as long as the schedule is derived from the expiry of
+    # the certificates, a renewal triggered otherwise, e.g. manually, must not get this argument, or it would renew
+    # certificates which are not close to their expiry and run into the rate limits of the CA
+    if "--force-renewal" not in certbot_args:
+        certbot_args = [*certbot_args, "--force-renewal"]
+    args.certbot_args = certbot_args
+
+    return args
+
+
+def main(argv: list = None) -> int:
+    """
+    Entry point of the certbot-duckdns-daemon command.
+
+    :param argv: the command line arguments without the program name
+
+    :return: the exit code
+    """
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    try:
+        check_certbot_locks()
+    except errors.Error as e:
+        logger.error(e)
+        return 1
+
+    enable_resolver_cache()
+    daemon = RenewalDaemon(args)
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+"""
+Plan a batch renewal of DuckDNS certificates without calling the DuckDNS update API.
+
+For every certificate, the domains are resolved to the DuckDNS root domains whose TXT records the challenges use, like
+the authenticator does, to find the domains of a certificate sharing a TXT record, which the plugin can not validate in
+one certbot run. The certificates are grouped like for the certbot-duckdns-batch command and the groups are scheduled
+on the workers, to estimate the number of API calls and DNS lookups and the wall time of the batch renewal.
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import sys
+from typing import NamedTuple
+
+from certbot import errors
+
+from certbot_dns_duckdns.cert.client import DEFAULT_PROPAGATION_SECONDS
+from certbot_dns_duckdns.cli.batch import (
+    ROOT_DOMAIN_ERRORS,
+    Lineage,
+    add_renewal_arguments,
+    get_root_domain,
+    group_lineages,
+    load_lineage,
+)
+from certbot_dns_duckdns.cli.common import enable_resolver_cache, find_lineages
+from certbot_dns_duckdns.duckdns.client import (
+    BASE_URL,
+    DEFAULT_MAX_URL_LENGTH,
+    chunk_domains,
+    classify_domain,
+)
+
+DEFAULT_API_LATENCY = 1.0
+DEFAULT_OVERHEAD = 10.0
+# DuckDNS tokens are UUIDs
+TOKEN_LENGTH = 36
+
+logger = logging.getLogger(__name__)
+
+
+class CertificatePlan(NamedTuple):
+    """
+    The planned renewal of a single certificate.
+    """
+
+    lineage: Lineage
+    # mapping of the DuckDNS root domains to the domains whose challenges use their TXT record
+    root_domains: dict
+    # errors of the domains whose DuckDNS root domain could not be determined
+    errors: list
+    api_calls: int
+    dns_lookups: int
+    # estimated duration of the renewal in seconds
+    duration: float
+
+    @property
+    def conflicts(self) -> dict:
+        """
+        The root domains whose TXT record is needed by multiple challenges of the certificate.
+        """
+        return {
+            root_domain: domains
+            for root_domain, domains in self.root_domains.items()
+            if len(domains) > 1
+        }
+
+
+def plan_certificate(lineage: Lineage, args: argparse.Namespace) -> CertificatePlan:
+    """
+    Plan the renewal of a certificate. The delegations of the domains are resolved, but no TXT record is changed.
+
+    :param lineage: the certificate to renew
+    :param args: the parsed arguments of the plan command
+
+    :return: the planned renewal
+    """
+
+    root_domains = {}
+    domain_errors = []
+    dns_lookups = 0
+    for domain in lineage.domains:
+        if classify_domain(domain.removeprefix("*.")).needs_delegation:
+            dns_lookups += 1
+
+        try:
+            root_domain = get_root_domain(domain)
+        except ROOT_DOMAIN_ERRORS as e:
+            domain_errors.append(f"{domain}: {e}")
+            continue
+
+        root_domains.setdefault(root_domain, []).append(domain)
+
+    # every root domain is set once and restored once, a cleanup without restore clears them in bulk
+    api_calls = len(root_domains)
+    if args.no_txt_restore:
+        subnames = [root_domain.split(".")[0] for root_domain in root_domains]
+        params = {"token": "x" * TOKEN_LENGTH, "txt": "", "clear": "true"}
+        api_calls += len(
+            chunk_domains(subnames, params, BASE_URL, DEFAULT_MAX_URL_LENGTH)
+        )
+    else:
+        api_calls += len(root_domains)
+        # the original TXT values are resolved before they are changed
+        dns_lookups += len(root_domains)
+
+    duration = args.overhead + api_calls * args.api_latency
+    if root_domains:
+        duration += args.propagation_seconds
+
+    return CertificatePlan(
+        lineage, root_domains, domain_errors, api_calls, dns_lookups, duration
+    )
+
+
+def schedule_groups(durations: list, max_workers: int) -> tuple:
+    """
+    Schedule the groups on the workers in the given order, every group on the worker becoming free first, like the
+    thread pool of the batch renewal does.
+
+    :param durations: the durations of the groups in seconds
+    :param max_workers: the number of workers
+
+    :return: tuple of the total duration and the list of the worker index of every group
+    """
+
+    workers = [(0.0, i) for i in range(max(1, min(max_workers, len(durations))))]
+    heapq.heapify(workers)
+
+    assignment = []
+    for duration in durations:
+        free_at, worker = heapq.heappop(workers)
+        assignment.append(worker)
+        heapq.heappush(workers, (free_at + duration, worker))
+
+    return max((free_at for free_at, _ in workers), default=0.0), assignment
+
+
+def plan(lineages: list, args: argparse.Namespace) -> dict:
+    """
+    Plan the batch renewal of certificates.
+
+    :param lineages: the certificates to renew
+    :param args: the parsed arguments of the plan command
+
+    :return: the plan as JSON serializable dict
+    """
+
+    plans = {
+        (lineage.config_dir, lineage.name): plan_certificate(lineage, args)
+        for lineage in lineages
+    }
+    groups = [
+        [plans[(lineage.config_dir, lineage.name)] for lineage in group]
+        for group in group_lineages(lineages)
+    ]
+    durations = [sum(p.duration for p in group) for group in groups]
+    total_duration, assignment = schedule_groups(durations, args.max_workers)
+
+    critical_group = max(range(len(groups)), key=durations.__getitem__, default=None)
+
+    return {
+        "certificates": len(plans),
+        "groups": [
+            {
+                "worker": worker,
+                "duration": duration,
+                "certificates": [
+                    {
+                        "name": p.lineage.name,
+                        "config_dir": p.lineage.config_dir,
+                        "root_domains": p.root_domains,
+                        "conflicts": p.conflicts,
+                        "errors": p.errors,
+                        "api_calls": p.api_calls,
+                        "dns_lookups": p.dns_lookups,
+                        "duration": p.duration,
+                    }
+                    for p in group
+                ],
+            }
+            for group, duration, worker in zip(groups, durations, assignment)
+        ],
+        "api_calls": sum(p.api_calls for p in plans.values()),
+        "dns_lookups": sum(p.dns_lookups for p in plans.values()),
+        "conflicts": sum(len(p.conflicts) for p in plans.values()),
+        "errors": sum(len(p.errors) for p in plans.values()),
+        "critical_path": (
+            [p.lineage.name for p in groups[critical_group]]
+            if critical_group is not None
+            else []
+        ),
+        "critical_path_duration": (
+            durations[critical_group] if critical_group is not None else 0.0
+        ),
+        "duration": total_duration,
+    }
+
+
+def format_plan(result: dict) -> str:
+    """
+    Format a plan as human readable report.
+
+    :param result: the plan
+
+    :return: the report
+    """
+
+    lines = []
+    for i, group in enumerate(result["groups"], start=1):
+        lines.append(
+            f"Group {i} (worker {group['worker'] + 1}, {group['duration']:.0f} s):"
+        )
+        for certificate in group["certificates"]:
+            lines.append(
+                f"  {certificate['name']}: {len(certificate['root_domains'])} TXT records, "
+                f"{certificate['api_calls']} API calls, {certificate['duration']:.0f} s"
+            )
+            for root_domain, domains in certificate["conflicts"].items():
+                lines.append(
+                    f"    conflict: {', '.join(domains)} share the TXT record of {root_domain}"
+                )
+            for error in certificate["errors"]:
+                lines.append(f"    error: {error}")
+
+    lines.append(
+        f"{result['certificates']} certificates in {len(result['groups'])} groups: "
+        f"{result['api_calls']} API calls, {result['dns_lookups']} DNS lookups, "
+        f"{result['conflicts']} conflicts, {result['errors']} errors"
+    )
+    lines.append(
+        f"Critical path: {' -> '.join(result['critical_path']) or '-'} "
+        f"({result['critical_path_duration']:.0f} s)"
+    )
+    lines.append(f"Estimated duration: {result['duration']:.0f} s")
+
+    return "\n".join(lines)
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    """
+    Parse the command line arguments.
+
+    :param argv: the command line arguments without the program name
+
+    :return: the parsed arguments
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="certbot-duckdns-plan",
+        description="Plan a batch renewal of DuckDNS certificates without changing any TXT record.",
+    )
+    parser.add_argument(
+        "lineages",
+        nargs="*",
+        help="certificate names or paths to renewal configuration files, "
+        "all certificates of the config directory if neither these nor --domains are provided",
+    )
+    parser.add_argument(
+        "-d",
+        "--domains",
+        action="append",
+        default=[],
+        help="comma separated domains of a new certificate, can be given multiple times",
+    )
+    add_renewal_arguments(parser)
+    parser.add_argument(
+        "--propagation-seconds",
+        type=float,
+        default=DEFAULT_PROPAGATION_SECONDS,
+        help="propagation seconds of the renewals",
+    )
+    parser.add_argument(
+        "--no-txt-restore",
+        action="store_true",
+        help="the renewals do not restore the original TXT records",
+    )
+    parser.add_argument(
+        "--api-latency",
+        type=float,
+        default=DEFAULT_API_LATENCY,
+        help="expected duration of a DuckDNS API call in seconds",
+    )
+    parser.add_argument(
+        "--overhead",
+        type=float,
+        default=DEFAULT_OVERHEAD,
+        help="expected duration of a renewal in seconds without the DuckDNS API calls and the propagation",
+    )
+    parser.add_argument("--json", action="store_true", help="print the plan as JSON")
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> int:
+    """
+    Entry point of the certbot-duckdns-plan command.
+
+    :param argv: the command line arguments without the program name
+
+    :return: the exit code, 1 if a certificate has conflicts or errors
+    """
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    names = args.lineages
+    if not names and not args.domains:
+        names = find_lineages(args.config_dir)
+
+    try:
+        lineages = [load_lineage(name, args.config_dir) for name in names]
+    except errors.Error as e:
+        logger.error(e)
+        return 1
+    for domains in args.domains:
+        domains = [d.strip() for d in domains.split(",") if d.strip()]
+        if domains:
+            lineages.append(Lineage(domains[0], args.config_dir, domains))
+
+    # the delegations are looked up for the grouping again
+    enable_resolver_cache()
+    result = plan(lineages, args)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(format_plan(result))
+
+    return 1 if result["conflicts"] or result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
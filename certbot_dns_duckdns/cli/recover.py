@@ -0,0 +1,198 @@
+"""
+Restore the TXT records left over by certbot runs which were killed between setting and restoring them.
+
+Every run of the plugin journals the TXT records it sets in its certbot work directory. The next run of the plugin
+restores the left over TXT records automatically, this command restores them without a certbot run, e.g. after an
+incident. The work directories of the certbot-duckdns-batch and certbot-duckdns-daemon commands are found below the
+given work directory as well. The root domains of a token restored to the same value are updated in bulk. Every work
+directory is locked like certbot does while its journal is replayed, work directories in use by certbot are skipped.
+With the slot pool of the certbot runs, the TXT records of the slots leased by a running certbot are not restored.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+from certbot import errors
+from certbot import util as certbot_util
+from certbot.configuration import NamespaceConfig
+
+from certbot_dns_duckdns.cert.client import (
+    STATE_DIR_NAME,
+    TOKEN_ENV_NAME,
+    Authenticator,
+)
+from certbot_dns_duckdns.cert.journal import JOURNAL_FILE_NAME, TXTJournal
+from certbot_dns_duckdns.cli.batch import DEFAULT_WORK_DIR, check_certbot_locks
+from certbot_dns_duckdns.duckdns.client import BASE_URL
+
+PLUGIN_NAME = "dns-duckdns"
+
+logger = logging.getLogger(__name__)
+
+
+def find_work_dirs(work_dir: str) -> list:
+    """
+    Find the certbot work directories with a journal of the plugin, the given directory and its direct
+    subdirectories.
+
+    :param work_dir: the certbot work directory or the base directory of the work directories
+
+    :return: sorted list of the work directories
+    """
+
+    candidates = [work_dir]
+    if os.path.isdir(work_dir):
+        candidates += [os.path.join(work_dir, name) for name in os.listdir(work_dir)]
+
+    return sorted(
+        candidate
+        for candidate in candidates
+        if os.path.isfile(os.path.join(candidate, STATE_DIR_NAME, JOURNAL_FILE_NAME))
+    )
+
+
+def create_authenticator(work_dir: str, args: argparse.Namespace) -> Authenticator:
+    """
+    Create the authenticator of the plugin for a certbot work directory.
+
+    :param work_dir: the certbot work directory
+    :param args: the parsed arguments of the recover command
+
+    :return: the created authenticator
+    """
+
+    prefix = PLUGIN_NAME.replace("-", "_")
+    config = NamespaceConfig(
+        argparse.Namespace(
+            config_dir=work_dir,
+            work_dir=work_dir,
+            logs_dir=work_dir,
+            http01_port=80,
+            https_port=443,
+            domains=[],
+            **{
+                f"{prefix}_credentials": args.credentials,
+                f"{prefix}_token": args.token,
+                f"{prefix}_token_env": args.token_env,
+                f"{prefix}_no_txt_restore": False,
+                f"{prefix}_api_url": args.api_url,
+                f"{prefix}_slot_pool": args.slot_pool,
+                f"{prefix}_slot_lock_dir": args.slot_lock_dir,
+            },
+        )
+    )
+    return Authenticator(config, name=PLUGIN_NAME)
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    """
+    Parse the command line arguments.
+
+    :param argv: the command line arguments without the program name
+
+    :return: the parsed arguments
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="certbot-duckdns-recover",
+        description="Restore the TXT records left over by killed certbot runs.",
+    )
+    parser.add_argument(
+        "--work-dir",
+        default=DEFAULT_WORK_DIR,
+        help="certbot work directory or base directory of the certbot work directories",
+    )
+    parser.add_argument("--credentials", help="DuckDNS credentials INI file")
+    parser.add_argument("--token", help="DuckDNS token (overwrites credentials file)")
+    parser.add_argument(
+        "--token-env",
+        default=TOKEN_ENV_NAME,
+        help="environment variable name for the DuckDNS token",
+    )
+    parser.add_argument(
+        "--api-url",
+        default=BASE_URL,
+        help="URL of the DuckDNS update API, e.g. of a local emulator",
+    )
+    parser.add_argument(
+        "--slot-pool",
+        help="comma separated DuckDNS root domains of the slot pool of the certbot runs, "
+        "the TXT records of slots leased by a running certbot are restored later",
+    )
+    parser.add_argument(
+        "--slot-lock-dir",
+        help="directory of the slot leases shared by the certbot processes, required with --slot-pool",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only list the TXT records which would be restored",
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> int:
+    """
+    Entry point of the certbot-duckdns-recover command.
+
+    :param argv: the command line arguments without the program name
+
+    :return: the exit code
+    """
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    # the work directories are locked with the lock registry of certbot
+    try:
+        if not args.dry_run:
+            check_certbot_locks()
+    except errors.Error as e:
+        logger.error(e)
+        return 1
+
+    returncode = 0
+    for work_dir in find_work_dirs(args.work_dir):
+        if args.dry_run:
+            journal = TXTJournal(
+                os.path.join(work_dir, STATE_DIR_NAME, JOURNAL_FILE_NAME)
+            )
+            for root_domain, restore in journal.pending().items():
+                logger.info(
+                    "%s: %s",
+                    root_domain,
+                    f'restore "{restore}"' if restore else "clear",
+                )
+            continue
+
+        # a certbot run using the work directory replays the journal itself
+        try:
+            certbot_util.lock_dir_until_exit(work_dir)
+        except errors.LockError as e:
+            logger.error("%s: skipped, %s", work_dir, e)
+            returncode = 1
+            continue
+
+        try:
+            restored, failures = create_authenticator(work_dir, args).recover()
+        except errors.Error as e:
+            logger.error("%s: %s", work_dir, e)
+            returncode = 1
+            continue
+        finally:
+            certbot_util._release_locks()  # pylint: disable=protected-access
+
+        logger.info("%s: restored %d TXT records", work_dir, len(restored))
+        for failure in failures:
+            logger.error("%s: %s", work_dir, failure)
+            returncode = 1
+
+    return returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
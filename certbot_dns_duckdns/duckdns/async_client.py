@@ -0,0 +1,174 @@
+"""
+This module provides an asyncio client for setting and clearing the TXT records of many DuckDNS domains concurrently.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from certbot_dns_duckdns.duckdns.client import (
+    BASE_URL,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    NO_RETRY_POLICY,
+    DuckDNSClient,
+    RetryPolicy,
+)
+from certbot_dns_duckdns.duckdns.ratelimit import RateLimiter
+from certbot_dns_duckdns.metrics import NULL_METRICS, Metrics
+
+DEFAULT_CONCURRENCY = 10
+
+
+class AsyncDuckDNSClient:
+    """
+    Asyncio client for setting and clearing the TXT records of DuckDNS domains.
+
+    The requests are sent by a DuckDNSClient in a pool of worker threads, so the validation and the raised errors are
+    the same as for the synchronous client. The number of requests in flight is limited by the concurrency.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        token: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: tuple = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+        base_url: str = BASE_URL,
+        retry_policy: RetryPolicy = NO_RETRY_POLICY,
+        *,
+        metrics: Metrics = NULL_METRICS,
+        rate_limiter: RateLimiter = None,
+    ) -> None:
+        """
+        Creates a new AsyncDuckDNSClient object.
+
+        :param token: the DuckDNS token used for API calls
+        :param concurrency: the maximum number of concurrent requests
+        :param timeout: the default (connect, read) timeout for the requests in seconds
+        :param base_url: the URL of the DuckDNS update API
+        :param retry_policy: the policy for retrying failed API calls, by default failed calls are not retried
+        :param metrics: the metrics recording the request latencies and retries, by default nothing is recorded
+        :param rate_limiter: the rate limiter every request waits for, by default the requests are not limited
+
+        :raise NotValidDuckdnsTokenError: if the token is not a valid duckdns token
+        :raise ValueError: if the concurrency is less than 1
+        """
+        if concurrency < 1:
+            raise ValueError("The concurrency must be at least 1.")
+
+        self._client = DuckDNSClient(
+            token,
+            pool_size=concurrency,
+            timeout=timeout,
+            base_url=base_url,
+            retry_policy=retry_policy,
+            metrics=metrics,
+            rate_limiter=rate_limiter,
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="duckdns"
+        )
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def close(self) -> None:
+        """
+        Shut down the worker threads and close all connections.
+        """
+        self._executor.shutdown(wait=True)
+        self._client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.close()
+
+    async def _run(self, func, *args):
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, func, *args
+            )
+
+    async def set_txt_record(self, domain: str, txt: str, timeout=None) -> None:
+        """
+        Set a TXT record value for a specific DuckDNS domain.
+
+        :param domain: the full domain or only the subdomain of duckdns
+        :param txt: the string value to set as TXT record
+        :param timeout: the timeout for the request in seconds, the client default timeout is used if not provided
+
+        :raise TXTUpdateError: if the TXT record can not be set
+        :raise NotValidDuckdnsDomainError: if the domain is not a valid duckdns domain
+        """
+        await self._run(self._client.set_txt_record, domain, txt, timeout)
+
+    async def clear_txt_record(self, domain: str, timeout=None) -> None:
+        """
+        Clear the TXT record for a specific DuckDNS domain.
+
+        :param domain: the full domain or only the subdomain of duckdns
+        :param timeout: the timeout for the request in seconds, the client default timeout is used if not provided
+
+        :raise TXTUpdateError: if the TXT record can not be cleared
+        :raise NotValidDuckdnsDomainError: if the domain is not a valid duckdns domain
+        """
+        await self._run(self._client.clear_txt_record, domain, timeout)
+
+    async def set_txt_records(self, records: dict, timeout=None) -> dict:
+        """
+        Set the TXT record values of many DuckDNS domains concurrently. The domains should have distinct root
+        domains, because DuckDNS only has one TXT record per root domain.
+
+        :param records: mapping of the domains to the TXT value to set
+        :param timeout: the timeout for each request in seconds, the client default timeout is used if not provided
+
+        :return: mapping of each domain to None on success or to the raised exception
+        """
+        return await self._gather(
+            {
+                domain: self.set_txt_record(domain, txt, timeout)
+                for domain, txt in records.items()
+            }
+        )
+
+    async def clear_txt_records(self, domains: list, timeout=None) -> dict:
+        """
+        Clear the TXT records of many DuckDNS domains concurrently.
+
+        :param domains: the domains for which the TXT records should be cleared
+        :param timeout: the timeout for each request in seconds, the client default timeout is used if not provided
+
+        :return: mapping of each domain to None on success or to the raised exception
+        """
+        return await self._gather(
+            {domain: self.clear_txt_record(domain, timeout) for domain in domains}
+        )
+
+    async def bulk_set_txt_record(self, domains: list, txt: str, timeout=None) -> None:
+        """
+        Set the same TXT record value for many DuckDNS domains with as few requests as possible.
+
+        :param domains: the full domains or only the subdomains of duckdns for which the value should be set
+        :param txt: the string value to set as TXT record
+        :param timeout: the timeout for each request in seconds, the client default timeout is used if not provided
+
+        :raise BulkUpdateError: if any request fails
+        :raise NotValidDuckdnsDomainError: if a domain is not a valid duckdns domain
+        """
+        await self._run(self._client.bulk_set_txt_record, domains, txt, timeout)
+
+    async def bulk_clear_txt_record(self, domains: list, timeout=None) -> None:
+        """
+        Clear the TXT records of many DuckDNS domains with as few requests as possible.
+
+        :param domains: the full domains or only the subdomains of duckdns for which the TXT entry should be cleared
+        :param timeout: the timeout for each request in seconds, the client default timeout is used if not provided
+
+        :raise BulkUpdateError: if any request fails
+        :raise NotValidDuckdnsDomainError: if a domain is not a valid duckdns domain
+        """
+        await self._run(self._client.bulk_clear_txt_record, domains, timeout)
+
+    @staticmethod
+    async def _gather(coroutines: dict) -> dict:
+        results = await asyncio.gather(*coroutines.values(), return_exceptions=True)
+        return dict(zip(coroutines.keys(), results))
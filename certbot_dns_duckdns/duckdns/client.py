@@ -2,15 +2,43 @@
 This module provides a client for clearing, setting and receiving the TXT record for DuckDNS domains.
 """
 
+import functools
 import logging
+import random
 import re
+import time
+from typing import NamedTuple
+from urllib.parse import quote_plus, urlencode
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from certbot_dns_duckdns.duckdns.ratelimit import RateLimiter
+from certbot_dns_duckdns.metrics import (
+    API_REQUEST_DURATION,
+    API_RETRIES,
+    NULL_METRICS,
+    Metrics,
+)
 
 # prevent urllib3 to log request with the api token
 logging.getLogger("urllib3").setLevel(logging.WARNING)
 
+logger = logging.getLogger(__name__)
+
 BASE_URL = "https://www.duckdns.org/update"
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 600
+DEFAULT_RETRY_ATTEMPTS = 3
+DEFAULT_RETRY_BACKOFF = 1.0
+DEFAULT_RETRY_JITTER = 1.0
+DEFAULT_RETRY_DEADLINE = 120.0
+# conservative limit of the URL length accepted by web servers and proxies
+DEFAULT_MAX_URL_LENGTH = 2000
+DUCKDNS_SUFFIX = ".duckdns.org"
+# maximum number of memoized domain classifications
+DOMAIN_CACHE_SIZE = 65536
 VALID_DUCKDNS_DOMAIN_REGEX = re.compile(
     r"^([a-z\d\\-]+\.)*[a-z\d\\-]+(\.duckdns\.org)?$"
 )
@@ -19,6 +47,73 @@ VALID_FULL_DUCKDNS_DOMAIN_REGEX = re.compile(
 )
 
 
+class DomainClassification(NamedTuple):
+    """
+    Classification of a domain name for the DuckDNS API.
+    """
+
+    # the classified domain
+    domain: str
+    # True if the domain is a valid duckdns subdomain, with or without the ".duckdns.org" suffix
+    valid: bool
+    # True if the domain is a valid duckdns domain with the ".duckdns.org" suffix
+    full: bool
+    # the domain with the ".duckdns.org" suffix, None if the domain is not valid
+    full_domain: str
+    # the root domain whose TXT record is updated, None if it is not a valid duckdns subdomain
+    root_domain: str
+    # True if the duckdns domain of the acme challenge must be resolved from a delegation
+    needs_delegation: bool
+
+
+@functools.lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def classify_domain(domain: str) -> DomainClassification:
+    """
+    Classify a domain in a single pass. The classifications are memoized, so repeated checks of the same domain only
+    cost a cache lookup.
+
+    :param domain: the domain to classify
+
+    :return: the classification of the domain
+    """
+
+    valid = VALID_DUCKDNS_DOMAIN_REGEX.match(domain) is not None
+    full = valid and VALID_FULL_DUCKDNS_DOMAIN_REGEX.match(domain) is not None
+
+    full_domain = None
+    if full:
+        full_domain = domain
+    elif valid:
+        full_domain = domain + DUCKDNS_SUFFIX
+
+    # the root domain with the first subdomain
+    root_domain = ".".join(domain.split(".")[-3:])
+    if VALID_DUCKDNS_DOMAIN_REGEX.match(root_domain) is None:
+        root_domain = None
+
+    return DomainClassification(domain, valid, full, full_domain, root_domain, not full)
+
+
+def classify_domains(domains: list) -> list:
+    """
+    Classify many domains at once, e.g. all names of a certificate. Every distinct domain is only classified once.
+
+    :param domains: the domains to classify
+
+    :return: list of the classifications in the order of the domains
+    """
+
+    classifications = {}
+    results = []
+    for domain in domains:
+        classification = classifications.get(domain)
+        if classification is None:
+            classification = classifications[domain] = classify_domain(domain)
+        results.append(classification)
+
+    return results
+
+
 def is_valid_duckdns_domain(domain):
     """
     Check if the domain is a valid duckdns subdomain.
@@ -28,7 +123,7 @@ def is_valid_duckdns_domain(domain):
     :return: True if the domain is a valid duckdns subdomain, otherwise False
     """
 
-    return VALID_DUCKDNS_DOMAIN_REGEX.match(domain) is not None
+    return classify_domain(domain).valid
 
 
 def is_valid_full_duckdns_domain(domain):
@@ -40,7 +135,7 @@ def is_valid_full_duckdns_domain(domain):
     :return: True if the domain is a valid duckdns domain, otherwise False
     """
 
-    return VALID_FULL_DUCKDNS_DOMAIN_REGEX.match(domain) is not None
+    return classify_domain(domain).full
 
 
 class TXTUpdateError(Exception):
@@ -98,16 +193,189 @@ class NotValidDuckdnsTokenError(Exception):
         super().__init__("The token is not valid a duckdns token.")
 
 
+class BulkUpdateError(Exception):
+    """
+    Exception if some requests of a bulk update of multiple domains fail.
+    """
+
+    def __init__(self, failures: list, succeeded: list):
+        """
+        :param failures: list of (root domains, exception) tuples of the failed requests
+        :param succeeded: the root domains of the successful requests
+        """
+        self.failures = failures
+        self.succeeded = succeeded
+        self.message = "\n".join(
+            f"The update of the domains {', '.join(domains)} failed: {error}"
+            for domains, error in failures
+        )
+        super().__init__(self.message)
+
+
+class RetryPolicy:
+    """
+    Policy for retrying failed DuckDNS API calls with exponential backoff and random jitter.
+
+    Timeouts, connection errors, server errors, rate limiting responses and "KO" responses are retried. DuckDNS also
+    answers "KO" for a wrong token, so such a failure is reported after all attempts are used. Invalid domains are
+    rejected before any API call and never retried.
+    """
+
+    def __init__(
+        self,
+        attempts: int = DEFAULT_RETRY_ATTEMPTS,
+        backoff: float = DEFAULT_RETRY_BACKOFF,
+        jitter: float = DEFAULT_RETRY_JITTER,
+        deadline: float = DEFAULT_RETRY_DEADLINE,
+    ) -> None:
+        """
+        Creates a new RetryPolicy object.
+
+        :param attempts: the maximum number of attempts of an API call, 1 disables retries
+        :param backoff: the delay before the first retry in seconds, doubled for every further retry
+        :param jitter: the maximum random delay in seconds added to every backoff delay
+        :param deadline: the maximum time in seconds from the first attempt after which no retry is started
+
+        :raise ValueError: if the number of attempts is less than 1
+        """
+        if attempts < 1:
+            raise ValueError("The number of attempts must be at least 1.")
+
+        self.attempts = attempts
+        self.backoff = backoff
+        self.jitter = jitter
+        self.deadline = deadline
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """
+        Check if a failed API call can be retried.
+
+        :param error: the error of the failed API call
+
+        :return: True if the API call can be retried, otherwise False
+        """
+
+        if isinstance(error, (requests.Timeout, requests.ConnectionError)):
+            return True
+        if isinstance(error, TXTUpdateError):
+            if error.response == "KO" or error.status_code == 429:
+                return True
+            return error.status_code >= 500
+        return False
+
+    def get_delay(self, attempt: int, retry_after: float = None) -> float:
+        """
+        Get the delay before the next attempt.
+
+        :param attempt: the number of the failed attempt, starting with 1
+        :param retry_after: the delay requested by the server in seconds, if any
+
+        :return: the delay in seconds
+        """
+
+        delay = self.backoff * 2 ** (attempt - 1) + random.uniform(0, self.jitter)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+NO_RETRY_POLICY = RetryPolicy(attempts=1)
+
+
+def _get_retry_after(response: requests.Response):
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+def chunk_domains(
+    domains: list, params: dict, base_url: str, max_url_length: int
+) -> list:
+    """
+    Split root domains into chunks whose update URL with the comma separated domains does not exceed a maximum length.
+
+    :param domains: the root domains without the ".duckdns.org" suffix
+    :param params: the other parameters of the update request, including the token
+    :param base_url: the URL of the DuckDNS update API
+    :param max_url_length: the maximum length of a request URL
+
+    :raise ValueError: if a single domain does not fit into the maximum URL length
+    :return: list of the chunks, each a list of root domains
+    """
+
+    available = max_url_length - len(f"{base_url}?{urlencode(params)}&domains=")
+    # an encoded comma "%2C" separates the domains
+    separator_length = len(quote_plus(","))
+
+    chunks = []
+    chunk = []
+    length = 0
+    for domain in domains:
+        domain_length = len(quote_plus(domain))
+        if domain_length > available:
+            raise ValueError(f'The domain "{domain}" exceeds the maximum URL length.')
+
+        added_length = domain_length + (separator_length if chunk else 0)
+        if length + added_length > available:
+            chunks.append(chunk)
+            chunk = []
+            added_length = domain_length
+            length = 0
+        chunk.append(domain)
+        length += added_length
+
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def create_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """
+    Create a new HTTP session with a keep-alive connection pool.
+
+    :param pool_size: the maximum number of connections kept alive per host
+
+    :return: the created session
+    """
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
 class DuckDNSClient:
     """
     Client for clearing, setting and receiving the TXT record for DuckDNS domains.
     """
 
-    def __init__(self, token: str) -> None:
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        token: str,
+        *,
+        session: requests.Session = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: tuple = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+        base_url: str = BASE_URL,
+        retry_policy: RetryPolicy = NO_RETRY_POLICY,
+        metrics: Metrics = NULL_METRICS,
+        rate_limiter: RateLimiter = None,
+    ) -> None:
         """
         Creates a new DuckDNSClient object.
 
         :param token: the DuckDNS token used for API calls
+        :param session: the HTTP session used for API calls, a new pooled session is created if not provided
+        :param pool_size: the maximum number of kept alive connections of a newly created session
+        :param timeout: the default (connect, read) timeout for the requests in seconds
+        :param base_url: the URL of the DuckDNS update API
+        :param retry_policy: the policy for retrying failed API calls, by default failed calls are not retried
+        :param metrics: the metrics recording the request latencies and retries, by default nothing is recorded
+        :param rate_limiter: the rate limiter every request waits for, by default the requests are not limited
 
         :raise NotValidDuckdnsTokenError: if the token is not a valid duckdns token
         """
@@ -115,30 +383,139 @@ class DuckDNSClient:
             raise NotValidDuckdnsTokenError()
 
         self._token = token
+        self._session = session if session is not None else create_session(pool_size)
+        self._timeout = timeout
+        self._base_url = base_url
+        self._retry_policy = retry_policy
+        self._metrics = metrics
+        self._rate_limiter = rate_limiter
+
+    def close(self) -> None:
+        """
+        Close all connections of the HTTP session.
+        """
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _update(self, domain: str, params: dict, timeout, txt: str = None) -> None:
+        """
+        Send an update request to the DuckDNS API and retry it according to the retry policy.
+
+        :param domain: the domain of the update, used for the error message
+        :param params: the parameters of the update request without the token
+        :param timeout: the timeout for each request in seconds, the client default timeout is used if None
+        :param txt: the TXT value of the update, used for the error message
+
+        :raise TXTUpdateError: if the update is not accepted by the API
+        :raise RequestException: if the request fails
+        """
+
+        operation = "clear" if params.get("clear") == "true" else "set"
+        with self._metrics.span(f"api.{operation}", domain=domain) as span:
+            span["root_domain"] = params["domains"]
+            self._send(
+                domain,
+                operation,
+                {"token": self._token, **params},
+                timeout,
+                txt,
+                span=span,
+            )
+
+    # pylint: disable-next=too-many-arguments,too-many-locals
+    def _send(
+        self,
+        domain: str,
+        operation: str,
+        params: dict,
+        timeout,
+        txt: str,
+        *,
+        span: dict,
+    ) -> None:
+        deadline = time.monotonic() + self._retry_policy.deadline
+
+        attempt = 0
+        while True:
+            attempt += 1
+            span["attempts"] = attempt
+            span.pop("http_status", None)
+            retry_after = None
+            error = None
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire()
+            start = time.perf_counter()
+            try:
+                r = self._session.get(
+                    url=self._base_url,
+                    params=params,
+                    timeout=timeout if timeout is not None else self._timeout,
+                )
+                span["http_status"] = r.status_code
+                if r.text == "OK":
+                    outcome = "ok"
+                else:
+                    outcome = "failed"
+                    error = TXTUpdateError(domain, r.status_code, r.text, txt)
+                    retry_after = _get_retry_after(r)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                outcome = (
+                    "timeout" if isinstance(e, requests.Timeout) else "connection_error"
+                )
+                error = e
+            self._metrics.observe(
+                API_REQUEST_DURATION,
+                time.perf_counter() - start,
+                operation=operation,
+                outcome=outcome,
+            )
+            if self._rate_limiter is not None:
+                self._rate_limiter.report(
+                    error is not None and RetryPolicy.is_retryable(error)
+                )
+            if error is None:
+                return
+
+            if attempt >= self._retry_policy.attempts or not RetryPolicy.is_retryable(
+                error
+            ):
+                raise error
+
+            delay = self._retry_policy.get_delay(attempt, retry_after)
+            if time.monotonic() + delay > deadline:
+                raise error
+
+            logger.debug(
+                "Retrying the update of %s in %.1f seconds after attempt %d failed: %s",
+                domain,
+                delay,
+                attempt,
+                error,
+            )
+            self._metrics.increment(API_RETRIES, operation=operation)
+            time.sleep(delay)
 
-    def set_txt_record(self, domain: str, txt: str, timeout: int = 600) -> None:
+    def set_txt_record(self, domain: str, txt: str, timeout: int = None) -> None:
         """
         Set a TXT record value for a specific DuckDNS domain.
 
         :param domain: the full domain or only the subdomain of duckdns
             (e.g. example of the full domain example.duckdns.org) for which the value of the TXT entry should set
         :param txt: the string value to set as TXT record
-        :param timeout: the timeout for the request in seconds
+        :param timeout: the timeout for the request in seconds, the client default timeout is used if not provided
 
         :raise TXTUpdateError: if the TXT record can not be set
         :raise NotValidDuckdnsDomainError: if the domain is not a valid duckdns domain
         """
 
-        if domain is None or not is_valid_duckdns_domain(domain):
-            raise NotValidDuckdnsDomainError(domain)
-
-        root_domain = self.__get_validated_root_domain__(domain)
+        root_domain = self._get_root_domain(domain)
 
-        params = {"token": self._token, "domains": root_domain, "txt": txt}
-        r = requests.get(url=BASE_URL, params=params, timeout=timeout)
-
-        if r.text != "OK":
-            raise TXTUpdateError(txt, domain, r.status_code, r.text)
+        self._update(domain, {"domains": root_domain, "txt": txt}, timeout, txt)
 
     @staticmethod
     def __get_validated_root_domain__(domain):
@@ -150,38 +527,127 @@ class DuckDNSClient:
 
         :raise NotValidDuckdnsDomainError: if the domain is not a valid duckdns domain
         """
-        # get the root domain with the first subdomain
-        domain_parts = domain.split(".")
-        root_domain = ".".join(domain_parts[-3:])
-        if not is_valid_duckdns_domain(root_domain):
-            raise NotValidDuckdnsDomainError(root_domain)
+        root_domain = classify_domain(domain).root_domain
+        if root_domain is None:
+            raise NotValidDuckdnsDomainError(".".join(domain.split(".")[-3:]))
 
         return root_domain
 
-    def clear_txt_record(self, domain: str, timeout: int = 600) -> None:
+    @staticmethod
+    def _get_root_domain(domain: str) -> str:
+        """
+        Validate a domain and get its root domain.
+
+        :param domain: the full domain or only the subdomain of duckdns
+
+        :raise NotValidDuckdnsDomainError: if the domain is not a valid duckdns domain
+        :return: the root domain
+        """
+
+        classification = classify_domain(domain) if domain is not None else None
+        if classification is None or not classification.valid:
+            raise NotValidDuckdnsDomainError(domain)
+
+        return classification.root_domain
+
+    def clear_txt_record(self, domain: str, timeout: int = None) -> None:
         """
         Clear the TXT record for a specific DuckDNS domain.
 
         :param domain: the full domain or only the subdomain of duckdns
             (e.g. example of the full domain example.duckdns.org) for which the TXT entry should be cleared
-        :param timeout: the timeout for the request in seconds
+        :param timeout: the timeout for the request in seconds, the client default timeout is used if not provided
 
         :raise TXTUpdateError: if the TXT record can not be cleared
         :raise NotValidDuckdnsDomainError: if the domain is not a valid duckdns domain
         """
 
-        if domain is None or not is_valid_duckdns_domain(domain):
-            raise NotValidDuckdnsDomainError(domain)
-
-        root_domain = self.__get_validated_root_domain__(domain)
+        root_domain = self._get_root_domain(domain)
 
         params = {
-            "token": self._token,
             "domains": root_domain,
             "txt": "",
             "clear": "true",
         }
-        r = requests.get(url=BASE_URL, params=params, timeout=timeout)
+        self._update(domain, params, timeout)
+
+    def bulk_set_txt_record(
+        self,
+        domains: list,
+        txt: str,
+        timeout: int = None,
+        max_url_length: int = DEFAULT_MAX_URL_LENGTH,
+    ) -> None:
+        """
+        Set the same TXT record value for many DuckDNS domains of the token. The root domains are sent comma separated
+        in as few requests as the maximum URL length allows. All requests are sent, even if some of them fail.
+
+        :param domains: the full domains or only the subdomains of duckdns for which the value should be set
+        :param txt: the string value to set as TXT record
+        :param timeout: the timeout for each request in seconds, the client default timeout is used if not provided
+        :param max_url_length: the maximum length of a request URL
+
+        :raise BulkUpdateError: if any request fails, with the root domains and the error of each failed request
+        :raise NotValidDuckdnsDomainError: if a domain is not a valid duckdns domain, before any request is sent
+        """
+
+        self._bulk_update(domains, {"txt": txt}, timeout, max_url_length, txt)
+
+    def bulk_clear_txt_record(
+        self,
+        domains: list,
+        timeout: int = None,
+        max_url_length: int = DEFAULT_MAX_URL_LENGTH,
+    ) -> None:
+        """
+        Clear the TXT records of many DuckDNS domains of the token. The root domains are sent comma separated in as
+        few requests as the maximum URL length allows. All requests are sent, even if some of them fail.
+
+        :param domains: the full domains or only the subdomains of duckdns for which the TXT entry should be cleared
+        :param timeout: the timeout for each request in seconds, the client default timeout is used if not provided
+        :param max_url_length: the maximum length of a request URL
+
+        :raise BulkUpdateError: if any request fails, with the root domains and the error of each failed request
+        :raise NotValidDuckdnsDomainError: if a domain is not a valid duckdns domain, before any request is sent
+        """
 
-        if r.text != "OK":
-            raise TXTUpdateError(domain, r.status_code, r.text, None)
+        self._bulk_update(
+            domains, {"txt": "", "clear": "true"}, timeout, max_url_length
+        )
+
+    # pylint: disable-next=too-many-arguments
+    def _bulk_update(
+        self,
+        domains: list,
+        params: dict,
+        timeout,
+        max_url_length: int,
+        txt: str = None,
+    ) -> None:
+        root_domains = {}
+        for domain in domains:
+            root_domain = self._get_root_domain(domain)
+            # the API accepts the subnames without suffix, which fit more domains into a request
+            if root_domain.endswith(DUCKDNS_SUFFIX):
+                root_domain = root_domain[: -len(DUCKDNS_SUFFIX)]
+            root_domains.setdefault(root_domain, None)
+
+        chunks = chunk_domains(
+            list(root_domains),
+            {"token": self._token, **params},
+            self._base_url,
+            max_url_length,
+        )
+
+        failures = []
+        succeeded = []
+        for chunk in chunks:
+            names = ",".join(chunk)
+            try:
+                self._update(names, {"domains": names, **params}, timeout, txt)
+                succeeded.extend(chunk)
+            except (TXTUpdateError, requests.RequestException) as e:
+                failures.append((chunk, e))
+
+        if failures:
+            raise BulkUpdateError(failures, succeeded)
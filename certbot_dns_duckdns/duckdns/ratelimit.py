@@ -0,0 +1,165 @@
+"""
+This module provides an adaptive token bucket rate limiter for the DuckDNS API, which can be shared by processes.
+"""
+
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # without file locks, e.g. on Windows, the state is only shared by the threads of a process
+    fcntl = None
+
+# the state of the bucket: available tokens, time of the last update and current rate
+_STATE = struct.Struct("<ddd")
+
+DEFAULT_BURST = 5
+# factor of the rate after a throttled request
+DEFAULT_DECREASE = 0.5
+# fraction of the maximum rate added after a successful request
+DEFAULT_INCREASE = 0.05
+# lowest rate as fraction of the maximum rate
+DEFAULT_MIN_RATE = 0.05
+
+
+class RateLimiter:  # pylint: disable=too-many-instance-attributes
+    """
+    Token bucket rate limiter with additive increase and multiplicative decrease of the rate. Every throttled request,
+    e.g. a "KO" response, a server error or a timeout, halves the rate and every successful request raises it again
+    towards the maximum rate, so the requests of all processes sharing the limiter stay near the rate the API accepts.
+
+    With a state file, the bucket is stored in the file and every access is serialized by a lock of the file, so all
+    processes using the same file share one bucket, e.g. parallel certbot runs on one host.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        rate: float,
+        *,
+        burst: float = DEFAULT_BURST,
+        path: str = None,
+        decrease: float = DEFAULT_DECREASE,
+        increase: float = DEFAULT_INCREASE,
+        min_rate: float = DEFAULT_MIN_RATE,
+    ) -> None:
+        """
+        Creates a new RateLimiter object.
+
+        :param rate: the maximum number of requests per second
+        :param burst: the maximum number of requests sent at once after an idle period
+        :param path: the state file shared by the processes, the state is kept in memory if not provided
+        :param decrease: the factor of the rate after a throttled request
+        :param increase: the fraction of the maximum rate added after a successful request
+        :param min_rate: the lowest rate as fraction of the maximum rate
+
+        :raise ValueError: if the rate or the burst is not positive
+        """
+        if rate <= 0 or burst <= 0:
+            raise ValueError("The rate and the burst must be positive.")
+
+        self.max_rate = rate
+        self.burst = burst
+        self._path = path
+        self._decrease = decrease
+        self._increase = increase * rate
+        self._min_rate = min_rate * rate
+        self._lock = threading.Lock()
+        self._state = (burst, time.time(), rate)
+
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _read(self, fd) -> tuple:
+        if fd is None:
+            return self._state
+
+        data = os.pread(fd, _STATE.size, 0)
+        if len(data) < _STATE.size:
+            return self.burst, time.time(), self.max_rate
+
+        tokens, updated, rate = _STATE.unpack(data)
+        # the rate of a file written with other settings is limited to the own settings
+        return (
+            min(tokens, self.burst),
+            updated,
+            max(self._min_rate, min(rate, self.max_rate)),
+        )
+
+    def _write(self, fd, state: tuple) -> None:
+        if fd is None:
+            self._state = state
+        else:
+            os.pwrite(fd, _STATE.pack(*state), 0)
+
+    def _update(self, func):
+        """
+        Read, update and write the state while holding the locks.
+
+        :param func: function called with the state, returning the new state and a result
+
+        :return: the result of the function
+        """
+
+        with self._lock:
+            fd = None
+            if self._path is not None:
+                fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if fd is not None and fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                state, result = func(self._read(fd))
+                self._write(fd, state)
+                return result
+            finally:
+                if fd is not None:
+                    os.close(fd)
+
+    def _take(self, state: tuple) -> tuple:
+        tokens, updated, rate = state
+        now = time.time()
+        tokens = min(self.burst, tokens + max(0.0, now - updated) * rate)
+        if tokens >= 1:
+            return (tokens - 1, now, rate), 0.0
+        return (tokens, now, rate), (1 - tokens) / rate
+
+    def acquire(self) -> float:
+        """
+        Wait until a request may be sent.
+
+        :return: the time waited in seconds
+        """
+
+        waited = 0.0
+        while True:
+            delay = self._update(self._take)
+            if delay <= 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    def report(self, throttled: bool) -> None:
+        """
+        Adapt the rate to the outcome of a request.
+
+        :param throttled: True if the request was throttled or failed because of the load of the API
+        """
+
+        def adapt(state):
+            tokens, updated, rate = state
+            if throttled:
+                rate = max(self._min_rate, rate * self._decrease)
+            else:
+                rate = min(self.max_rate, rate + self._increase)
+            return (tokens, updated, rate), None
+
+        self._update(adapt)
+
+    @property
+    def rate(self) -> float:
+        """
+        The current rate in requests per second.
+        """
+        return self._update(lambda state: (state, state[2]))
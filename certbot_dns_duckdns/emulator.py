@@ -0,0 +1,401 @@
+"""
+Local emulator of the DuckDNS update API and the DuckDNS nameservers for offline end-to-end tests and benchmarks.
+
+The HTTP server implements the update semantics of the DuckDNS API for TXT records and the DNS server answers the
+queries for the emulated domains with the updated TXT values after a configurable propagation delay. Errors of the
+API can be injected with a configurable rate. Usage:
+
+    python -m certbot_dns_duckdns.emulator --token <token> --domains example,other [--propagation-delay 5]
+"""
+
+import argparse
+import contextlib
+import logging
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import dns.exception
+import dns.flags
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdatatype
+import dns.resolver
+import dns.rrset
+
+logger = logging.getLogger(__name__)
+
+DUCKDNS_ZONE = "duckdns.org"
+NAMESERVER_NAME = f"ns1.{DUCKDNS_ZONE}"
+DEFAULT_TTL = 60
+DEFAULT_ADDRESS = "127.0.0.1"
+
+
+class DuckDNSEmulator:  # pylint: disable=too-many-instance-attributes
+    """
+    Emulator of the DuckDNS update API and nameservers running in background threads.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        token: str,
+        domains: list,
+        *,
+        address: str = DEFAULT_ADDRESS,
+        http_port: int = 0,
+        dns_port: int = 0,
+        propagation_delay: float = 0,
+        error_rate: float = 0,
+        api_latency: float = 0,
+        delegations: dict = None,
+        seed: int = None,
+    ) -> None:
+        """
+        Creates a new DuckDNSEmulator object.
+
+        :param token: the accepted DuckDNS token
+        :param domains: the DuckDNS root domains of the token, with or without the ".duckdns.org" suffix
+        :param address: the address both servers listen on
+        :param http_port: the port of the HTTP server, 0 selects a free port
+        :param dns_port: the port of the DNS server, 0 selects a free port
+        :param propagation_delay: the seconds after an update until the DNS server serves the new TXT value
+        :param error_rate: the probability of an injected error response of the API
+        :param api_latency: the seconds every API request is delayed
+        :param delegations: mapping of domains to the CNAME targets served by the DNS server,
+            e.g. {"_acme-challenge.example.com": "example.duckdns.org"}
+        :param seed: the seed of the random error injection
+        """
+
+        self.token = token
+        self.address = address
+        self.propagation_delay = propagation_delay
+        self.error_rate = error_rate
+        self.api_latency = api_latency
+        self.delegations = {
+            name.lower().rstrip("."): target.lower().rstrip(".")
+            for name, target in (delegations or {}).items()
+        }
+        self.api_requests = 0
+        self.dns_queries = 0
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # history of the TXT values of every root domain as list of (visible since, value)
+        self._txt_history = {_full_domain(domain): [(0, "")] for domain in domains}
+
+        self._http_server = ThreadingHTTPServer((address, http_port), _APIHandler)
+        self._http_server.daemon_threads = True
+        self._http_server.emulator = self
+        self._dns_server = socketserver.ThreadingUDPServer(
+            (address, dns_port), _DNSHandler
+        )
+        self._dns_server.daemon_threads = True
+        self._dns_server.emulator = self
+        self._threads = []
+
+    @property
+    def api_url(self) -> str:
+        """
+        The URL of the emulated update API.
+        """
+        return f"http://{self.address}:{self._http_server.server_port}/update"
+
+    @property
+    def dns_port(self) -> int:
+        """
+        The port of the emulated nameserver.
+        """
+        return self._dns_server.server_address[1]
+
+    def start(self) -> None:
+        """
+        Start the HTTP and DNS servers in background threads.
+        """
+        for server in (self._http_server, self._dns_server):
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """
+        Stop the HTTP and DNS servers.
+        """
+        for server in (self._http_server, self._dns_server):
+            server.shutdown()
+            server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def resolver(self) -> dns.resolver.Resolver:
+        """
+        Create a resolver which sends all queries to the emulated nameserver.
+
+        :return: the created resolver
+        """
+        resolver = dns.resolver.Resolver(configure=False)
+        resolver.nameservers = [self.address]
+        resolver.port = self.dns_port
+        return resolver
+
+    @contextlib.contextmanager
+    def default_resolver(self):
+        """
+        Context manager which uses the emulated nameserver as default resolver of dnspython.
+        """
+        previous_resolver = dns.resolver.default_resolver
+        dns.resolver.default_resolver = self.resolver()
+        try:
+            yield self
+        finally:
+            dns.resolver.default_resolver = previous_resolver
+
+    def get_txt_value(self, domain: str, served: bool = False):
+        """
+        Get the TXT value of a root domain.
+
+        :param domain: the root domain, with or without the ".duckdns.org" suffix
+        :param served: if True, get the value served by the DNS server, otherwise the latest updated value
+
+        :return: the TXT value, empty if there is no value, or None if the domain is not emulated
+        """
+        with self._lock:
+            history = self._txt_history.get(_full_domain(domain))
+            if history is None:
+                return None
+            if not served:
+                return history[-1][1]
+            now = time.monotonic()
+            return [value for visible, value in history if visible <= now][-1]
+
+    def update(self, params: dict) -> tuple:
+        """
+        Handle the parameters of an update request like the DuckDNS API.
+
+        :param params: the query parameters of the request
+        :return: tuple of the status code and the response body
+        """
+
+        with self._lock:
+            self.api_requests += 1
+            inject_error = self._random.random() < self.error_rate
+            inject_server_error = self._random.random() < 0.5
+
+        if self.api_latency:
+            time.sleep(self.api_latency)
+        if inject_error:
+            return (500, "") if inject_server_error else (200, "KO")
+
+        domains = [_full_domain(d) for d in params.get("domains", "").split(",") if d]
+        if params.get("token") != self.token or not domains:
+            return 200, "KO"
+        if any(d not in self._txt_history for d in domains):
+            return 200, "KO"
+
+        # like the DuckDNS API an empty TXT value is only set with the clear parameter
+        txt = "" if params.get("clear") == "true" else params.get("txt")
+        if txt is not None and (txt or params.get("clear") == "true"):
+            visible = time.monotonic() + self.propagation_delay
+            with self._lock:
+                for domain in domains:
+                    history = self._txt_history[domain]
+                    # keep only the values which can still be served
+                    now = time.monotonic()
+                    while len(history) > 1 and history[1][0] <= now:
+                        history.pop(0)
+                    history.append((visible, txt))
+
+        return 200, "OK"
+
+    def answer(self, query: dns.message.Message) -> dns.message.Message:
+        """
+        Answer a DNS query like the DuckDNS nameservers.
+
+        :param query: the DNS query
+        :return: the DNS response
+        """
+
+        with self._lock:
+            self.dns_queries += 1
+
+        response = dns.message.make_response(query)
+        response.flags |= dns.flags.AA
+        question = query.question[0]
+        name = question.name.to_text().lower().rstrip(".")
+
+        # follow the delegations like a recursive resolver would
+        while name in self.delegations:
+            target = self.delegations[name]
+            response.answer.append(
+                dns.rrset.from_text(
+                    name + ".", DEFAULT_TTL, "IN", "CNAME", target + "."
+                )
+            )
+            name = target
+
+        rdtype = question.rdtype
+        if name == DUCKDNS_ZONE and rdtype == dns.rdatatype.NS:
+            response.answer.append(
+                dns.rrset.from_text(
+                    name + ".", DEFAULT_TTL, "IN", "NS", NAMESERVER_NAME + "."
+                )
+            )
+        elif name == NAMESERVER_NAME and rdtype == dns.rdatatype.A:
+            response.answer.append(
+                dns.rrset.from_text(name + ".", DEFAULT_TTL, "IN", "A", self.address)
+            )
+        elif name.endswith("." + DUCKDNS_ZONE):
+            txt = self.get_txt_value(".".join(name.split(".")[-3:]), served=True)
+            if txt is None:
+                response.set_rcode(dns.rcode.NXDOMAIN)
+            elif rdtype == dns.rdatatype.TXT and txt:
+                response.answer.append(
+                    dns.rrset.from_text(
+                        name + ".", DEFAULT_TTL, "IN", "TXT", f'"{txt}"'
+                    )
+                )
+            elif rdtype == dns.rdatatype.A:
+                response.answer.append(
+                    dns.rrset.from_text(
+                        name + ".", DEFAULT_TTL, "IN", "A", self.address
+                    )
+                )
+        elif name != DUCKDNS_ZONE:
+            response.set_rcode(dns.rcode.NXDOMAIN)
+
+        return response
+
+
+def _full_domain(domain: str) -> str:
+    domain = domain.lower().rstrip(".")
+    if not domain.endswith("." + DUCKDNS_ZONE):
+        domain = f"{domain}.{DUCKDNS_ZONE}"
+    return domain
+
+
+class _APIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Handle an update request.
+        """
+        url = urlparse(self.path)
+        if url.path != "/update":
+            status_code, body = 404, ""
+        else:
+            params = {
+                key: values[-1]
+                for key, values in parse_qs(url.query, keep_blank_values=True).items()
+            }
+            status_code, body = self.server.emulator.update(params)
+
+        body = body.encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "text/plain; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class _DNSHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        """
+        Handle a DNS query.
+        """
+        data, sock = self.request
+        try:
+            query = dns.message.from_wire(data)
+        except dns.exception.DNSException as e:
+            logger.debug("Ignoring invalid DNS query: %s", e)
+            return
+
+        sock.sendto(self.server.emulator.answer(query).to_wire(), self.client_address)
+
+
+def main(argv: list = None) -> None:
+    """
+    Run the emulator until it is interrupted.
+
+    :param argv: the command line arguments without the program name
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="python -m certbot_dns_duckdns.emulator",
+        description="Local emulator of the DuckDNS update API and nameservers.",
+    )
+    parser.add_argument("--token", required=True, help="accepted DuckDNS token")
+    parser.add_argument(
+        "--domains",
+        required=True,
+        help="comma separated DuckDNS root domains of the token",
+    )
+    parser.add_argument("--address", default=DEFAULT_ADDRESS)
+    parser.add_argument("--http-port", type=int, default=8053)
+    parser.add_argument("--dns-port", type=int, default=5353)
+    parser.add_argument(
+        "--propagation-delay",
+        type=float,
+        default=0,
+        help="seconds until an updated TXT value is served",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        help="probability of an injected error response of the API",
+    )
+    parser.add_argument(
+        "--api-latency",
+        type=float,
+        default=0,
+        help="seconds every API request is delayed",
+    )
+    parser.add_argument(
+        "--delegation",
+        action="append",
+        default=[],
+        metavar="NAME=TARGET",
+        help="CNAME record served by the nameserver, can be repeated",
+    )
+    args = parser.parse_args(argv)
+
+    emulator = DuckDNSEmulator(
+        args.token,
+        args.domains.split(","),
+        address=args.address,
+        http_port=args.http_port,
+        dns_port=args.dns_port,
+        propagation_delay=args.propagation_delay,
+        error_rate=args.error_rate,
+        api_latency=args.api_latency,
+        delegations=dict(d.split("=", 1) for d in args.delegation),
+    )
+
+    with emulator:
+        print(f"DuckDNS API:        {emulator.api_url}")
+        print(f"DuckDNS nameserver: {emulator.address} port {emulator.dns_port}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
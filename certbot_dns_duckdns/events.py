@@ -0,0 +1,109 @@
+"""
+Machine-readable stream of the phases of the challenges as JSON lines, e.g. for the controllers of large automated runs.
+
+The stream is a span hook of the metrics: every finished phase is written as one JSON object per line as soon as it
+ends, with the name of the phase, its outcome, start time and duration and the attributes of the span, e.g. the domain,
+the root domain, the HTTP status and the number of attempts of a DuckDNS API call:
+
+    {"phase": "api.set", "outcome": "ok", "start": 1700000000.0, "duration": 0.21, "domain": "example.duckdns.org",
+     "root_domain": "example.duckdns.org", "attempts": 1, "http_status": 200}
+
+Every line is written with a single unbuffered write to a file opened for appending, so the lines of concurrent
+certbot processes writing to the same file are not interleaved.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+# prefix of an event stream target which is an open file descriptor, e.g. fd:3
+FD_PREFIX = "fd:"
+# prefix of the span names of the metrics, which is not part of the phase names of the events
+SPAN_PREFIX = "duckdns."
+
+
+class EventStream:
+    """
+    Span hook writing an event for every finished phase to a file descriptor.
+    """
+
+    def __init__(self, fd: int, close_fd: bool = False) -> None:
+        """
+        Creates a new EventStream object.
+
+        :param fd: the file descriptor to write the events to
+        :param close_fd: if True, the file descriptor is closed by the close method
+        """
+        self._fd = fd
+        self._close_fd = close_fd
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, target: str) -> "EventStream":
+        """
+        Open an event stream to a file, which is appended to, or to an open file descriptor given as fd:N.
+
+        :param target: the path of the file or the file descriptor
+        :raise ValueError: if the file descriptor is not a number
+        :raise OSError: if the file can not be opened
+        :return: the EventStream object
+        """
+
+        if target.startswith(FD_PREFIX):
+            return cls(int(target.removeprefix(FD_PREFIX)))
+
+        return cls(
+            os.open(target, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644),
+            close_fd=True,
+        )
+
+    def emit(self, phase: str, **fields) -> None:
+        """
+        Write an event.
+
+        :param phase: the name of the phase
+        :param fields: the fields of the event, values which are not JSON serializable are written as strings
+        """
+
+        data = (json.dumps({"phase": phase, **fields}, default=str) + "\n").encode()
+        with self._lock:
+            while data:
+                written = os.write(self._fd, data)
+                data = data[written:]
+
+    def __call__(self, name: str, attributes: dict):
+        """
+        Wrap a phase as span hook of the metrics.
+
+        :param name: the name of the span
+        :param attributes: the attributes of the span, including the attributes added while the phase runs
+        :return: the context manager writing the event when the phase ends
+        """
+        return self._span(name.removeprefix(SPAN_PREFIX), attributes)
+
+    @contextlib.contextmanager
+    def _span(self, phase: str, attributes: dict):
+        start = time.time()
+        start_counter = time.perf_counter()
+        fields = {"outcome": "ok"}
+        try:
+            yield
+        except BaseException as e:
+            fields = {"outcome": "error", "error": str(e)}
+            raise
+        finally:
+            fields["start"] = start
+            fields["duration"] = time.perf_counter() - start_counter
+            # the attributes may overwrite the outcome of a phase which handles its errors itself
+            self.emit(phase, **{**fields, **attributes})
+
+    def close(self) -> None:
+        """
+        Close the file of the event stream, a given file descriptor is kept open.
+        """
+
+        if self._close_fd:
+            os.close(self._fd)
+            self._close_fd = False
@@ -0,0 +1,281 @@
+"""
+Metrics and tracing hooks for the DuckDNS API calls, the DNS lookups and the phases of the challenges.
+
+The metrics are collected in memory and can be written in the Prometheus text format, e.g. for the textfile collector
+of the node exporter, or in the OpenMetrics text format. Span hooks receive the name and attributes of every timed
+phase and return a context manager wrapping it, which matches tracer.start_as_current_span of OpenTelemetry:
+
+    metrics.add_span_hook(lambda name, attributes: tracer.start_as_current_span(name, attributes=attributes))
+
+Without metrics the components use NULL_METRICS, whose methods do nothing.
+"""
+
+import contextlib
+import math
+import os
+import tempfile
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+API_REQUEST_DURATION = "duckdns_api_request_duration_seconds"
+API_RETRIES = "duckdns_api_retries_total"
+DNS_LOOKUP_DURATION = "duckdns_dns_lookup_duration_seconds"
+PHASE_DURATION = "duckdns_phase_duration_seconds"
+SKIPPED_WRITES = "duckdns_skipped_writes_total"
+
+_DESCRIPTIONS = {
+    API_REQUEST_DURATION: "Duration of the single requests to the DuckDNS API.",
+    API_RETRIES: "Number of retried DuckDNS API calls.",
+    DNS_LOOKUP_DURATION: "Duration of the DNS lookups.",
+    PHASE_DURATION: "Duration of the phases of the challenges per domain.",
+    SKIPPED_WRITES: "Number of TXT record updates skipped because the record already held the value.",
+}
+
+
+class _Histogram:  # pylint: disable=too-few-public-methods
+    def __init__(self, buckets: tuple) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Count a value in every bucket whose upper bound is not below it.
+        """
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    labels = labels + extra
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(float(bound))
+
+
+def _render_counters(counters: dict, openmetrics: bool) -> list:
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        # OpenMetrics names the counter family without the _total suffix of its samples
+        family = name[: -len("_total")] if openmetrics else name
+        lines.append(f"# HELP {family} {_DESCRIPTIONS.get(name, name)}")
+        lines.append(f"# TYPE {family} counter")
+        for (counter_name, labels), value in sorted(counters.items()):
+            if counter_name == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    return lines
+
+
+def _render_histograms(histograms: dict, buckets: tuple) -> list:
+    lines = []
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# HELP {name} {_DESCRIPTIONS.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for (histogram_name, labels), (counts, count, total) in sorted(
+            histograms.items()
+        ):
+            if histogram_name != name:
+                continue
+            for bound, bucket_count in zip(buckets + (math.inf,), counts + (count,)):
+                le = (("le", _format_bound(bound)),)
+                lines.append(
+                    f"{name}_bucket{_format_labels(labels, le)} {bucket_count}"
+                )
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+    return lines
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and histograms with labels.
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS) -> None:
+        """
+        Creates a new Metrics object.
+
+        :param buckets: the upper bounds of the histogram buckets in seconds
+        """
+
+        self._buckets = tuple(sorted(buckets))
+        self._counters = {}
+        self._histograms = {}
+        self._span_hooks = []
+        self._lock = threading.Lock()
+
+    def add_span_hook(self, hook) -> None:
+        """
+        Add a hook called for every span.
+
+        :param hook: function called with the name and the attributes of a span, returning a context manager which
+            is entered for the duration of the span
+        """
+        self._span_hooks.append(hook)
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Increment a counter.
+
+        :param name: the name of the counter
+        :param value: the value to add
+        :param labels: the labels of the counter
+        """
+
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """
+        Add an observation to a histogram.
+
+        :param name: the name of the histogram
+        :param value: the observed value
+        :param labels: the labels of the histogram
+        """
+
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self._buckets)
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Time a phase. The duration is added to the phase histogram and the span hooks wrap the phase.
+
+        :param name: the name of the phase
+        :param attributes: the attributes of the span, also used as labels of the histogram
+        :return: context manager yielding the attributes of the span, further attributes added to them while the
+            phase runs are passed to the span hooks but not used as labels
+        """
+
+        labels = dict(attributes)
+        with contextlib.ExitStack() as stack:
+            for hook in self._span_hooks:
+                stack.enter_context(hook(f"duckdns.{name}", attributes))
+
+            start = time.perf_counter()
+            try:
+                yield attributes
+            finally:
+                self.observe(
+                    PHASE_DURATION,
+                    time.perf_counter() - start,
+                    phase=name,
+                    **labels,
+                )
+
+    def snapshot(self) -> tuple:
+        """
+        Get a copy of all recorded values, e.g. to pass them to another process.
+
+        :return: the counters and the histograms as tuple of two dicts, the histograms as tuple of the bucket counts,
+            the count and the sum
+        """
+
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (tuple(h.counts), h.count, h.sum)
+                for key, h in self._histograms.items()
+            }
+        return counters, histograms
+
+    def merge(self, snapshot: tuple) -> None:
+        """
+        Add the values of a snapshot of other metrics with the same histogram buckets.
+
+        :param snapshot: the snapshot returned by snapshot
+        """
+
+        counters, histograms = snapshot
+        with self._lock:
+            for key, value in counters.items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, (counts, count, total) in histograms.items():
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = _Histogram(self._buckets)
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.count += count
+                histogram.sum += total
+
+    def render(self, openmetrics: bool = False) -> str:
+        """
+        Render all metrics in the Prometheus or OpenMetrics text format.
+
+        :param openmetrics: if True, the OpenMetrics text format is used, otherwise the Prometheus text format
+
+        :return: the rendered metrics
+        """
+
+        counters, histograms = self.snapshot()
+
+        lines = _render_counters(counters, openmetrics)
+        lines += _render_histograms(histograms, self._buckets)
+        if openmetrics:
+            lines.append("# EOF")
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str, openmetrics: bool = False) -> None:
+        """
+        Write all metrics atomically to a file, so that a collector never reads a partially written file.
+
+        :param path: the path of the file
+        :param openmetrics: if True, the OpenMetrics text format is used, otherwise the Prometheus text format
+
+        :raise OSError: if the file can not be written
+        """
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(
+            dir=directory, prefix=".metrics-", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.render(openmetrics))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+
+
+class _NullMetrics(Metrics):
+    """
+    Metrics which discard everything, used if the metrics are disabled.
+    """
+
+    def add_span_hook(self, hook) -> None:
+        raise ValueError("Span hooks can not be added to the disabled metrics.")
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        pass
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        pass
+
+    def span(self, name: str, **attributes):
+        return contextlib.nullcontext(attributes)
+
+
+NULL_METRICS = _NullMetrics()
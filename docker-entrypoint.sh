@@ -10,4 +10,10 @@ if [ -d /run/secrets ]; then
   done
 fi
 
+# Run the renewal daemon instead of a single certbot command
+if [ "$1" = "daemon" ]; then
+  shift
+  exec certbot-duckdns-daemon "$@"
+fi
+
 certbot $@
@@ -28,16 +28,24 @@ setup(
         "Topic :: Utilities",
         "Topic :: System :: Systems Administration",
     ],
-    packages=find_packages(exclude=["tests"]),
+    packages=find_packages(exclude=["tests", "benchmarks", "benchmarks.*"]),
     python_requires=">=3.10",
     install_requires=[
         "certbot>=1.18.0,<6.0",
         "requests>=2.20.0,<3.0",
         "dnspython>=2.0.0,<3.0",
+        "configobj>=5.0.6",
+        "cryptography>=42.0.0",
     ],
     entry_points={
         "certbot.plugins": [
             "dns-duckdns = certbot_dns_duckdns.cert.client:Authenticator",
-        ]
+        ],
+        "console_scripts": [
+            "certbot-duckdns-batch = certbot_dns_duckdns.cli.batch:main",
+            "certbot-duckdns-daemon = certbot_dns_duckdns.cli.daemon:main",
+            "certbot-duckdns-recover = certbot_dns_duckdns.cli.recover:main",
+            "certbot-duckdns-plan = certbot_dns_duckdns.cli.plan:main",
+        ],
     },
 )
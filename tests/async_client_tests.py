@@ -0,0 +1,83 @@
+import asyncio
+import time
+import unittest
+
+import responses
+
+from certbot_dns_duckdns.duckdns.async_client import AsyncDuckDNSClient
+from certbot_dns_duckdns.duckdns.client import (
+    BASE_URL,
+    NotValidDuckdnsDomainError,
+    TXTUpdateError,
+)
+
+TEST_DUCKDNS_TOKEN = "1234567890abcdef"
+
+
+class AsyncDuckDNSTests(unittest.TestCase):
+    @responses.activate
+    def test_set_txt_records(self):
+        responses.get(url=BASE_URL, body="OK")
+
+        async def run():
+            async with AsyncDuckDNSClient(TEST_DUCKDNS_TOKEN) as client:
+                return await client.set_txt_records(
+                    {
+                        "one.duckdns.org": "ABC",
+                        "two.duckdns.org": "DEF",
+                        "$invalid": "GHI",
+                    }
+                )
+
+        results = asyncio.run(run())
+
+        self.assertIsNone(results["one.duckdns.org"])
+        self.assertIsNone(results["two.duckdns.org"])
+        self.assertIsInstance(results["$invalid"], NotValidDuckdnsDomainError)
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_clear_txt_records_error(self):
+        responses.get(url=BASE_URL, body="KO")
+
+        async def run():
+            async with AsyncDuckDNSClient(TEST_DUCKDNS_TOKEN) as client:
+                return await client.clear_txt_records(["one.duckdns.org"])
+
+        results = asyncio.run(run())
+
+        self.assertIsInstance(results["one.duckdns.org"], TXTUpdateError)
+
+    @responses.activate
+    def test_concurrency(self):
+        delay = 0.2
+
+        def slow_response(request):
+            time.sleep(delay)
+            return 200, {}, "OK"
+
+        responses.add_callback(responses.GET, BASE_URL, callback=slow_response)
+
+        domains = [f"domain{i}.duckdns.org" for i in range(6)]
+
+        async def run(concurrency):
+            async with AsyncDuckDNSClient(
+                TEST_DUCKDNS_TOKEN, concurrency=concurrency
+            ) as client:
+                start = time.monotonic()
+                await client.clear_txt_records(domains)
+                return time.monotonic() - start
+
+        with self.subTest("all requests at once"):
+            self.assertLess(asyncio.run(run(len(domains))), 2 * delay)
+
+        with self.subTest("limited concurrency"):
+            self.assertGreaterEqual(asyncio.run(run(2)), 3 * delay)
+
+    def test_invalid_concurrency(self):
+        with self.assertRaises(ValueError):
+            AsyncDuckDNSClient(TEST_DUCKDNS_TOKEN, concurrency=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,263 @@
+import datetime
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from certbot_dns_duckdns.cli import batch
+
+
+def _write_lineage(config_dir, name, domains, valid_days=90):
+    key = ec.generate_private_key(ec.SECP256R1())
+    subject = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, domains[0])])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(subject)
+        .issuer_name(subject)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=valid_days))
+        .add_extension(
+            x509.SubjectAlternativeName([x509.DNSName(d) for d in domains]),
+            critical=False,
+        )
+        .sign(key, hashes.SHA256())
+    )
+
+    live_dir = os.path.join(config_dir, "live", name)
+    os.makedirs(live_dir, exist_ok=True)
+    os.makedirs(os.path.join(config_dir, "renewal"), exist_ok=True)
+    cert_file = os.path.join(live_dir, "cert.pem")
+    with open(cert_file, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+
+    renewal_file = os.path.join(config_dir, "renewal", f"{name}.conf")
+    with open(renewal_file, "w") as f:
+        f.write(f"cert = {cert_file}\n")
+
+    return renewal_file
+
+
+class BatchTests(unittest.TestCase):
+    def test_load_lineage(self):
+        with tempfile.TemporaryDirectory() as config_dir:
+            renewal_file = _write_lineage(
+                config_dir, "example", ["example.duckdns.org", "*.example.duckdns.org"]
+            )
+
+            with self.subTest("certificate name"):
+                lineage = batch.load_lineage("example", config_dir)
+                self.assertEqual(lineage.name, "example")
+                self.assertEqual(lineage.config_dir, os.path.abspath(config_dir))
+                self.assertEqual(
+                    lineage.domains, ["example.duckdns.org", "*.example.duckdns.org"]
+                )
+
+            with self.subTest("renewal configuration file"):
+                self.assertEqual(
+                    batch.load_lineage(renewal_file),
+                    batch.load_lineage("example", config_dir),
+                )
+
+            with self.subTest("missing lineage"):
+                with self.assertRaises(batch.errors.Error):
+                    batch.load_lineage("missing", config_dir)
+
+    def test_group_lineages(self):
+        first = batch.Lineage("first", "/config/a", ["one.duckdns.org"])
+        second = batch.Lineage(
+            "second", "/config/b", ["*.one.duckdns.org", "sub.one.duckdns.org"]
+        )
+        third = batch.Lineage("third", "/config/c", ["two.duckdns.org"])
+        fourth = batch.Lineage("fourth", "/config/c", ["three.duckdns.org"])
+        fifth = batch.Lineage("fifth", "/config/c", ["*.three.duckdns.org"])
+
+        groups = batch.group_lineages([first, second, third, fourth, fifth])
+
+        # lineages sharing only a config directory are renewed concurrently
+        self.assertEqual(groups, [[first, second], [fourth, fifth], [third]])
+
+    def test_renew_lineages_concurrently(self):
+        delay = 0.2
+        groups = [
+            [batch.Lineage("first", "/config/a", ["one.duckdns.org"])],
+            [batch.Lineage("second", "/config/b", ["two.duckdns.org"])],
+            [
+                batch.Lineage("third", "/config/c", ["three.duckdns.org"]),
+                batch.Lineage("fourth", "/config/c", ["four.duckdns.org"]),
+            ],
+        ]
+
+        running = {}
+        lock = threading.Lock()
+
+        def renew(lineage, args, worker):
+            with lock:
+                # no two concurrent renewals use the same worker directories
+                self.assertNotIn(worker, running)
+                running[worker] = lineage
+            time.sleep(delay)
+            with lock:
+                del running[worker]
+            return batch.RenewalResult(lineage, 0, delay)
+
+        args = batch.parse_args(["unused", "--max-workers", "3"])
+
+        start = time.monotonic()
+        results = batch.renew_lineages(groups, args, renew=renew)
+        duration = time.monotonic() - start
+
+        self.assertEqual(
+            [result.lineage.name for result in results],
+            ["first", "second", "third", "fourth"],
+        )
+        # the groups run in parallel, only the lineages of the last group run one after another
+        self.assertGreaterEqual(duration, 2 * delay)
+        self.assertLess(duration, 3 * delay)
+
+    def test_certbot_command(self):
+        args = batch.parse_args(
+            [
+                "example",
+                "--work-dir",
+                "/work",
+                "--",
+                "--dns-duckdns-propagation-seconds",
+                "60",
+            ]
+        )
+        lineage = batch.Lineage("example", "/config", ["example.duckdns.org"])
+
+        command = batch.certbot_command(lineage, args, worker=1)
+
+        self.assertEqual(args.lineages, ["example"])
+        self.assertEqual(
+            command[:4], ["renew", "--non-interactive", "--cert-name", "example"]
+        )
+        self.assertEqual(command[-2:], ["--dns-duckdns-propagation-seconds", "60"])
+        work_dir = command[command.index("--work-dir") + 1]
+        self.assertTrue(work_dir.startswith("/work/"))
+        # every worker has its own work directory
+        other_command = batch.certbot_command(lineage, args, worker=2)
+        self.assertNotEqual(
+            other_command[other_command.index("--work-dir") + 1], work_dir
+        )
+        # the state shared by the workers is kept below the base work directory
+        for option in batch.SHARED_STATE_OPTIONS:
+            path = command[command.index(option) + 1]
+            self.assertTrue(path.startswith("/work/duckdns/"))
+            self.assertEqual(other_command[other_command.index(option) + 1], path)
+
+        args = batch.parse_args(
+            ["example", "--", "--dns-duckdns-rate-limit-file=/shared/rate-limit"]
+        )
+        command = batch.certbot_command(lineage, args)
+        self.assertEqual(
+            [arg for arg in command if "rate-limit-file" in arg],
+            ["--dns-duckdns-rate-limit-file=/shared/rate-limit"],
+        )
+
+        # every worker writes its metrics below its own work directory, the metrics file is written by the parent
+        for metrics_args in (
+            ["--dns-duckdns-metrics-file", "/metrics.prom"],
+            ["--dns-duckdns-metrics-file=/metrics.prom"],
+        ):
+            args = batch.parse_args(
+                ["example", "--work-dir", "/work", "--", *metrics_args]
+            )
+            command = batch.certbot_command(lineage, args, worker=1)
+            work_dir = command[command.index("--work-dir") + 1]
+            self.assertEqual(
+                command[-1],
+                metrics_args[-1].replace(
+                    "/metrics.prom", f"{work_dir}/duckdns/metrics.prom"
+                ),
+            )
+            self.assertEqual(
+                batch.MetricsAggregator(args.certbot_args).path, "/metrics.prom"
+            )
+
+    def test_lock_config_dirs(self):
+        script = (
+            "import sys\n"
+            "from certbot import errors, util\n"
+            "try:\n"
+            "    util.lock_dir_until_exit(sys.argv[1])\n"
+            "except errors.LockError:\n"
+            "    sys.exit(3)\n"
+        )
+
+        def lock_in_other_process(config_dir):
+            return subprocess.run(
+                [sys.executable, "-c", script, config_dir], check=False
+            ).returncode
+
+        with tempfile.TemporaryDirectory() as config_dir:
+            lineage = batch.Lineage("example", config_dir, ["example.duckdns.org"])
+
+            with batch.lock_config_dirs([lineage]):
+                # other certbot instances can not use the config directory during the renewals
+                self.assertEqual(lock_in_other_process(config_dir), 3)
+
+            self.assertEqual(lock_in_other_process(config_dir), 0)
+
+    def test_unsupported_certbot(self):
+        lineage = batch.Lineage("example", "/config", ["example.duckdns.org"])
+
+        # the workers rely on the private lock registry of certbot
+        with mock.patch.object(batch.certbot, "__version__", "6.0.0"):
+            with self.assertRaises(batch.errors.Error):
+                with batch.lock_config_dirs([lineage]):
+                    pass
+        with mock.patch.object(
+            batch, "certbot_util", mock.Mock(spec=["lock_dir_until_exit"])
+        ):
+            with self.assertRaises(batch.errors.Error):
+                with batch.lock_config_dirs([lineage]):
+                    pass
+
+        self.assertEqual(batch.certbot_util._LOCKS, {})
+
+    def test_renew_in_process(self):
+        args = batch.parse_args(["unused", "--work-dir", "/work", "--", "--dry-run"])
+        lineage = batch.Lineage("example", "/config", ["example.duckdns.org"])
+        root_logger = logging.getLogger()
+        handlers = list(root_logger.handlers)
+
+        def certbot_main(cli_args):
+            # the lock of the config directory held by the parent process is shared
+            batch.certbot_util.lock_dir_until_exit("/config")
+            root_logger.addHandler(logging.NullHandler())
+            raise batch.errors.Error("failed")
+
+        with mock.patch("certbot.main.main", side_effect=certbot_main) as main:
+            result = batch.renew_in_process(lineage, args, worker=3)
+
+        cli_args = main.call_args.args[0]
+        self.assertEqual(
+            cli_args[:4], ["renew", "--non-interactive", "--cert-name", "example"]
+        )
+        self.assertEqual(cli_args[cli_args.index("--config-dir") + 1], "/config")
+        self.assertEqual(cli_args[-1], "--dry-run")
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(root_logger.handlers, handlers)
+        self.assertEqual(batch.certbot_util._LOCKS, {})
+
+        with mock.patch("certbot.main.main", return_value=None):
+            self.assertEqual(batch.renew_in_process(lineage, args).returncode, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
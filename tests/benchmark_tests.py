@@ -0,0 +1,42 @@
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks import suite
+
+
+class BenchmarkSuiteTests(unittest.TestCase):
+    def test_suite_results(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, "results.json")
+
+            suite.main(
+                [
+                    "--output",
+                    output,
+                    "--iterations",
+                    "10",
+                    "--requests",
+                    "2",
+                    "--lookups",
+                    "2",
+                    "--cycle-sizes",
+                    "1",
+                    "3",
+                ]
+            )
+
+            with open(output) as f:
+                results = json.load(f)["results"]
+
+        self.assertEqual(
+            set(results), {"import", "validation", "client", "resolution", "cycle"}
+        )
+        self.assertEqual(set(results["cycle"]), {"1", "3"})
+        self.assertEqual(results["cycle"]["3"]["domains"], 3)
+        self.assertEqual(results["resolution"]["cached"]["count"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
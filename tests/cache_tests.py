@@ -0,0 +1,239 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import dns.name
+import dns.resolver
+import dns.rrset
+from certbot.errors import PluginError
+
+from certbot_dns_duckdns.cert import resolver
+from certbot_dns_duckdns.cert.cache import DelegationCache, SharedCache
+from certbot_dns_duckdns.cert.client import Authenticator, get_duckdns_domain
+from certbot_dns_duckdns.duckdns.client import DuckDNSClient
+from certbot_dns_duckdns.emulator import DuckDNSEmulator
+from tests.cert_client import _achall, _config
+
+TEST_DUCKDNS_TOKEN = "1234567890abcdef"
+
+
+def _delegation_answer(challenge_domain, chain):
+    answer = mock.Mock()
+    answer.canonical_name = dns.name.from_text(chain[-1][0])
+    answer.response.answer = [
+        dns.rrset.from_text(name, ttl, "IN", "CNAME", target)
+        for (target, ttl), name in zip(
+            chain, [challenge_domain] + [t for t, _ in chain]
+        )
+    ]
+    return answer
+
+
+class DelegationCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp_dir.name, "duckdns", "delegations.json")
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_persistence(self):
+        DelegationCache(self.path).set("example.com", "abc.duckdns.org", 600)
+
+        self.assertEqual(
+            DelegationCache(self.path).get("example.com"), "abc.duckdns.org"
+        )
+        self.assertIsNone(DelegationCache(self.path).get("other.com"))
+
+    def test_expiry(self):
+        cache = DelegationCache(self.path)
+
+        with mock.patch("time.time", return_value=1000):
+            cache.set("example.com", "abc.duckdns.org", 60)
+        with mock.patch("time.time", return_value=1059):
+            self.assertEqual(cache.get("example.com"), "abc.duckdns.org")
+        with mock.patch("time.time", return_value=1060):
+            self.assertIsNone(cache.get("example.com"))
+
+    def test_invalidate(self):
+        cache = DelegationCache(self.path)
+        cache.set("example.com", "abc.duckdns.org", 600)
+
+        cache.invalidate("example.com")
+
+        self.assertIsNone(cache.get("example.com"))
+        self.assertIsNone(DelegationCache(self.path).get("example.com"))
+
+    def test_unreadable_file(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as f:
+            f.write("{")
+
+        self.assertIsNone(DelegationCache(self.path).get("example.com"))
+
+    def test_get_duckdns_domain_cached(self):
+        cache = DelegationCache(self.path)
+        answer = _delegation_answer(
+            "_acme-challenge.example.com.",
+            [("one.example.com.", 600), ("abc.duckdns.org.", 300)],
+        )
+
+        with (
+            mock.patch("dns.resolver.resolve", return_value=answer) as resolve,
+            mock.patch("time.time", return_value=1000),
+        ):
+            self.assertEqual(
+                get_duckdns_domain("example.com", cache), "abc.duckdns.org"
+            )
+            self.assertEqual(
+                get_duckdns_domain("example.com", cache), "abc.duckdns.org"
+            )
+
+        # only a single lookup of the whole CNAME chain
+        resolve.assert_called_once_with(
+            "_acme-challenge.example.com", "TXT", raise_on_no_answer=False
+        )
+
+        # the entry expires with the lowest TTL of the chain
+        with mock.patch("time.time", return_value=1299):
+            self.assertEqual(cache.get("example.com"), "abc.duckdns.org")
+        with mock.patch("time.time", return_value=1300):
+            self.assertIsNone(cache.get("example.com"))
+
+    def test_get_duckdns_domain_not_delegated(self):
+        with mock.patch("dns.resolver.resolve", side_effect=dns.resolver.NXDOMAIN):
+            with self.assertRaises(PluginError):
+                get_duckdns_domain("example.com")
+
+    def test_get_duckdns_domain_not_duckdns(self):
+        answer = _delegation_answer(
+            "_acme-challenge.example.com.", [("other.example.org.", 600)]
+        )
+
+        with mock.patch("dns.resolver.resolve", return_value=answer):
+            with self.assertRaises(PluginError):
+                get_duckdns_domain("example.com")
+
+
+class SharedCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self.path = os.path.join(self._tmp_dir.name, "duckdns", "cache.sqlite")
+
+    def _cache(self):
+        cache = SharedCache(self.path)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_shared_between_instances(self):
+        self._cache().set("txt", "abc.duckdns.org", "ABCDEF", 60)
+
+        other = self._cache()
+        self.assertEqual(other.get("txt", "abc.duckdns.org"), "ABCDEF")
+        self.assertIsNone(other.get("delegation", "abc.duckdns.org"))
+
+        other.invalidate("txt", "abc.duckdns.org")
+        self.assertIsNone(self._cache().get("txt", "abc.duckdns.org"))
+
+    def test_expiry(self):
+        cache = self._cache()
+
+        with mock.patch("time.time", return_value=1000):
+            cache.set("txt", "abc.duckdns.org", "", 60)
+        with mock.patch("time.time", return_value=1059):
+            self.assertEqual(cache.get("txt", "abc.duckdns.org"), "")
+        with mock.patch("time.time", return_value=1060):
+            self.assertIsNone(cache.get("txt", "abc.duckdns.org"))
+
+    def test_namespace(self):
+        delegations = self._cache().namespace("delegation")
+
+        delegations.set("example.com", "abc.duckdns.org", 600)
+        self.assertEqual(delegations.get("example.com"), "abc.duckdns.org")
+
+        # a delegation without TTL is not cached
+        delegations.set("example.com", "abc.duckdns.org", 0)
+        self.assertIsNone(delegations.get("example.com"))
+
+    def test_unusable_database(self):
+        os.makedirs(self.path)
+
+        with self.assertLogs("certbot_dns_duckdns.cert.cache", "WARNING"):
+            cache = SharedCache(self.path)
+            cache.set("txt", "abc.duckdns.org", "ABCDEF", 60)
+            self.assertIsNone(cache.get("txt", "abc.duckdns.org"))
+
+
+class SharedCacheAuthenticatorTests(unittest.TestCase):
+    @mock.patch("certbot.display.util.notify")
+    def test_lookups_shared_between_processes(self, notify):
+        emulator = DuckDNSEmulator(
+            TEST_DUCKDNS_TOKEN,
+            ["example"],
+            delegations={"_acme-challenge.example.com": "example.duckdns.org"},
+        )
+        emulator.start()
+        self.addCleanup(emulator.stop)
+        DuckDNSClient(TEST_DUCKDNS_TOKEN, base_url=emulator.api_url).set_txt_record(
+            "example.duckdns.org", "original"
+        )
+
+        achalls = [_achall("example.com", "ABCDEF")]
+
+        with (
+            tempfile.TemporaryDirectory() as base_dir,
+            emulator.default_resolver(),
+            mock.patch.object(resolver, "resolve", wraps=resolver.resolve) as resolve,
+        ):
+            # certbot runs with their own work directories, like the batch renewal
+            for name in ("first", "second"):
+                authenticator = Authenticator(
+                    _config(
+                        duckdns_token=TEST_DUCKDNS_TOKEN,
+                        duckdns_no_txt_restore=False,
+                        duckdns_api_url=emulator.api_url,
+                        duckdns_propagation_seconds=0,
+                        duckdns_shared_cache=True,
+                        duckdns_shared_cache_file=os.path.join(
+                            base_dir, "cache.sqlite"
+                        ),
+                        work_dir=os.path.join(base_dir, name),
+                    ),
+                    name="duckdns",
+                )
+                authenticator.perform(achalls)
+                self.assertEqual(emulator.get_txt_value("example"), "ABCDEF")
+                authenticator.cleanup(achalls)
+                self.assertEqual(emulator.get_txt_value("example"), "original")
+
+        # the delegation and the TXT value are only resolved by the first run, the second run uses the TXT value
+        # restored by the first run
+        self.assertEqual(
+            [call.args[:2] for call in resolve.call_args_list],
+            [
+                ("_acme-challenge.example.com", "TXT"),
+                ("example.duckdns.org", "TXT"),
+            ],
+        )
+
+    def test_missing_file(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            authenticator = Authenticator(
+                _config(
+                    duckdns_token=TEST_DUCKDNS_TOKEN,
+                    duckdns_shared_cache=True,
+                    work_dir=work_dir,
+                ),
+                name="duckdns",
+            )
+
+            # a cache in the locked work directory would not be shared with other certbot processes
+            with self.assertRaises(PluginError):
+                authenticator.perform([_achall("example.duckdns.org", "ABCDEF")])
+            self.assertEqual(os.listdir(work_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,45 @@
+import tempfile
 import unittest
 from argparse import Namespace
+from unittest import mock
 
 import responses
 from certbot.configuration import NamespaceConfig
 from certbot.errors import PluginError
 
-from certbot_dns_duckdns.cert.client import Authenticator
+from certbot_dns_duckdns.cert.client import Authenticator, _get_achall_domain
+
+
+def _achall(domain, validation):
+    achall = mock.Mock()
+    achall.identifier.value = domain
+    achall.validation_domain_name.return_value = f"_acme-challenge.{domain}"
+    achall.validation.return_value = validation
+    return achall
+
+
+def _config(**kwargs):
+    options = {
+        "duckdns_token": "token",
+        "duckdns_no_txt_restore": True,
+        "config_dir": "config_dir",
+        "work_dir": "work_dir",
+        "logs_dir": "logs_dir",
+        "http01_port": 80,
+        "https_port": 443,
+        "domains": ["example.duckdns.org"],
+    }
+    options.update(kwargs)
+    return NamespaceConfig(Namespace(**options))
 
 
 class TestCertClient(unittest.TestCase):
+    def setUp(self):
+        # the authenticators write their state to the work directory
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self.work_dir = self._tmp_dir.name
+
     @responses.activate
     def test_valid_auth(self):
         api_token = "token"
@@ -25,7 +56,7 @@ class TestCertClient(unittest.TestCase):
             duckdns_token_token_env="DUCKDNS_TOKEN",
             duckdns_no_txt_restore=False,
             config_dir="config_dir",
-            work_dir="work_dir",
+            work_dir=self.work_dir,
             logs_dir="logs_dir",
             http01_port=80,
             https_port=443,
@@ -53,7 +84,7 @@ class TestCertClient(unittest.TestCase):
             duckdns_token_token_env="DUCKDNS_TOKEN",
             duckdns_no_txt_restore=False,
             config_dir="config_dir",
-            work_dir="work_dir",
+            work_dir=self.work_dir,
             logs_dir="logs_dir",
             http01_port=80,
             https_port=443,
@@ -84,7 +115,7 @@ class TestCertClient(unittest.TestCase):
             duckdns_token_token_env="DUCKDNS_TOKEN",
             duckdns_no_txt_restore=False,
             config_dir="config_dir",
-            work_dir="work_dir",
+            work_dir=self.work_dir,
             logs_dir="logs_dir",
             http01_port=80,
             https_port=443,
@@ -115,7 +146,7 @@ class TestCertClient(unittest.TestCase):
             duckdns_token_token_env="DUCKDNS_TOKEN",
             duckdns_no_txt_restore=False,
             config_dir="config_dir",
-            work_dir="work_dir",
+            work_dir=self.work_dir,
             logs_dir="logs_dir",
             http01_port=80,
             https_port=443,
@@ -126,3 +157,182 @@ class TestCertClient(unittest.TestCase):
         authenticator = Authenticator(config, name="duckdns")
 
         authenticator._cleanup(domain=domain, validation_name="", validation=txt_value)
+
+    def test_client_reuse(self):
+        namespace = Namespace(
+            duckdns_token="reuse-token",
+            config_dir="config_dir",
+            work_dir=self.work_dir,
+            logs_dir="logs_dir",
+            http01_port=80,
+            https_port=443,
+            domains=["example.duckdns.org"],
+        )
+        config = NamespaceConfig(namespace)
+
+        first_client = Authenticator(config, name="duckdns")._get_duckdns_client()
+        second_client = Authenticator(config, name="duckdns")._get_duckdns_client()
+
+        # the authenticators share the kept alive connections
+        self.assertIs(first_client._session, second_client._session)
+
+    def test_client_options(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            first_client = Authenticator(
+                _config(duckdns_token="reuse-token", work_dir=work_dir),
+                name="duckdns",
+            )._get_duckdns_client()
+            second_client = Authenticator(
+                _config(
+                    duckdns_token="reuse-token",
+                    duckdns_read_timeout=30.0,
+                    duckdns_retry_attempts=5,
+                    duckdns_rate_limit=2.0,
+                    duckdns_rate_limit_file=f"{work_dir}/rate-limit",
+                    work_dir=work_dir,
+                ),
+                name="duckdns",
+            )._get_duckdns_client()
+
+        # every authenticator gets a client with its own options
+        self.assertIsNot(first_client, second_client)
+        self.assertIsNone(first_client._rate_limiter)
+        self.assertIsNotNone(second_client._rate_limiter)
+        self.assertEqual(second_client._timeout[1], 30.0)
+        self.assertEqual(second_client._retry_policy.attempts, 5)
+        self.assertIs(first_client._session, second_client._session)
+
+    @mock.patch("certbot.display.util.notify")
+    @mock.patch("time.sleep")
+    def test_propagation_poll(self, sleep, notify):
+        namespace = Namespace(
+            duckdns_token="token",
+            duckdns_propagation_seconds=60,
+            duckdns_propagation_poll=True,
+            config_dir="config_dir",
+            work_dir=self.work_dir,
+            logs_dir="logs_dir",
+            http01_port=80,
+            https_port=443,
+            domains=["example.duckdns.org"],
+        )
+        config = NamespaceConfig(namespace)
+
+        authenticator = Authenticator(config, name="duckdns")
+        authenticator._txt_records = {"example.duckdns.org": "ABCDEF"}
+        resolver = mock.Mock(port=5353)
+
+        with (
+            mock.patch.object(authenticator, "_get_resolver", return_value=resolver),
+            mock.patch(
+                "certbot_dns_duckdns.cert.propagation.get_authoritative_nameservers",
+                return_value=["192.0.2.1"],
+            ),
+            mock.patch(
+                "certbot_dns_duckdns.cert.propagation.wait_for_txt_records",
+                return_value=True,
+            ) as wait_for_txt_records,
+        ):
+            authenticator._wait_for_propagation()
+
+        # the nameservers are queried on the port of the configured resolver
+        wait_for_txt_records.assert_called_once_with(
+            {"example.duckdns.org": "ABCDEF"}, ["192.0.2.1"], 60, port=5353
+        )
+        sleep.assert_not_called()
+
+    @mock.patch("certbot.display.util.notify")
+    @mock.patch("time.sleep")
+    def test_propagation_sleep(self, sleep, notify):
+        namespace = Namespace(
+            duckdns_token="token",
+            duckdns_propagation_seconds=60,
+            duckdns_propagation_poll=False,
+            config_dir="config_dir",
+            work_dir=self.work_dir,
+            logs_dir="logs_dir",
+            http01_port=80,
+            https_port=443,
+            domains=["example.duckdns.org"],
+        )
+        config = NamespaceConfig(namespace)
+
+        authenticator = Authenticator(config, name="duckdns")
+        authenticator._txt_records = {"example.duckdns.org": "ABCDEF"}
+
+        authenticator._wait_for_propagation()
+
+        sleep.assert_called_once_with(60)
+
+
+class TestChallengeGrouping(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+
+    def _authenticator(self):
+        return Authenticator(
+            _config(duckdns_propagation_seconds=0, work_dir=self._tmp_dir.name),
+            name="duckdns",
+        )
+
+    @staticmethod
+    def _updates():
+        return [
+            (call.request.params["domains"], call.request.params["txt"])
+            for call in responses.calls
+        ]
+
+    @responses.activate
+    @mock.patch("certbot.display.util.notify")
+    def test_perform_groups_by_root_domain(self, notify):
+        responses.get(url="https://www.duckdns.org/update", body="OK")
+        achalls = [
+            _achall("example.duckdns.org", "ABCDEF"),
+            _achall("sub.example.duckdns.org", "ABCDEF"),
+            _achall("other.duckdns.org", "GHIJKL"),
+        ]
+
+        authenticator = self._authenticator()
+        challenge_responses = authenticator.perform(achalls)
+
+        # every challenge is answered, but the identical validations of a root domain share one update
+        self.assertEqual(len(challenge_responses), 3)
+        self.assertEqual(
+            self._updates(),
+            [("example.duckdns.org", "ABCDEF"), ("other.duckdns.org", "GHIJKL")],
+        )
+
+        responses.calls.reset()
+        authenticator.cleanup(achalls)
+
+        # every root domain is cleared once, both with one request
+        self.assertEqual(self._updates(), [("example,other", "")])
+
+    @responses.activate
+    @mock.patch("certbot.display.util.notify")
+    def test_perform_conflicting_validations(self, notify):
+        responses.get(url="https://www.duckdns.org/update", body="OK")
+        achalls = [
+            _achall("other.duckdns.org", "GHIJKL"),
+            _achall("example.duckdns.org", "ABCDEF"),
+            _achall("*.example.duckdns.org", "MNOPQR"),
+        ]
+
+        with self.assertRaises(PluginError) as context:
+            self._authenticator().perform(achalls)
+
+        self.assertIn("example.duckdns.org", str(context.exception))
+        # the run fails before any TXT record is changed
+        self.assertEqual(len(responses.calls), 0)
+
+    def test_achall_domain(self):
+        self.assertEqual(
+            _get_achall_domain(_achall("example.duckdns.org", "ABCDEF")),
+            "example.duckdns.org",
+        )
+
+        # annotated challenges of certbot versions before 5.3 only have the domain attribute
+        achall = mock.Mock(spec=["domain"])
+        achall.domain = "example.duckdns.org"
+        self.assertEqual(_get_achall_domain(achall), "example.duckdns.org")
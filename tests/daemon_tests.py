@@ -0,0 +1,182 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from certbot import errors
+
+from certbot_dns_duckdns.cli import daemon
+from certbot_dns_duckdns.cli.batch import Lineage, RenewalResult, renew_in_process
+from certbot_dns_duckdns.metrics import API_RETRIES, Metrics
+from tests.batch_tests import _write_lineage
+
+
+class DaemonTests(unittest.TestCase):
+    def test_refresh_schedules_from_expiry(self):
+        with tempfile.TemporaryDirectory() as config_dir:
+            _write_lineage(config_dir, "expiring", ["one.duckdns.org"], valid_days=10)
+            _write_lineage(config_dir, "fresh", ["two.duckdns.org"], valid_days=90)
+
+            renewal_daemon = daemon.RenewalDaemon(
+                daemon.parse_args(["--config-dir", config_dir, "--jitter", "0"])
+            )
+            renewal_daemon.refresh()
+
+            schedule = {
+                key[1]: (lineage, renew_at)
+                for key, (lineage, renew_at) in renewal_daemon.schedule.items()
+            }
+            self.assertEqual(set(schedule), {"expiring", "fresh"})
+            for lineage, renew_at in schedule.values():
+                self.assertEqual(renew_at, lineage.expires - 30 * 86400)
+
+            now = time.time()
+            self.assertLess(schedule["expiring"][1], now)
+            self.assertGreater(schedule["fresh"][1], now)
+            self.assertEqual(renewal_daemon.next_wakeup(now), 0)
+
+    def test_run_due(self):
+        with tempfile.TemporaryDirectory() as config_dir:
+            _write_lineage(config_dir, "renewed", ["one.duckdns.org"], valid_days=10)
+            _write_lineage(config_dir, "failed", ["two.duckdns.org"], valid_days=10)
+            _write_lineage(config_dir, "fresh", ["three.duckdns.org"], valid_days=90)
+
+            renewed = []
+
+            def renew(lineage, args, worker):
+                if lineage.name == "failed":
+                    return RenewalResult(lineage, 1, 0)
+                _write_lineage(config_dir, lineage.name, lineage.domains)
+                renewed.append(lineage.name)
+                return RenewalResult(lineage, 0, 0)
+
+            args = daemon.parse_args(
+                ["--config-dir", config_dir, "--retry-interval", "600"]
+            )
+            renewal_daemon = daemon.RenewalDaemon(args, renew=renew)
+            renewal_daemon.refresh()
+
+            results = renewal_daemon.run_due()
+
+            self.assertEqual(
+                sorted(result.lineage.name for result in results), ["failed", "renewed"]
+            )
+            self.assertEqual(renewed, ["renewed"])
+
+            renewal_daemon.refresh()
+            now = time.time()
+            schedule = {
+                key[1]: renew_at
+                for key, (_, renew_at) in renewal_daemon.schedule.items()
+            }
+            self.assertAlmostEqual(schedule["failed"], now + 600, delta=5)
+            self.assertGreater(schedule["renewed"], now + 50 * 86400)
+            self.assertEqual(renewal_daemon.run_due(), [])
+
+    def test_run_due_forces_renewal(self):
+        with (
+            tempfile.TemporaryDirectory() as config_dir,
+            tempfile.TemporaryDirectory() as work_dir,
+        ):
+            # due for the daemon, but not yet within the renewal window of certbot
+            _write_lineage(config_dir, "example", ["one.duckdns.org"], valid_days=45)
+
+            def certbot_main(cli_args):
+                if "--force-renewal" in cli_args:
+                    _write_lineage(config_dir, "example", ["one.duckdns.org"])
+
+            args = daemon.parse_args(
+                [
+                    "--config-dir",
+                    config_dir,
+                    "--work-dir",
+                    work_dir,
+                    "--logs-dir",
+                    work_dir,
+                    "--renew-before",
+                    "60",
+                ]
+            )
+            renewal_daemon = daemon.RenewalDaemon(args, renew=renew_in_process)
+            renewal_daemon.refresh()
+
+            with mock.patch("certbot.main.main", side_effect=certbot_main):
+                (result,) = renewal_daemon.run_due()
+
+            self.assertEqual(result.returncode, 0)
+            # the renewed certificate is scheduled again by the next refresh
+            self.assertEqual(renewal_daemon.schedule, {})
+
+    def test_run_due_with_locked_config_dir(self):
+        with tempfile.TemporaryDirectory() as config_dir:
+            _write_lineage(config_dir, "example", ["one.duckdns.org"], valid_days=10)
+
+            renew = mock.Mock()
+            args = daemon.parse_args(
+                ["--config-dir", config_dir, "--retry-interval", "600"]
+            )
+            renewal_daemon = daemon.RenewalDaemon(args, renew=renew)
+            renewal_daemon.refresh()
+
+            with mock.patch.object(
+                daemon,
+                "lock_config_dirs",
+                side_effect=errors.LockError("locked"),
+            ):
+                self.assertEqual(renewal_daemon.run_due(), [])
+
+            renew.assert_not_called()
+            ((_, renew_at),) = renewal_daemon.schedule.values()
+            self.assertAlmostEqual(renew_at, time.time() + 600, delta=5)
+
+    def test_run_due_aggregates_metrics(self):
+        with tempfile.TemporaryDirectory() as config_dir:
+            _write_lineage(config_dir, "first", ["one.duckdns.org"], valid_days=10)
+            _write_lineage(config_dir, "second", ["two.duckdns.org"], valid_days=10)
+            metrics_file = os.path.join(config_dir, "metrics.prom")
+
+            # metrics of the worker processes, which only record their own renewals
+            worker_metrics = {"first": Metrics(), "second": Metrics()}
+
+            def renew(lineage, args, worker):
+                metrics = worker_metrics[lineage.name]
+                metrics.increment(API_RETRIES, operation="set")
+                return RenewalResult(lineage, 1, 0, (lineage.name, metrics.snapshot()))
+
+            args = daemon.parse_args(
+                [
+                    "--config-dir",
+                    config_dir,
+                    "--retry-interval",
+                    "0",
+                    "--",
+                    "--dns-duckdns-metrics-file",
+                    metrics_file,
+                ]
+            )
+            renewal_daemon = daemon.RenewalDaemon(args, renew=renew)
+            renewal_daemon.refresh()
+
+            renewal_daemon.run_due()
+            with open(metrics_file) as f:
+                self.assertIn('duckdns_api_retries_total{operation="set"} 2', f.read())
+
+            # the metrics of a worker process are counted once, even if it renews again
+            renewal_daemon.run_due(time.time() + 1)
+            with open(metrics_file) as f:
+                self.assertIn('duckdns_api_retries_total{operation="set"} 4', f.read())
+
+    def test_next_wakeup_is_limited_by_rescan_interval(self):
+        renewal_daemon = daemon.RenewalDaemon(
+            daemon.parse_args(["--rescan-interval", "60"])
+        )
+        self.assertEqual(renewal_daemon.next_wakeup(0), 60)
+
+        lineage = Lineage("example", "/config", ["example.duckdns.org"], 1000)
+        renewal_daemon.schedule[("/config", "example")] = (lineage, 30)
+        self.assertEqual(renewal_daemon.next_wakeup(0), 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
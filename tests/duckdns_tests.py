@@ -1,7 +1,18 @@
 import unittest
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import requests
+import responses
 
 from certbot_dns_duckdns.duckdns.client import (
+    BASE_URL,
+    BulkUpdateError,
     DuckDNSClient,
+    NotValidDuckdnsDomainError,
+    TXTUpdateError,
+    classify_domain,
+    classify_domains,
     is_valid_duckdns_domain,
     is_valid_full_duckdns_domain,
 )
@@ -137,6 +148,118 @@ class DuckDNSTests(unittest.TestCase):
             self.assertFalse(is_valid_full_duckdns_domain("test.duckduckduck.org"))
             self.assertFalse(is_valid_full_duckdns_domain("test.duckdns.com"))
 
+    def test_classify_domain(self):
+        with self.subTest("full domain"):
+            classification = classify_domain("sub." + TEST_DOMAIN)
+            self.assertTrue(classification.valid)
+            self.assertTrue(classification.full)
+            self.assertEqual(classification.full_domain, "sub." + TEST_DOMAIN)
+            self.assertEqual(classification.root_domain, TEST_DOMAIN)
+            self.assertFalse(classification.needs_delegation)
+        with self.subTest("subdomain only"):
+            classification = classify_domain("example")
+            self.assertTrue(classification.valid)
+            self.assertFalse(classification.full)
+            self.assertEqual(classification.full_domain, TEST_DOMAIN)
+            self.assertEqual(classification.root_domain, "example")
+            self.assertTrue(classification.needs_delegation)
+        with self.subTest("invalid domain"):
+            classification = classify_domain("$invalid")
+            self.assertFalse(classification.valid)
+            self.assertIsNone(classification.full_domain)
+            self.assertIsNone(classification.root_domain)
+            self.assertTrue(classification.needs_delegation)
+
+    def test_classify_domains(self):
+        classify_domain.cache_clear()
+        domains = ["a." + TEST_DOMAIN, "example.com", "a." + TEST_DOMAIN]
+
+        classifications = classify_domains(domains)
+
+        self.assertEqual([c.domain for c in classifications], domains)
+        self.assertEqual([c.full for c in classifications], [True, False, True])
+        # every distinct domain is only classified once
+        self.assertEqual(classify_domain.cache_info().misses, 2)
+
+    @responses.activate
+    def test_session_reuse(self):
+        responses.get(url=BASE_URL, body="OK")
+
+        session = requests.Session()
+        with mock.patch.object(session, "get", wraps=session.get) as get:
+            client = DuckDNSClient(TEST_DUCKDNS_TOKEN, session=session)
+            client.set_txt_record(TEST_DOMAIN, "ABCDEF")
+            client.clear_txt_record(TEST_DOMAIN)
+
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_timeouts(self):
+        responses.get(url=BASE_URL, body="OK")
+
+        client = DuckDNSClient(TEST_DUCKDNS_TOKEN, timeout=(1, 2))
+        with mock.patch.object(
+            client._session, "get", wraps=client._session.get
+        ) as get:
+            client.set_txt_record(TEST_DOMAIN, "ABCDEF")
+            client.set_txt_record(TEST_DOMAIN, "ABCDEF", timeout=5)
+
+        self.assertEqual(get.call_args_list[0].kwargs["timeout"], (1, 2))
+        self.assertEqual(get.call_args_list[1].kwargs["timeout"], 5)
+
+    @responses.activate
+    def test_bulk_clear_txt_record(self):
+        responses.get(url=BASE_URL, body="OK")
+
+        domains = [f"sub.domain{i}.duckdns.org" for i in range(100)]
+        client = DuckDNSClient(TEST_DUCKDNS_TOKEN)
+        client.bulk_clear_txt_record(domains + ["domain0"], max_url_length=300)
+
+        sent = []
+        for call in responses.calls:
+            self.assertLessEqual(len(call.request.url), 300)
+            params = parse_qs(urlparse(call.request.url).query)
+            self.assertEqual(params["token"], [TEST_DUCKDNS_TOKEN])
+            self.assertEqual(params["clear"], ["true"])
+            sent += params["domains"][0].split(",")
+
+        self.assertGreater(len(responses.calls), 1)
+        self.assertLess(len(responses.calls), 20)
+        self.assertEqual(sent, [f"domain{i}" for i in range(100)])
+
+    @responses.activate
+    def test_bulk_set_txt_record_failed_chunk(self):
+        def callback(request):
+            domains = parse_qs(urlparse(request.url).query)["domains"][0]
+            return 200, {}, "KO" if "domain5" in domains.split(",") else "OK"
+
+        responses.add_callback(responses.GET, BASE_URL, callback=callback)
+
+        domains = [f"domain{i}" for i in range(10)]
+        client = DuckDNSClient(TEST_DUCKDNS_TOKEN)
+        with self.assertRaises(BulkUpdateError) as context:
+            client.bulk_set_txt_record(domains, "ABCDEF", max_url_length=100)
+
+        # the requests after the failed request are sent as well
+        self.assertEqual(len(context.exception.failures), 1)
+        failed_domains, error = context.exception.failures[0]
+        self.assertIn("domain5", failed_domains)
+        self.assertIsInstance(error, TXTUpdateError)
+        self.assertEqual(
+            sorted(context.exception.succeeded + failed_domains), sorted(domains)
+        )
+
+    @responses.activate
+    def test_bulk_update_invalid_domain(self):
+        client = DuckDNSClient(TEST_DUCKDNS_TOKEN)
+        with self.assertRaises(NotValidDuckdnsDomainError):
+            client.bulk_clear_txt_record(["example", "$invalid"])
+        with self.assertRaises(ValueError):
+            client.bulk_clear_txt_record(["a" * 100], max_url_length=100)
+
+        self.assertEqual(len(responses.calls), 0)
+
 
 if __name__ == "__main__":
     unittest.main()
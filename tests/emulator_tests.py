@@ -0,0 +1,360 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import dns.resolver
+import requests
+from certbot.errors import PluginError
+
+from certbot_dns_duckdns.cert.client import Authenticator
+from certbot_dns_duckdns.duckdns.client import DuckDNSClient, TXTUpdateError
+from certbot_dns_duckdns.emulator import DuckDNSEmulator
+from tests.cert_client import _achall, _config
+
+TEST_DUCKDNS_TOKEN = "1234567890abcdef"
+
+
+class EmulatorTests(unittest.TestCase):
+    def _start_emulator(self, **kwargs):
+        emulator = DuckDNSEmulator(
+            TEST_DUCKDNS_TOKEN, ["example", "other.duckdns.org"], **kwargs
+        )
+        emulator.start()
+        self.addCleanup(emulator.stop)
+        return emulator
+
+    def test_update_api(self):
+        emulator = self._start_emulator()
+        client = DuckDNSClient(TEST_DUCKDNS_TOKEN, base_url=emulator.api_url)
+
+        client.set_txt_record("sub.example.duckdns.org", "ABCDEF")
+        self.assertEqual(emulator.get_txt_value("example"), "ABCDEF")
+
+        client.clear_txt_record("example.duckdns.org")
+        self.assertEqual(emulator.get_txt_value("example"), "")
+
+        with self.subTest("unknown domain"):
+            with self.assertRaises(TXTUpdateError):
+                client.set_txt_record("unknown.duckdns.org", "ABCDEF")
+
+        with self.subTest("wrong token"):
+            with self.assertRaises(TXTUpdateError):
+                DuckDNSClient("wrong", base_url=emulator.api_url).clear_txt_record(
+                    "example.duckdns.org"
+                )
+
+        with self.subTest("multiple domains"):
+            params = {
+                "token": TEST_DUCKDNS_TOKEN,
+                "domains": "example,other",
+                "txt": "GHIJKL",
+            }
+            self.assertEqual(requests.get(emulator.api_url, params=params).text, "OK")
+            self.assertEqual(emulator.get_txt_value("other"), "GHIJKL")
+
+    def test_dns_propagation_delay(self):
+        emulator = self._start_emulator(propagation_delay=0.3)
+        resolver = emulator.resolver()
+
+        DuckDNSClient(TEST_DUCKDNS_TOKEN, base_url=emulator.api_url).set_txt_record(
+            "example.duckdns.org", "ABCDEF"
+        )
+
+        with self.assertRaises(dns.resolver.NoAnswer):
+            resolver.resolve("example.duckdns.org", "TXT")
+
+        time.sleep(0.3)
+        answer = resolver.resolve("sub.example.duckdns.org", "TXT")
+        self.assertEqual(answer[0].to_text(), '"ABCDEF"')
+
+        with self.assertRaises(dns.resolver.NXDOMAIN):
+            resolver.resolve("unknown.duckdns.org", "TXT")
+
+    def test_error_injection(self):
+        emulator = self._start_emulator(error_rate=1)
+
+        with self.assertRaises(TXTUpdateError):
+            DuckDNSClient(
+                TEST_DUCKDNS_TOKEN, base_url=emulator.api_url
+            ).clear_txt_record("example.duckdns.org")
+
+    @mock.patch("certbot.display.util.notify")
+    def test_authenticator(self, notify):
+        emulator = self._start_emulator(
+            propagation_delay=0.2,
+            delegations={"_acme-challenge.example.com": "other.duckdns.org"},
+        )
+        DuckDNSClient(TEST_DUCKDNS_TOKEN, base_url=emulator.api_url).set_txt_record(
+            "example.duckdns.org", "original"
+        )
+        time.sleep(0.2)
+
+        achalls = [
+            _achall("example.duckdns.org", "ABCDEF"),
+            _achall("example.com", "GHIJKL"),
+        ]
+
+        with tempfile.TemporaryDirectory() as work_dir, emulator.default_resolver():
+            authenticator = Authenticator(
+                _config(
+                    duckdns_token=TEST_DUCKDNS_TOKEN,
+                    duckdns_no_txt_restore=False,
+                    duckdns_api_url=emulator.api_url,
+                    duckdns_propagation_seconds=10,
+                    duckdns_propagation_poll=True,
+                    work_dir=work_dir,
+                ),
+                name="duckdns",
+            )
+
+            start = time.monotonic()
+            authenticator.perform(achalls)
+            self.assertLess(time.monotonic() - start, 5)
+
+            self.assertEqual(emulator.get_txt_value("example", served=True), "ABCDEF")
+            self.assertEqual(emulator.get_txt_value("other", served=True), "GHIJKL")
+            self.assertTrue(
+                os.path.exists(os.path.join(work_dir, "duckdns", "delegations.json"))
+            )
+
+            authenticator.cleanup(achalls)
+
+        self.assertEqual(emulator.get_txt_value("example"), "original")
+        self.assertEqual(emulator.get_txt_value("other"), "")
+
+    @mock.patch("certbot.display.util.notify")
+    def test_authenticator_bulk_cleanup(self, notify):
+        emulator = self._start_emulator()
+        achalls = [
+            _achall("example.duckdns.org", "ABCDEF"),
+            _achall("other.duckdns.org", "GHIJKL"),
+        ]
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            authenticator = Authenticator(
+                _config(
+                    duckdns_token=TEST_DUCKDNS_TOKEN,
+                    duckdns_no_txt_restore=True,
+                    duckdns_api_url=emulator.api_url,
+                    duckdns_propagation_seconds=0,
+                    work_dir=work_dir,
+                ),
+                name="duckdns",
+            )
+            authenticator.perform(achalls)
+
+            with mock.patch.object(
+                DuckDNSClient,
+                "_update",
+                autospec=True,
+                side_effect=DuckDNSClient._update,
+            ) as update:
+                authenticator.cleanup(achalls)
+
+        # both TXT records are cleared with a single request
+        self.assertEqual(update.call_count, 1)
+        self.assertEqual(emulator.get_txt_value("example"), "")
+        self.assertEqual(emulator.get_txt_value("other"), "")
+
+    @mock.patch("certbot.display.util.notify")
+    def test_authenticator_failed_perform(self, notify):
+        emulator = self._start_emulator()
+        DuckDNSClient(TEST_DUCKDNS_TOKEN, base_url=emulator.api_url).set_txt_record(
+            "other.duckdns.org", "user-value"
+        )
+        achalls = [
+            _achall("example.duckdns.org", "ABCDEF"),
+            _achall("other.duckdns.org", "GHIJKL"),
+        ]
+
+        with tempfile.TemporaryDirectory() as work_dir, emulator.default_resolver():
+            authenticator = Authenticator(
+                _config(
+                    duckdns_token=TEST_DUCKDNS_TOKEN,
+                    duckdns_no_txt_restore=False,
+                    duckdns_api_url=emulator.api_url,
+                    duckdns_propagation_seconds=0,
+                    work_dir=work_dir,
+                ),
+                name="duckdns",
+            )
+
+            # the update of the first root domain fails, so perform stops before the second one
+            with mock.patch.object(
+                DuckDNSClient,
+                "set_txt_record",
+                side_effect=requests.ConnectionError("connection refused"),
+            ):
+                with self.assertRaises(PluginError):
+                    authenticator.perform(achalls)
+
+            authenticator.cleanup(achalls)
+
+            self.assertEqual(authenticator._journal.pending(), {})
+
+        # the TXT record perform did not touch keeps its value
+        self.assertEqual(emulator.get_txt_value("other"), "user-value")
+        self.assertEqual(emulator.get_txt_value("example"), "")
+
+    @mock.patch("certbot.display.util.notify")
+    def test_authenticator_resolver_options(self, notify):
+        emulator = self._start_emulator(
+            delegations={"_acme-challenge.example.com": "other.duckdns.org"}
+        )
+        DuckDNSClient(TEST_DUCKDNS_TOKEN, base_url=emulator.api_url).set_txt_record(
+            "other.duckdns.org", "original"
+        )
+        self.addCleanup(setattr, Authenticator, "_resolver_cache", None)
+
+        achalls = [_achall("example.com", "ABCDEF")]
+
+        # the configured nameserver is queried on the port of the emulated nameserver
+        with (
+            tempfile.TemporaryDirectory() as work_dir,
+            emulator.default_resolver(),
+            mock.patch("certbot_dns_duckdns.cert.resolver.DNS_PORT", emulator.dns_port),
+        ):
+            authenticator = Authenticator(
+                _config(
+                    duckdns_token=TEST_DUCKDNS_TOKEN,
+                    duckdns_no_txt_restore=False,
+                    duckdns_api_url=emulator.api_url,
+                    duckdns_propagation_seconds=0,
+                    duckdns_resolver_nameservers=f" {emulator.address} ",
+                    duckdns_resolver_authoritative=True,
+                    duckdns_resolver_timeout=1.0,
+                    duckdns_resolver_lifetime=2.0,
+                    duckdns_resolver_cache=True,
+                    work_dir=work_dir,
+                ),
+                name="duckdns",
+            )
+
+            authenticator.perform(achalls)
+            self.assertEqual(emulator.get_txt_value("other"), "ABCDEF")
+
+            resolver = authenticator._get_resolver()
+            self.assertIs(authenticator._get_resolver(), resolver)
+            self.assertEqual(resolver.port, emulator.dns_port)
+            self.assertEqual(resolver.lifetime, 2.0)
+            self.assertIs(resolver.cache, Authenticator._resolver_cache)
+            self.assertIsNotNone(resolver.cache)
+
+            authenticator.cleanup(achalls)
+
+        self.assertEqual(emulator.get_txt_value("other"), "original")
+
+    @mock.patch("certbot.display.util.notify")
+    def test_authenticator_read_back(self, notify):
+        self.addCleanup(setattr, Authenticator, "_metrics", None)
+        emulator = self._start_emulator()
+        DuckDNSClient(TEST_DUCKDNS_TOKEN, base_url=emulator.api_url).set_txt_record(
+            "example.duckdns.org", "original"
+        )
+        achalls = [_achall("example.duckdns.org", "ABCDEF")]
+
+        with (
+            tempfile.TemporaryDirectory() as work_dir,
+            emulator.default_resolver(),
+            mock.patch("time.sleep") as sleep,
+        ):
+
+            def authenticator():
+                return Authenticator(
+                    _config(
+                        duckdns_token=TEST_DUCKDNS_TOKEN,
+                        duckdns_no_txt_restore=False,
+                        duckdns_api_url=emulator.api_url,
+                        duckdns_propagation_seconds=10,
+                        duckdns_txt_read_back=True,
+                        duckdns_metrics_file=os.path.join(work_dir, "duckdns.prom"),
+                        work_dir=work_dir,
+                    ),
+                    name="duckdns",
+                )
+
+            # a run failing after the TXT record was set
+            authenticator().perform(achalls)
+            sleep.reset_mock()
+
+            retry = authenticator()
+            with mock.patch.object(
+                DuckDNSClient,
+                "_update",
+                autospec=True,
+                side_effect=DuckDNSClient._update,
+            ) as update:
+                retry.perform(achalls)
+                # neither the TXT record is set again nor the propagation awaited
+                update.assert_not_called()
+                sleep.assert_not_called()
+
+                retry.cleanup(achalls)
+                self.assertEqual(update.call_count, 1)
+
+            with open(os.path.join(work_dir, "duckdns.prom")) as f:
+                lines = f.read().splitlines()
+
+        self.assertEqual(emulator.get_txt_value("example"), "original")
+        self.assertIn('duckdns_skipped_writes_total{phase="perform"} 1', lines)
+
+    @mock.patch("certbot.display.util.notify")
+    def test_authenticator_read_back_cleanup(self, notify):
+        emulator = self._start_emulator()
+        achalls = [_achall("example.duckdns.org", "ABCDEF")]
+
+        with tempfile.TemporaryDirectory() as work_dir, emulator.default_resolver():
+            authenticator = Authenticator(
+                _config(
+                    duckdns_token=TEST_DUCKDNS_TOKEN,
+                    duckdns_no_txt_restore=True,
+                    duckdns_api_url=emulator.api_url,
+                    duckdns_propagation_seconds=0,
+                    duckdns_txt_read_back=True,
+                    work_dir=work_dir,
+                ),
+                name="duckdns",
+            )
+
+            with mock.patch.object(
+                DuckDNSClient, "set_txt_record", side_effect=requests.ConnectionError
+            ):
+                with self.assertRaises(PluginError):
+                    authenticator.perform(achalls)
+
+            with mock.patch.object(DuckDNSClient, "clear_txt_record") as clear:
+                authenticator.cleanup(achalls)
+
+        # the failed update did not change the empty TXT record, so it is not cleared
+        clear.assert_not_called()
+
+    def test_resolver_without_system_configuration(self):
+        with mock.patch(
+            "dns.resolver.get_default_resolver",
+            side_effect=dns.resolver.NoResolverConfiguration("no nameservers"),
+        ):
+            # the system configuration is not needed for the configured nameservers
+            authenticator = Authenticator(
+                _config(duckdns_resolver_nameservers="192.0.2.1"), name="duckdns"
+            )
+            resolver = authenticator._get_resolver()
+            self.assertEqual(resolver.nameservers, ["192.0.2.1"])
+            self.assertEqual(resolver.port, 53)
+
+            authenticator = Authenticator(_config(), name="duckdns")
+            with self.assertRaises(PluginError):
+                authenticator._get_resolver()
+
+    def test_invalid_resolver_nameservers(self):
+        authenticator = Authenticator(
+            _config(duckdns_resolver_nameservers="not-an-address"), name="duckdns"
+        )
+
+        with self.assertRaises(PluginError):
+            authenticator._get_resolver()
+
+
+if __name__ == "__main__":
+    unittest.main()
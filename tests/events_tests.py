@@ -0,0 +1,149 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import responses
+from certbot.errors import PluginError
+
+from certbot_dns_duckdns import metrics
+from certbot_dns_duckdns.cert.client import Authenticator
+from certbot_dns_duckdns.duckdns.client import DuckDNSClient, RetryPolicy
+from certbot_dns_duckdns.emulator import DuckDNSEmulator
+from certbot_dns_duckdns.events import EventStream
+from tests.cert_client import _achall, _config
+
+TEST_DUCKDNS_TOKEN = "1234567890abcdef"
+
+
+def _read_events(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class EventStreamTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self.path = os.path.join(self._tmp_dir.name, "events.jsonl")
+
+    def _registry(self, target):
+        stream = EventStream.open(target)
+        self.addCleanup(stream.close)
+        registry = metrics.Metrics()
+        registry.add_span_hook(stream)
+        return registry
+
+    def test_span_events(self):
+        registry = self._registry(self.path)
+
+        with registry.span("resolve", domain="example.com") as span:
+            span["duckdns_domain"] = "example.duckdns.org"
+        with self.assertRaises(ValueError):
+            with registry.span("snapshot", domain="example.com"):
+                raise ValueError("lookup failed")
+
+        events = _read_events(self.path)
+        self.assertEqual(
+            [(e["phase"], e["outcome"]) for e in events],
+            [("resolve", "ok"), ("snapshot", "error")],
+        )
+        self.assertEqual(events[0]["domain"], "example.com")
+        self.assertEqual(events[0]["duckdns_domain"], "example.duckdns.org")
+        self.assertGreaterEqual(events[0]["duration"], 0)
+        self.assertEqual(events[1]["error"], "lookup failed")
+
+        # the attributes added during the span are not used as labels of the histogram
+        self.assertNotIn("duckdns_domain", registry.render())
+
+    def test_file_descriptor(self):
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+        self.addCleanup(os.close, write_fd)
+
+        with self._registry(f"fd:{write_fd}").span("propagation"):
+            pass
+
+        event = json.loads(os.read(read_fd, 4096).decode().splitlines()[0])
+        self.assertEqual(event["phase"], "propagation")
+
+    @responses.activate
+    @mock.patch("time.sleep")
+    def test_client_events(self, sleep):
+        responses.get(url="https://www.duckdns.org/update", status=500, body="KO")
+        responses.get(url="https://www.duckdns.org/update", body="OK")
+
+        client = DuckDNSClient(
+            TEST_DUCKDNS_TOKEN,
+            retry_policy=RetryPolicy(attempts=2, jitter=0),
+            metrics=self._registry(self.path),
+        )
+        client.set_txt_record("example.duckdns.org", "ABCDEF")
+
+        (event,) = _read_events(self.path)
+        self.assertEqual(event["phase"], "api.set")
+        self.assertEqual(event["outcome"], "ok")
+        self.assertEqual(event["root_domain"], "example.duckdns.org")
+        self.assertEqual(event["http_status"], 200)
+        self.assertEqual(event["attempts"], 2)
+
+
+class EventLogAuthenticatorTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, Authenticator, "_metrics", None)
+        self.addCleanup(setattr, Authenticator, "_span_hooks", set())
+
+    @mock.patch("certbot.display.util.notify")
+    def test_event_log(self, notify):
+        emulator = DuckDNSEmulator(
+            TEST_DUCKDNS_TOKEN,
+            ["example"],
+            delegations={"_acme-challenge.example.com": "example.duckdns.org"},
+        )
+        emulator.start()
+        self.addCleanup(emulator.stop)
+
+        achalls = [_achall("example.com", "ABCDEF")]
+
+        with tempfile.TemporaryDirectory() as work_dir, emulator.default_resolver():
+            event_log = os.path.join(work_dir, "events.jsonl")
+            authenticator = Authenticator(
+                _config(
+                    duckdns_token=TEST_DUCKDNS_TOKEN,
+                    duckdns_no_txt_restore=False,
+                    duckdns_api_url=emulator.api_url,
+                    duckdns_propagation_seconds=0,
+                    duckdns_event_log=event_log,
+                    work_dir=work_dir,
+                ),
+                name="duckdns",
+            )
+            authenticator.perform(achalls)
+            # every phase is written as soon as it ends
+            self.assertEqual(_read_events(event_log)[-1]["phase"], "propagation")
+            authenticator.cleanup(achalls)
+
+            events = _read_events(event_log)
+
+        self.assertEqual(
+            [e["phase"] for e in events],
+            ["resolve", "snapshot", "api.set", "propagation", "api.clear", "cleanup"],
+        )
+        self.assertTrue(all(e["outcome"] == "ok" for e in events))
+        self.assertEqual(events[0]["duckdns_domain"], "example.duckdns.org")
+        self.assertEqual(events[2]["http_status"], 200)
+        self.assertEqual(events[3]["domains"], ["example.duckdns.org"])
+        self.assertEqual(events[5]["root_domain"], "example.duckdns.org")
+
+    def test_invalid_event_log(self):
+        authenticator = Authenticator(
+            _config(duckdns_event_log="fd:stdout"), name="duckdns"
+        )
+
+        with self.assertRaises(PluginError):
+            authenticator._get_metrics()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import subprocess
+import sys
+import unittest
+
+from benchmarks.suite import CERTBOT_MODULES, PLUGIN_MODULE, measure_import
+
+# modules only needed once a challenge is performed, which the import of the plugin entry point must not load
+DEFERRED_MODULES = [
+    "dns",
+    "sqlite3",
+    "certbot_dns_duckdns.cert.propagation",
+    "certbot_dns_duckdns.cert.resolver",
+    "certbot_dns_duckdns.duckdns.async_client",
+    "certbot_dns_duckdns.emulator",
+]
+
+
+class ImportTimeTests(unittest.TestCase):
+    def test_entry_point_defers_dnspython(self):
+        modules = measure_import(PLUGIN_MODULE, CERTBOT_MODULES)
+
+        self.assertIn(PLUGIN_MODULE, modules)
+        self.assertEqual([name for name in modules if name.split(".")[0] == "dns"], [])
+
+    def test_entry_point_defers_heavy_modules(self):
+        # certbot has already imported its own modules when it loads the plugin entry point
+        script = (
+            "import sys\n"
+            f"for module in {CERTBOT_MODULES!r}:\n"
+            "    __import__(module)\n"
+            f"__import__({PLUGIN_MODULE!r})\n"
+            f"print(' '.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        )
+
+        self.assertEqual(result.stdout.split(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,221 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from certbot import util as certbot_util
+
+from certbot_dns_duckdns.cert.client import Authenticator
+from certbot_dns_duckdns.cert.journal import TXTJournal
+from certbot_dns_duckdns.cli import recover
+from certbot_dns_duckdns.duckdns.client import DuckDNSClient
+from certbot_dns_duckdns.emulator import DuckDNSEmulator
+from tests.cert_client import _achall, _config
+
+TEST_DUCKDNS_TOKEN = "1234567890abcdef"
+
+
+class TXTJournalTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self.path = os.path.join(self._tmp_dir.name, "duckdns", "txt-journal.jsonl")
+
+    def test_pending(self):
+        journal = TXTJournal(self.path)
+        journal.record_set("example.duckdns.org", "original")
+        journal.record_set("other.duckdns.org", "")
+        # a later set of a crashed run does not replace the value to restore
+        journal.record_set("example.duckdns.org", "challenge")
+        journal.record_done(["other.duckdns.org"])
+
+        self.assertEqual(
+            TXTJournal(self.path).pending(), {"example.duckdns.org": "original"}
+        )
+
+    def test_incomplete_line(self):
+        journal = TXTJournal(self.path)
+        journal.record_set("example.duckdns.org", "original")
+        with open(self.path, "a") as f:
+            f.write('{"op": "done", "doma')
+
+        self.assertEqual(journal.pending(), {"example.duckdns.org": "original"})
+
+    def test_compact(self):
+        journal = TXTJournal(self.path)
+        journal.record_set("example.duckdns.org", "original")
+        journal.record_set("other.duckdns.org", "")
+        journal.record_done(["other.duckdns.org"])
+
+        journal.compact()
+        with open(self.path) as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertEqual(journal.pending(), {"example.duckdns.org": "original"})
+
+        journal.record_done(["example.duckdns.org"])
+        journal.compact()
+        self.assertFalse(os.path.exists(self.path))
+
+
+class RecoveryTests(unittest.TestCase):
+    def setUp(self):
+        self.emulator = DuckDNSEmulator(TEST_DUCKDNS_TOKEN, ["example", "other"])
+        self.emulator.start()
+        self.addCleanup(self.emulator.stop)
+
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self.work_dir = self._tmp_dir.name
+
+        DuckDNSClient(
+            TEST_DUCKDNS_TOKEN, base_url=self.emulator.api_url
+        ).set_txt_record("example.duckdns.org", "original")
+
+    def _authenticator(self, work_dir=None, **kwargs):
+        return Authenticator(
+            _config(
+                duckdns_token=TEST_DUCKDNS_TOKEN,
+                duckdns_no_txt_restore=False,
+                duckdns_api_url=self.emulator.api_url,
+                duckdns_propagation_seconds=0,
+                work_dir=work_dir or self.work_dir,
+                **kwargs,
+            ),
+            name="duckdns",
+        )
+
+    @mock.patch("certbot.display.util.notify")
+    def _crashed_run(self, notify):
+        with self.emulator.default_resolver():
+            self._authenticator().perform([_achall("example.duckdns.org", "ABCDEF")])
+        self.assertEqual(self.emulator.get_txt_value("example"), "ABCDEF")
+
+    @mock.patch("certbot.display.util.notify")
+    def test_recovery_on_next_run(self, notify):
+        self._crashed_run()
+
+        achalls = [_achall("other.duckdns.org", "GHIJKL")]
+        with self.emulator.default_resolver():
+            authenticator = self._authenticator()
+            authenticator.perform(achalls)
+            self.assertEqual(self.emulator.get_txt_value("example"), "original")
+            authenticator.cleanup(achalls)
+
+        self.assertEqual(self.emulator.get_txt_value("other"), "")
+        self.assertFalse(
+            os.path.exists(os.path.join(self.work_dir, "duckdns", "txt-journal.jsonl"))
+        )
+
+    def test_recover_command(self):
+        self._crashed_run()
+
+        argv = [
+            "--work-dir",
+            self.work_dir,
+            "--token",
+            TEST_DUCKDNS_TOKEN,
+            "--api-url",
+            self.emulator.api_url,
+        ]
+        with (
+            mock.patch("logging.basicConfig"),
+            self.assertLogs(recover.logger, "INFO") as logs,
+        ):
+            self.assertEqual(recover.main(argv + ["--dry-run"]), 0)
+            self.assertEqual(self.emulator.get_txt_value("example"), "ABCDEF")
+            self.assertIn('example.duckdns.org: restore "original"', logs.output[0])
+
+            self.assertEqual(recover.main(argv), 0)
+
+        self.assertEqual(self.emulator.get_txt_value("example"), "original")
+        self.assertEqual(recover.find_work_dirs(self.work_dir), [])
+
+    @mock.patch("certbot.display.util.notify")
+    def test_recovery_skips_leased_slots(self, notify):
+        with tempfile.TemporaryDirectory() as base_dir:
+            lock_dir = os.path.join(base_dir, "slots")
+            slot_options = {
+                "duckdns_slot_pool": "example,other",
+                "duckdns_slot_lock_dir": lock_dir,
+            }
+            achalls = [_achall("example.duckdns.org", "GHIJKL")]
+            argv = [
+                "--work-dir",
+                self.work_dir,
+                "--token",
+                TEST_DUCKDNS_TOKEN,
+                "--api-url",
+                self.emulator.api_url,
+                "--slot-pool",
+                "example,other",
+                "--slot-lock-dir",
+                lock_dir,
+            ]
+
+            with self.emulator.default_resolver(), mock.patch("logging.basicConfig"):
+                crashed = self._authenticator(**slot_options)
+                crashed.perform([_achall("example.duckdns.org", "ABCDEF")])
+                # the operating system releases the leases of a killed run
+                crashed._release_slots()
+
+                running = self._authenticator(
+                    os.path.join(base_dir, "running"), **slot_options
+                )
+                running.perform(achalls)
+
+                # the validation value of the running certbot is not overwritten
+                self.assertEqual(recover.main(argv), 0)
+                self.assertEqual(self.emulator.get_txt_value("example"), "GHIJKL")
+                self.assertEqual(recover.find_work_dirs(self.work_dir), [self.work_dir])
+
+                running.cleanup(achalls)
+                self.assertEqual(recover.main(argv), 0)
+
+        self.assertEqual(self.emulator.get_txt_value("example"), "original")
+
+    def test_recover_command_skips_locked_work_dir(self):
+        self._crashed_run()
+        argv = [
+            "--work-dir",
+            self.work_dir,
+            "--token",
+            TEST_DUCKDNS_TOKEN,
+            "--api-url",
+            self.emulator.api_url,
+        ]
+
+        # a certbot run holding the lock of the work directory until its stdin is closed
+        script = (
+            "import sys\n"
+            "from certbot import util\n"
+            "util.lock_dir_until_exit(sys.argv[1])\n"
+            "print('locked', flush=True)\n"
+            "sys.stdin.read()\n"
+        )
+        with subprocess.Popen(
+            [sys.executable, "-c", script, self.work_dir],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        ) as certbot:
+            self.assertEqual(certbot.stdout.readline(), "locked\n")
+            with (
+                mock.patch("logging.basicConfig"),
+                self.assertLogs(recover.logger, "ERROR"),
+            ):
+                self.assertEqual(recover.main(argv), 1)
+            self.assertEqual(self.emulator.get_txt_value("example"), "ABCDEF")
+            certbot.stdin.close()
+
+        with mock.patch("logging.basicConfig"):
+            self.assertEqual(recover.main(argv), 0)
+
+        self.assertEqual(self.emulator.get_txt_value("example"), "original")
+        # the lock is released after the journal is replayed
+        self.assertEqual(certbot_util._LOCKS, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
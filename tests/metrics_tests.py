@@ -0,0 +1,260 @@
+import contextlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import responses
+from certbot.errors import PluginError
+
+from certbot_dns_duckdns import metrics
+from certbot_dns_duckdns.cert.client import Authenticator
+from certbot_dns_duckdns.duckdns.client import DuckDNSClient, RetryPolicy
+from certbot_dns_duckdns.emulator import DuckDNSEmulator
+from tests.cert_client import _achall, _config
+
+TEST_DUCKDNS_TOKEN = "1234567890abcdef"
+
+# span hook loaded by the authenticator test, records the names and attributes of the spans
+RECORDED_SPANS = []
+
+
+@contextlib.contextmanager
+def record_span(name, attributes):
+    RECORDED_SPANS.append((name, dict(attributes)))
+    yield
+
+
+class MetricsTests(unittest.TestCase):
+    def test_render_prometheus(self):
+        registry = metrics.Metrics(buckets=(0.1, 1))
+        registry.increment(metrics.API_RETRIES, operation="set")
+        registry.increment(metrics.API_RETRIES, operation="set")
+        registry.observe(
+            metrics.API_REQUEST_DURATION, 0.5, operation="set", outcome="ok"
+        )
+        registry.observe(metrics.API_REQUEST_DURATION, 2, operation="set", outcome="ok")
+
+        lines = registry.render().splitlines()
+
+        self.assertIn("# TYPE duckdns_api_retries_total counter", lines)
+        self.assertIn('duckdns_api_retries_total{operation="set"} 2', lines)
+        self.assertIn(
+            'duckdns_api_request_duration_seconds_bucket{operation="set",outcome="ok",le="0.1"} 0',
+            lines,
+        )
+        self.assertIn(
+            'duckdns_api_request_duration_seconds_bucket{operation="set",outcome="ok",le="1.0"} 1',
+            lines,
+        )
+        self.assertIn(
+            'duckdns_api_request_duration_seconds_bucket{operation="set",outcome="ok",le="+Inf"} 2',
+            lines,
+        )
+        self.assertIn(
+            'duckdns_api_request_duration_seconds_count{operation="set",outcome="ok"} 2',
+            lines,
+        )
+        self.assertIn(
+            'duckdns_api_request_duration_seconds_sum{operation="set",outcome="ok"} 2.5',
+            lines,
+        )
+        self.assertNotIn("# EOF", lines)
+
+    def test_render_openmetrics(self):
+        registry = metrics.Metrics()
+        registry.increment(metrics.API_RETRIES, operation="clear")
+        registry.observe(metrics.PHASE_DURATION, 1, phase="resolve", domain='a"b')
+
+        lines = registry.render(openmetrics=True).splitlines()
+
+        self.assertIn("# TYPE duckdns_api_retries counter", lines)
+        self.assertIn('duckdns_api_retries_total{operation="clear"} 1', lines)
+        self.assertIn(
+            'duckdns_phase_duration_seconds_count{domain="a\\"b",phase="resolve"} 1',
+            lines,
+        )
+        self.assertEqual(lines[-1], "# EOF")
+
+    def test_span_hooks(self):
+        registry = metrics.Metrics()
+        spans = []
+
+        @contextlib.contextmanager
+        def hook(name, attributes):
+            spans.append(("enter", name, attributes))
+            try:
+                yield
+            finally:
+                spans.append(("exit", name, attributes))
+
+        registry.add_span_hook(hook)
+
+        with self.assertRaises(ValueError):
+            with registry.span("resolve", domain="example.com"):
+                raise ValueError()
+
+        self.assertEqual(
+            spans,
+            [
+                ("enter", "duckdns.resolve", {"domain": "example.com"}),
+                ("exit", "duckdns.resolve", {"domain": "example.com"}),
+            ],
+        )
+        self.assertIn(
+            'duckdns_phase_duration_seconds_count{domain="example.com",phase="resolve"} 1',
+            registry.render().splitlines(),
+        )
+
+    def test_merge(self):
+        first = metrics.Metrics(buckets=(0.1, 1))
+        first.increment(metrics.API_RETRIES, operation="set")
+        first.observe(metrics.API_REQUEST_DURATION, 0.5, operation="set")
+        second = metrics.Metrics(buckets=(0.1, 1))
+        second.increment(metrics.API_RETRIES, operation="set", value=2)
+        second.observe(metrics.API_REQUEST_DURATION, 0.05, operation="set")
+        second.observe(metrics.API_REQUEST_DURATION, 0.5, operation="clear")
+
+        merged = metrics.Metrics(buckets=(0.1, 1))
+        merged.merge(first.snapshot())
+        merged.merge(second.snapshot())
+
+        counters, histograms = merged.snapshot()
+        self.assertEqual(counters, {(metrics.API_RETRIES, (("operation", "set"),)): 3})
+        self.assertEqual(
+            histograms,
+            {
+                (metrics.API_REQUEST_DURATION, (("operation", "set"),)): (
+                    (1, 2),
+                    2,
+                    0.55,
+                ),
+                (metrics.API_REQUEST_DURATION, (("operation", "clear"),)): (
+                    (0, 1),
+                    1,
+                    0.5,
+                ),
+            },
+        )
+
+    def test_null_metrics(self):
+        with metrics.NULL_METRICS.span("resolve", domain="example.com"):
+            metrics.NULL_METRICS.observe(metrics.PHASE_DURATION, 1)
+            metrics.NULL_METRICS.increment(metrics.API_RETRIES)
+
+        self.assertEqual(metrics.NULL_METRICS.render(), "\n")
+        with self.assertRaises(ValueError):
+            metrics.NULL_METRICS.add_span_hook(record_span)
+
+    def test_write_textfile(self):
+        registry = metrics.Metrics()
+        registry.increment(metrics.API_RETRIES, operation="set")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "duckdns.prom")
+            registry.write_textfile(path)
+
+            with open(path) as f:
+                self.assertEqual(f.read(), registry.render())
+            self.assertEqual(os.listdir(tmp_dir), ["duckdns.prom"])
+
+    @responses.activate
+    @mock.patch("time.sleep")
+    def test_client_metrics(self, sleep):
+        registry = metrics.Metrics()
+        responses.get(url="https://www.duckdns.org/update", body="KO")
+        responses.get(url="https://www.duckdns.org/update", body="OK")
+
+        client = DuckDNSClient(
+            TEST_DUCKDNS_TOKEN,
+            retry_policy=RetryPolicy(attempts=2, jitter=0),
+            metrics=registry,
+        )
+        client.set_txt_record("example.duckdns.org", "ABCDEF")
+
+        lines = registry.render().splitlines()
+        self.assertIn('duckdns_api_retries_total{operation="set"} 1', lines)
+        self.assertIn(
+            'duckdns_api_request_duration_seconds_count{operation="set",outcome="failed"} 1',
+            lines,
+        )
+        self.assertIn(
+            'duckdns_api_request_duration_seconds_count{operation="set",outcome="ok"} 1',
+            lines,
+        )
+        self.assertIn(
+            'duckdns_phase_duration_seconds_count{domain="example.duckdns.org",phase="api.set"} 1',
+            lines,
+        )
+
+    @mock.patch("certbot.display.util.notify")
+    def test_authenticator_metrics(self, notify):
+        self.addCleanup(setattr, Authenticator, "_metrics", None)
+        self.addCleanup(setattr, Authenticator, "_span_hooks", set())
+        RECORDED_SPANS.clear()
+
+        emulator = DuckDNSEmulator(TEST_DUCKDNS_TOKEN, ["example"])
+        emulator.start()
+        self.addCleanup(emulator.stop)
+
+        achalls = [_achall("example.duckdns.org", "ABCDEF")]
+
+        with tempfile.TemporaryDirectory() as work_dir, emulator.default_resolver():
+            metrics_file = os.path.join(work_dir, "duckdns.prom")
+            authenticator = Authenticator(
+                _config(
+                    duckdns_token=TEST_DUCKDNS_TOKEN,
+                    duckdns_no_txt_restore=False,
+                    duckdns_api_url=emulator.api_url,
+                    duckdns_propagation_seconds=0,
+                    duckdns_metrics_file=metrics_file,
+                    duckdns_metrics_format="openmetrics",
+                    duckdns_span_hook="tests.metrics_tests:record_span",
+                    work_dir=work_dir,
+                ),
+                name="duckdns",
+            )
+
+            authenticator.perform(achalls)
+            authenticator.cleanup(achalls)
+
+            with open(metrics_file) as f:
+                lines = f.read().splitlines()
+
+        for phase in (
+            "resolve",
+            "snapshot",
+            "api.set",
+            "propagation",
+            "cleanup",
+            "api.clear",
+        ):
+            self.assertTrue(
+                any(f'phase="{phase}"' in line for line in lines), f"missing {phase}"
+            )
+        self.assertTrue(any('record="txt"' in line for line in lines))
+        self.assertEqual(lines[-1], "# EOF")
+        self.assertEqual(
+            [name for name, _ in RECORDED_SPANS],
+            [
+                "duckdns.resolve",
+                "duckdns.snapshot",
+                "duckdns.api.set",
+                "duckdns.propagation",
+                "duckdns.cleanup",
+                "duckdns.api.clear",
+            ],
+        )
+
+    def test_invalid_span_hook(self):
+        self.addCleanup(setattr, Authenticator, "_metrics", None)
+        authenticator = Authenticator(
+            _config(duckdns_span_hook="tests.metrics_tests:missing"), name="duckdns"
+        )
+
+        with self.assertRaises(PluginError):
+            authenticator._get_metrics()
+
+
+if __name__ == "__main__":
+    unittest.main()
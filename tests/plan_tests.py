@@ -0,0 +1,86 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from certbot_dns_duckdns.cli import plan
+from tests.batch_tests import _write_lineage
+
+
+class PlanTests(unittest.TestCase):
+    def test_schedule_groups(self):
+        total, assignment = plan.schedule_groups([50, 30, 20, 10], max_workers=2)
+
+        self.assertEqual(total, 60)
+        self.assertEqual(assignment, [0, 1, 1, 0])
+        self.assertEqual(plan.schedule_groups([], max_workers=2), (0.0, []))
+
+    def test_import_without_certbot_main(self):
+        # the plan command does not run certbot, so it does not import the certbot CLI
+        script = (
+            "import sys\n"
+            "import certbot_dns_duckdns.cli.plan\n"
+            "sys.exit('certbot.main' in sys.modules)\n"
+        )
+        self.assertEqual(
+            subprocess.run([sys.executable, "-c", script], check=False).returncode, 0
+        )
+
+    def test_plan_certificate(self):
+        args = plan.parse_args(["--api-latency", "1", "--overhead", "10"])
+        lineage = plan.Lineage(
+            "example",
+            "/etc/letsencrypt",
+            ["example.duckdns.org", "*.example.duckdns.org", "other.duckdns.org"],
+        )
+
+        certificate = plan.plan_certificate(lineage, args)
+
+        self.assertEqual(
+            certificate.conflicts,
+            {"example.duckdns.org": ["example.duckdns.org", "*.example.duckdns.org"]},
+        )
+        # set and restore of both TXT records, after resolving their original values
+        self.assertEqual(certificate.api_calls, 4)
+        self.assertEqual(certificate.dns_lookups, 2)
+        self.assertEqual(certificate.duration, 10 + 4 + 30)
+
+        args = plan.parse_args(["--no-txt-restore", "--propagation-seconds", "0"])
+        certificate = plan.plan_certificate(lineage, args)
+        # both TXT records are cleared with one request
+        self.assertEqual(certificate.api_calls, 3)
+        self.assertEqual(certificate.dns_lookups, 0)
+
+    @mock.patch("logging.basicConfig")
+    def test_main(self, basic_config):
+        with tempfile.TemporaryDirectory() as config_dir:
+            _write_lineage(config_dir, "first", ["first.duckdns.org"])
+            _write_lineage(config_dir, "second", ["second.duckdns.org"])
+            second_dir = os.path.join(config_dir, "second-dir")
+            second_conf = _write_lineage(second_dir, "third", ["first.duckdns.org"])
+
+            argv = ["--config-dir", config_dir, "--max-workers", "2", "--json"]
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                self.assertEqual(plan.main(argv + ["first", "second", second_conf]), 0)
+            result = json.loads(stdout.getvalue())
+
+            self.assertEqual(result["certificates"], 3)
+            self.assertEqual(result["api_calls"], 6)
+            # only the certificates sharing the TXT record of first.duckdns.org are renewed one after another
+            self.assertEqual(len(result["groups"]), 2)
+            self.assertEqual(result["critical_path"], ["first", "third"])
+
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                self.assertEqual(plan.main(["-d", "a.duckdns.org,*.a.duckdns.org"]), 1)
+            self.assertIn("conflict", stdout.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
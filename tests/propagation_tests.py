@@ -0,0 +1,244 @@
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import dns.message
+import dns.rrset
+from certbot.errors import PluginError
+
+from certbot_dns_duckdns.cert import propagation
+from certbot_dns_duckdns.cert.client import Authenticator
+from certbot_dns_duckdns.emulator import DuckDNSEmulator
+from tests.cert_client import _achall, _config
+
+TEST_DOMAIN = "example.duckdns.org"
+TEST_NAMESERVERS = ["192.0.2.1", "192.0.2.2"]
+TEST_DUCKDNS_TOKEN = "1234567890abcdef"
+
+
+def _txt_response(name, value):
+    query = dns.message.make_query(name, "TXT")
+    response = dns.message.make_response(query)
+    response.answer.append(dns.rrset.from_text(name, 60, "IN", "TXT", f'"{value}"'))
+    return response
+
+
+class PropagationTests(unittest.TestCase):
+    def test_is_txt_record_served(self):
+        with mock.patch(
+            "dns.query.udp", return_value=_txt_response(TEST_DOMAIN, "ABCDEF")
+        ):
+            with self.subTest():
+                self.assertTrue(
+                    propagation.is_txt_record_served(
+                        TEST_DOMAIN, "ABCDEF", TEST_NAMESERVERS[0]
+                    )
+                )
+            with self.subTest():
+                self.assertFalse(
+                    propagation.is_txt_record_served(
+                        TEST_DOMAIN, "GHIJKL", TEST_NAMESERVERS[0]
+                    )
+                )
+
+    def test_is_txt_record_served_port(self):
+        with mock.patch(
+            "dns.query.udp", return_value=_txt_response(TEST_DOMAIN, "ABCDEF")
+        ) as udp:
+            propagation.is_txt_record_served(TEST_DOMAIN, "ABCDEF", TEST_NAMESERVERS[0])
+            propagation.is_txt_record_served(
+                TEST_DOMAIN, "ABCDEF", TEST_NAMESERVERS[0], port=5353
+            )
+
+        self.assertEqual([c.kwargs["port"] for c in udp.call_args_list], [53, 5353])
+
+    def test_is_txt_record_served_query_error(self):
+        with mock.patch("dns.query.udp", side_effect=OSError("unreachable")):
+            self.assertFalse(
+                propagation.is_txt_record_served(
+                    TEST_DOMAIN, "ABCDEF", TEST_NAMESERVERS[0]
+                )
+            )
+
+    @mock.patch("time.sleep")
+    def test_wait_for_txt_records_all_served(self, sleep):
+        # the second nameserver serves the value only in the second polling round
+        served = {TEST_NAMESERVERS[0]: [True], TEST_NAMESERVERS[1]: [False, True]}
+
+        def is_served(name, value, nameserver, port):
+            self.assertEqual(port, 5353)
+            return served[nameserver].pop(0)
+
+        with mock.patch.object(
+            propagation, "is_txt_record_served", side_effect=is_served
+        ) as is_txt_record_served:
+            self.assertTrue(
+                propagation.wait_for_txt_records(
+                    {TEST_DOMAIN: "ABCDEF"}, TEST_NAMESERVERS, 60, port=5353
+                )
+            )
+
+        # served nameservers are not queried again
+        self.assertEqual(is_txt_record_served.call_count, 3)
+        sleep.assert_called_once_with(propagation.DEFAULT_INITIAL_DELAY)
+
+    @mock.patch("time.sleep")
+    def test_wait_for_txt_records_deadline(self, sleep):
+        clock = iter(range(0, 1000, 10))
+
+        with (
+            mock.patch("time.monotonic", side_effect=lambda: next(clock)),
+            mock.patch.object(propagation, "is_txt_record_served", return_value=False),
+        ):
+            self.assertFalse(
+                propagation.wait_for_txt_records(
+                    {TEST_DOMAIN: "ABCDEF"}, TEST_NAMESERVERS, 30
+                )
+            )
+
+        # the delay grows exponentially and is bounded by the remaining time
+        self.assertEqual(
+            [c.args[0] for c in sleep.call_args_list],
+            [1.0, 2.0],
+        )
+
+
+class QuorumTests(unittest.TestCase):
+    def test_quorum_reached(self):
+        # the first resolver serves the value in the second polling round, the second one never
+        rounds = []
+
+        def is_served(name, value, nameserver, port):
+            if nameserver == TEST_NAMESERVERS[1]:
+                return False
+            rounds.append(nameserver)
+            return len(rounds) > 1
+
+        start = time.monotonic()
+        with mock.patch.object(
+            propagation, "is_txt_record_served", side_effect=is_served
+        ):
+            lags = propagation.wait_for_quorum(
+                {TEST_DOMAIN: "ABCDEF"}, TEST_NAMESERVERS, 1, 10, initial_delay=0.05
+            )
+
+        # the polling of the lagging resolver is stopped with the quorum
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(list(lags), [TEST_NAMESERVERS[0]])
+        self.assertGreaterEqual(lags[TEST_NAMESERVERS[0]], 0.05)
+
+    def test_quorum_deadline(self):
+        served = {TEST_NAMESERVERS[0]: True, TEST_NAMESERVERS[1]: False}
+
+        with mock.patch.object(
+            propagation,
+            "is_txt_record_served",
+            side_effect=lambda name, value, nameserver, port: served[nameserver],
+        ):
+            lags = propagation.wait_for_quorum(
+                {TEST_DOMAIN: "ABCDEF"}, TEST_NAMESERVERS, 2, 0.3, initial_delay=0.05
+            )
+
+        self.assertEqual(list(lags), [TEST_NAMESERVERS[0]])
+
+
+class QuorumAuthenticatorTests(unittest.TestCase):
+    def setUp(self):
+        self.emulator = DuckDNSEmulator(
+            TEST_DUCKDNS_TOKEN, ["example"], propagation_delay=0.2
+        )
+        self.emulator.start()
+        self.addCleanup(self.emulator.stop)
+
+        # a resolver which never serves the new value, on the same port like all nameservers of the tests
+        self.lagging_resolver = DuckDNSEmulator(
+            TEST_DUCKDNS_TOKEN,
+            ["example"],
+            address="127.0.0.2",
+            dns_port=self.emulator.dns_port,
+        )
+        self.lagging_resolver.start()
+        self.addCleanup(self.lagging_resolver.stop)
+
+    def _perform(self, **kwargs):
+        achalls = [_achall("example.duckdns.org", "ABCDEF")]
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            authenticator = Authenticator(
+                _config(
+                    duckdns_token=TEST_DUCKDNS_TOKEN,
+                    duckdns_api_url=self.emulator.api_url,
+                    duckdns_propagation_resolvers="127.0.0.1, 127.0.0.2",
+                    work_dir=work_dir,
+                    **kwargs,
+                ),
+                name="duckdns",
+            )
+            with (
+                self.emulator.default_resolver(),
+                mock.patch("certbot.display.util.notify"),
+                self.assertLogs("certbot_dns_duckdns.cert.client", "INFO") as logs,
+            ):
+                start = time.monotonic()
+                authenticator.perform(achalls)
+                duration = time.monotonic() - start
+
+        return duration, logs.output
+
+    def test_quorum(self):
+        duration, logs = self._perform(
+            duckdns_propagation_seconds=10, duckdns_propagation_quorum=1
+        )
+
+        self.assertLess(duration, 5)
+        self.assertTrue(
+            any(
+                "Resolver 127.0.0.1 served the TXT records after" in line
+                for line in logs
+            )
+        )
+        self.assertTrue(
+            any("Resolver 127.0.0.2 did not serve" in line for line in logs)
+        )
+
+    def test_quorum_not_reached(self):
+        duration, logs = self._perform(duckdns_propagation_seconds=1)
+
+        self.assertLess(duration, 5)
+        self.assertTrue(
+            any("Only 1 of the 2 required resolvers" in line for line in logs)
+        )
+
+    def test_invalid_options(self):
+        for options in (
+            {"duckdns_propagation_resolvers": "not-an-address"},
+            {
+                "duckdns_propagation_resolvers": "192.0.2.1",
+                "duckdns_propagation_quorum": 2,
+            },
+        ):
+            authenticator = Authenticator(_config(**options), name="duckdns")
+            with self.assertRaises(PluginError):
+                authenticator._get_propagation_resolvers()
+
+    def test_invalid_options_before_update(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            authenticator = Authenticator(
+                _config(
+                    duckdns_token=TEST_DUCKDNS_TOKEN,
+                    duckdns_api_url=self.emulator.api_url,
+                    duckdns_propagation_resolvers="not-an-address",
+                    work_dir=work_dir,
+                ),
+                name="duckdns",
+            )
+            with self.emulator.default_resolver(), self.assertRaises(PluginError):
+                authenticator.perform([_achall("example.duckdns.org", "ABCDEF")])
+
+        # the run fails before any TXT record is set
+        self.assertEqual(self.emulator.get_txt_value("example"), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
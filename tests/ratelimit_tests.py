@@ -0,0 +1,143 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import responses
+from certbot.errors import PluginError
+
+from certbot_dns_duckdns.cert.client import Authenticator
+from certbot_dns_duckdns.duckdns.client import BASE_URL, DuckDNSClient, TXTUpdateError
+from certbot_dns_duckdns.duckdns.ratelimit import RateLimiter
+from tests.cert_client import _config
+
+TEST_DOMAIN = "example.duckdns.org"
+TEST_DUCKDNS_TOKEN = "1234567890abcdef"
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class RateLimiterTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = _FakeClock()
+        patcher = mock.patch("certbot_dns_duckdns.duckdns.ratelimit.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self.path = os.path.join(self._tmp_dir.name, "duckdns", "rate-limit")
+
+    def test_token_bucket(self):
+        limiter = RateLimiter(2, burst=3)
+
+        for _ in range(3):
+            self.assertEqual(limiter.acquire(), 0)
+        self.assertAlmostEqual(limiter.acquire(), 0.5)
+
+        # the bucket is refilled during idle periods up to the burst
+        self.clock.now += 60
+        for _ in range(3):
+            self.assertEqual(limiter.acquire(), 0)
+        self.assertGreater(limiter.acquire(), 0)
+
+    def test_adaptive_rate(self):
+        limiter = RateLimiter(10, burst=1, increase=0.1, min_rate=0.1)
+
+        limiter.report(throttled=True)
+        self.assertEqual(limiter.rate, 5)
+        for _ in range(10):
+            limiter.report(throttled=True)
+        self.assertEqual(limiter.rate, 1)
+
+        limiter.report(throttled=False)
+        self.assertEqual(limiter.rate, 2)
+        for _ in range(20):
+            limiter.report(throttled=False)
+        self.assertEqual(limiter.rate, 10)
+
+    def test_shared_state_file(self):
+        first = RateLimiter(1, burst=2, path=self.path)
+        second = RateLimiter(1, burst=2, path=self.path)
+
+        first.acquire()
+        first.acquire()
+        # the tokens of the bucket are used up by the other limiter
+        self.assertAlmostEqual(second.acquire(), 1)
+
+        second.report(throttled=True)
+        self.assertEqual(first.rate, 0.5)
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(0)
+
+
+class RateLimitedClientTests(unittest.TestCase):
+    @responses.activate
+    def test_client_reports_throttling(self):
+        responses.get(url=BASE_URL, body="KO")
+        responses.get(url=BASE_URL, body="OK")
+
+        limiter = mock.Mock(spec=RateLimiter)
+        client = DuckDNSClient(TEST_DUCKDNS_TOKEN, rate_limiter=limiter)
+
+        with self.assertRaises(TXTUpdateError):
+            client.set_txt_record(TEST_DOMAIN, "ABCDEF")
+        client.set_txt_record(TEST_DOMAIN, "ABCDEF")
+
+        self.assertEqual(limiter.acquire.call_count, 2)
+        self.assertEqual(
+            limiter.report.call_args_list, [mock.call(True), mock.call(False)]
+        )
+
+    def test_authenticator_options(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            authenticator = Authenticator(
+                _config(duckdns_token=TEST_DUCKDNS_TOKEN, work_dir=work_dir),
+                name="duckdns",
+            )
+            self.assertIsNone(authenticator._get_rate_limiter())
+
+            # a state file in the locked work directory would not be shared with other certbot processes
+            authenticator = Authenticator(
+                _config(
+                    duckdns_token=TEST_DUCKDNS_TOKEN,
+                    duckdns_rate_limit=5,
+                    work_dir=work_dir,
+                ),
+                name="duckdns",
+            )
+            with self.assertRaises(PluginError):
+                authenticator._get_rate_limiter()
+
+            path = os.path.join(work_dir, "rate-limit")
+            authenticator = Authenticator(
+                _config(
+                    duckdns_token=TEST_DUCKDNS_TOKEN,
+                    duckdns_rate_limit=5,
+                    duckdns_rate_limit_file=path,
+                    work_dir=work_dir,
+                ),
+                name="duckdns",
+            )
+            limiter = authenticator._get_rate_limiter()
+            self.assertEqual(limiter.max_rate, 5)
+
+            limiter.acquire()
+            self.assertTrue(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
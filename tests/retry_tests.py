@@ -0,0 +1,155 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from certbot_dns_duckdns.duckdns.client import (
+    DuckDNSClient,
+    NotValidDuckdnsDomainError,
+    RetryPolicy,
+    TXTUpdateError,
+)
+
+TEST_DOMAIN = "example.duckdns.org"
+TEST_DUCKDNS_TOKEN = "1234567890abcdef"
+
+
+class _FlakyServer(ThreadingHTTPServer):
+    """
+    Local DuckDNS API stand-in answering the requests with the queued (status code, body) responses, then with "OK".
+    """
+
+    def __init__(self, responses):
+        super().__init__(("127.0.0.1", 0), _FlakyHandler)
+        self.responses = list(responses)
+        self.requests = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/update"
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests += 1
+        status_code, body = (
+            self.server.responses.pop(0) if self.server.responses else (200, "OK")
+        )
+        body = body.encode()
+        self.send_response(status_code)
+        self.send_header("Content-Length", str(len(body)))
+        if status_code == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _fast_retry_policy(attempts=3, deadline=10):
+    return RetryPolicy(attempts=attempts, backoff=0.01, jitter=0, deadline=deadline)
+
+
+class RetryTests(unittest.TestCase):
+    def _start_server(self, responses):
+        server = _FlakyServer(responses)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_retry_transient_failures(self):
+        server = self._start_server([(503, ""), (200, "KO")])
+        client = DuckDNSClient(
+            TEST_DUCKDNS_TOKEN, base_url=server.url, retry_policy=_fast_retry_policy()
+        )
+
+        client.set_txt_record(TEST_DOMAIN, "ABCDEF")
+
+        self.assertEqual(server.requests, 3)
+
+    def test_retry_rate_limited(self):
+        server = self._start_server([(429, "")])
+        client = DuckDNSClient(
+            TEST_DUCKDNS_TOKEN, base_url=server.url, retry_policy=_fast_retry_policy()
+        )
+
+        client.clear_txt_record(TEST_DOMAIN)
+
+        self.assertEqual(server.requests, 2)
+
+    def test_retry_attempts_exhausted(self):
+        server = self._start_server([(200, "KO")] * 3)
+        client = DuckDNSClient(
+            TEST_DUCKDNS_TOKEN, base_url=server.url, retry_policy=_fast_retry_policy()
+        )
+
+        with self.assertRaises(TXTUpdateError) as context:
+            client.set_txt_record(TEST_DOMAIN, "ABCDEF")
+
+        self.assertEqual(context.exception.domain, TEST_DOMAIN)
+        self.assertEqual(context.exception.txt, "ABCDEF")
+        self.assertEqual(server.requests, 3)
+
+    def test_no_retry_permanent_failure(self):
+        server = self._start_server([(400, "bad request")])
+        client = DuckDNSClient(
+            TEST_DUCKDNS_TOKEN, base_url=server.url, retry_policy=_fast_retry_policy()
+        )
+
+        with self.subTest("client error"):
+            with self.assertRaises(TXTUpdateError):
+                client.set_txt_record(TEST_DOMAIN, "ABCDEF")
+            self.assertEqual(server.requests, 1)
+
+        with self.subTest("invalid domain"):
+            with self.assertRaises(NotValidDuckdnsDomainError):
+                client.set_txt_record("$invalid", "ABCDEF")
+            self.assertEqual(server.requests, 1)
+
+    def test_retry_deadline(self):
+        server = self._start_server([(503, "")] * 3)
+        client = DuckDNSClient(
+            TEST_DUCKDNS_TOKEN,
+            base_url=server.url,
+            retry_policy=_fast_retry_policy(deadline=0),
+        )
+
+        with self.assertRaises(TXTUpdateError):
+            client.clear_txt_record(TEST_DOMAIN)
+
+        self.assertEqual(server.requests, 1)
+
+    def test_retry_connection_error(self):
+        server = self._start_server([])
+        url = server.url
+        server.shutdown()
+        server.server_close()
+
+        client = DuckDNSClient(
+            TEST_DUCKDNS_TOKEN, base_url=url, retry_policy=_fast_retry_policy()
+        )
+
+        with mock.patch("time.sleep") as sleep:
+            with self.assertRaises(Exception):
+                client.clear_txt_record(TEST_DOMAIN)
+
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_delay(self):
+        policy = RetryPolicy(backoff=1, jitter=0)
+
+        self.assertEqual(policy.get_delay(1), 1)
+        self.assertEqual(policy.get_delay(3), 4)
+        self.assertEqual(policy.get_delay(1, retry_after=30), 30)
+
+    def test_invalid_attempts(self):
+        with self.assertRaises(ValueError):
+            RetryPolicy(attempts=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
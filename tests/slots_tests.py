@@ -0,0 +1,184 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from certbot.errors import PluginError
+
+from certbot_dns_duckdns.cert.client import Authenticator
+from certbot_dns_duckdns.cert.slots import FileLockSlotBackend, SlotLeaseError, SlotPool
+from certbot_dns_duckdns.emulator import DuckDNSEmulator
+from tests.cert_client import _achall, _config
+
+TEST_DUCKDNS_TOKEN = "1234567890abcdef"
+
+
+class SlotPoolTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self.lock_dir = os.path.join(self._tmp_dir.name, "slots")
+
+    def _pool(self, timeout=0.2):
+        backend = FileLockSlotBackend(self.lock_dir)
+        pool = SlotPool(["slot1", "slot2.duckdns.org"], backend, timeout)
+        self.addCleanup(pool.release)
+        return pool
+
+    def test_slots(self):
+        pool = self._pool()
+
+        self.assertEqual(pool.slots, {"slot1.duckdns.org", "slot2.duckdns.org"})
+        self.assertIn("slot1.duckdns.org", pool)
+        self.assertNotIn("other.duckdns.org", pool)
+
+    def test_invalid_slot(self):
+        for slot in ["sub.slot1.duckdns.org", "example.com", ""]:
+            with self.assertRaises(ValueError):
+                SlotPool([slot], FileLockSlotBackend(self.lock_dir))
+
+    def test_exclusive_lease(self):
+        first = self._pool()
+        second = self._pool()
+
+        first.lease(["slot1.duckdns.org"])
+        # the other slot of the pool is free
+        second.lease(["slot2.duckdns.org"])
+        with self.assertRaises(SlotLeaseError):
+            second.lease(["slot1.duckdns.org"])
+
+        first.release()
+        second.lease(["slot1.duckdns.org"])
+
+    def test_failed_lease_rolls_back(self):
+        first = self._pool()
+        second = self._pool()
+
+        first.lease(["slot2.duckdns.org"])
+        with self.assertRaises(SlotLeaseError):
+            second.lease(["slot1.duckdns.org", "slot2.duckdns.org"])
+
+        # slot1 was released again after slot2 could not be leased
+        first.lease(["slot1.duckdns.org"])
+
+    def test_lease_outside_pool(self):
+        with self.assertRaises(SlotLeaseError):
+            self._pool().lease(["other.duckdns.org"])
+
+
+class SlotPoolAuthenticatorTests(unittest.TestCase):
+    def setUp(self):
+        self.emulator = DuckDNSEmulator(
+            TEST_DUCKDNS_TOKEN,
+            ["slot1", "slot2", "other"],
+            delegations={
+                "_acme-challenge.one.example.com": "slot1.duckdns.org",
+                "_acme-challenge.two.example.com": "slot2.duckdns.org",
+                "_acme-challenge.three.example.com": "other.duckdns.org",
+            },
+        )
+        self.emulator.start()
+        self.addCleanup(self.emulator.stop)
+
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+
+    def _authenticator(self, work_dir):
+        return Authenticator(
+            _config(
+                duckdns_token=TEST_DUCKDNS_TOKEN,
+                duckdns_api_url=self.emulator.api_url,
+                duckdns_propagation_seconds=0,
+                duckdns_slot_pool="slot1,slot2",
+                duckdns_slot_lock_dir=os.path.join(self._tmp_dir.name, "slots"),
+                duckdns_slot_lease_timeout=0.2,
+                work_dir=os.path.join(self._tmp_dir.name, work_dir),
+            ),
+            name="duckdns",
+        )
+
+    @mock.patch("certbot.display.util.notify")
+    def test_parallel_runs(self, notify):
+        first_achalls = [_achall("one.example.com", "ABCDEF")]
+        second_achalls = [_achall("two.example.com", "GHIJKL")]
+
+        with self.emulator.default_resolver():
+            first = self._authenticator("first")
+            second = self._authenticator("second")
+
+            # runs delegating to different slots validate at the same time
+            first.perform(first_achalls)
+            second.perform(second_achalls)
+            self.assertEqual(self.emulator.get_txt_value("slot1"), "ABCDEF")
+            self.assertEqual(self.emulator.get_txt_value("slot2"), "GHIJKL")
+
+            # a run delegating to a leased slot does not overwrite its TXT record
+            third = self._authenticator("third")
+            with self.assertRaises(PluginError):
+                third.perform([_achall("one.example.com", "MNOPQR")])
+            self.assertEqual(self.emulator.get_txt_value("slot1"), "ABCDEF")
+
+            first.cleanup(first_achalls)
+            second.cleanup(second_achalls)
+
+            third = self._authenticator("third")
+            third.perform([_achall("one.example.com", "MNOPQR")])
+            self.assertEqual(self.emulator.get_txt_value("slot1"), "MNOPQR")
+
+    @mock.patch("certbot.display.util.notify")
+    def test_delegation_outside_pool(self, notify):
+        with self.emulator.default_resolver():
+            with self.assertRaises(PluginError):
+                self._authenticator("first").perform(
+                    [_achall("three.example.com", "ABCDEF")]
+                )
+
+        self.assertEqual(self.emulator.get_txt_value("other"), "")
+
+    @mock.patch("certbot.display.util.notify")
+    def test_leases_released_on_errors(self, notify):
+        achalls = [_achall("one.example.com", "ABCDEF")]
+
+        with self.emulator.default_resolver():
+            first = self._authenticator("first")
+            with (
+                mock.patch.object(
+                    first, "_recover_pending", side_effect=PluginError("failed")
+                ),
+                self.assertRaises(PluginError),
+            ):
+                first.perform(achalls)
+
+            # the slot of the failed perform is free for the next run of the process
+            second = self._authenticator("second")
+            second.perform(achalls)
+            with (
+                mock.patch.object(
+                    second, "_group_restores", side_effect=PluginError("failed")
+                ),
+                self.assertRaises(PluginError),
+            ):
+                second.cleanup(achalls)
+
+            # the slot of the failed cleanup is free as well
+            third = self._authenticator("third")
+            third.perform([_achall("one.example.com", "GHIJKL")])
+            self.assertEqual(self.emulator.get_txt_value("slot1"), "GHIJKL")
+
+    def test_missing_lock_dir(self):
+        # leases in the locked work directory would not exclude other certbot processes
+        authenticator = Authenticator(
+            _config(
+                duckdns_token=TEST_DUCKDNS_TOKEN,
+                duckdns_slot_pool="slot1,slot2",
+                work_dir=self._tmp_dir.name,
+            ),
+            name="duckdns",
+        )
+
+        with self.assertRaises(PluginError):
+            authenticator._get_slot_pool()
+
+
+if __name__ == "__main__":
+    unittest.main()
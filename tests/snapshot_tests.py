@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+from certbot_dns_duckdns.cert.snapshot import TXTSnapshotStore
+
+
+class TXTSnapshotStoreTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp_dir.name, "duckdns", "txt-snapshots.json")
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_record(self):
+        store = TXTSnapshotStore(self.path)
+        store.record("one.duckdns.org", "original")
+        store.record("two.duckdns.org", "")
+
+        store = TXTSnapshotStore(self.path)
+        self.assertEqual(store.get("one.duckdns.org"), "original")
+        self.assertEqual(store.get("two.duckdns.org"), "")
+        self.assertIsNone(store.get("three.duckdns.org"))
+        self.assertIn("two.duckdns.org", store)
+
+    def test_record_keeps_existing_snapshot(self):
+        store = TXTSnapshotStore(self.path)
+        store.record("one.duckdns.org", "original")
+        store.record("one.duckdns.org", "challenge")
+
+        self.assertEqual(TXTSnapshotStore(self.path).get("one.duckdns.org"), "original")
+
+    def test_discard(self):
+        store = TXTSnapshotStore(self.path)
+        store.record("one.duckdns.org", "original")
+        store.record("two.duckdns.org", "")
+
+        store.discard(["one.duckdns.org", "three.duckdns.org"])
+
+        self.assertEqual(TXTSnapshotStore(self.path).items(), [("two.duckdns.org", "")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import responses
+from certbot.errors import PluginError
+
+from certbot_dns_duckdns.cert.client import Authenticator
+from certbot_dns_duckdns.cert.tokens import TokenRouter
+from tests.cert_client import _achall, _config
+
+
+class TokenRouterTests(unittest.TestCase):
+    def test_get_token(self):
+        router = TokenRouter(
+            {
+                "example": "token-a",
+                "team-*.duckdns.org": "token-b",
+                "team-special": "token-c",
+                "*": "token-d",
+            },
+            default="default-token",
+        )
+
+        self.assertEqual(router.get_token("example.duckdns.org"), "token-a")
+        self.assertEqual(router.get_token("EXAMPLE"), "token-a")
+        self.assertEqual(router.get_token("team-one.duckdns.org"), "token-b")
+        # exact domains take precedence over the patterns
+        self.assertEqual(router.get_token("team-special.duckdns.org"), "token-c")
+        self.assertEqual(router.get_token("other.duckdns.org"), "token-d")
+
+    def test_default_token(self):
+        router = TokenRouter({"example": "token-a"}, default="default-token")
+
+        self.assertEqual(router.get_token("other.duckdns.org"), "default-token")
+        self.assertIsNone(TokenRouter({"example": "token-a"}).get_token("other"))
+
+    def test_missing_token(self):
+        with self.assertRaises(ValueError):
+            TokenRouter({"example": " "})
+
+
+class MultiTokenAuthenticatorTests(unittest.TestCase):
+    def _write_credentials(self, content):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        path = os.path.join(tmp_dir.name, "duckdns.ini")
+        with open(path, "w") as f:
+            f.write(content)
+        os.chmod(path, 0o600)
+        return path
+
+    @responses.activate
+    @mock.patch("certbot.display.util.notify")
+    def test_perform_with_multiple_tokens(self, notify):
+        credentials = self._write_credentials(
+            "duckdns_token = default-token\n"
+            "[duckdns_tokens]\n"
+            "first = first-token\n"
+            "team-* = team-token\n"
+        )
+        responses.get(url="https://www.duckdns.org/update", body="OK")
+        achalls = [
+            _achall("first.duckdns.org", "A"),
+            _achall("team-one.duckdns.org", "B"),
+            _achall("other.duckdns.org", "C"),
+        ]
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            authenticator = Authenticator(
+                _config(
+                    duckdns_token=None,
+                    duckdns_credentials=credentials,
+                    duckdns_propagation_seconds=0,
+                    work_dir=work_dir,
+                ),
+                name="duckdns",
+            )
+            authenticator.perform(achalls)
+
+            tokens = {}
+            for call in responses.calls:
+                params = parse_qs(urlparse(call.request.url).query)
+                tokens[params["domains"][0]] = params["token"][0]
+            self.assertEqual(
+                tokens,
+                {
+                    "first.duckdns.org": "first-token",
+                    "team-one.duckdns.org": "team-token",
+                    "other.duckdns.org": "default-token",
+                },
+            )
+            self.assertIsNot(
+                authenticator._get_duckdns_client("first.duckdns.org"),
+                authenticator._get_duckdns_client("team-one.duckdns.org"),
+            )
+
+            authenticator.cleanup(achalls)
+
+        # every TXT record is cleared with the token of its domain
+        cleared = {}
+        for call in responses.calls[3:]:
+            params = parse_qs(urlparse(call.request.url).query)
+            cleared[params["domains"][0]] = params["token"][0]
+        self.assertEqual(cleared, tokens)
+
+    @responses.activate
+    def test_domain_without_token(self):
+        credentials = self._write_credentials("[duckdns_tokens]\nfirst = first-token\n")
+
+        authenticator = Authenticator(
+            _config(duckdns_token=None, duckdns_credentials=credentials),
+            name="duckdns",
+        )
+
+        # no TXT record is changed if any domain has no token
+        with self.assertRaises(PluginError):
+            authenticator.perform(
+                [_achall("first.duckdns.org", "A"), _achall("other.duckdns.org", "B")]
+            )
+        self.assertEqual(len(responses.calls), 0)
+
+    def test_invalid_credentials(self):
+        for content in (
+            "",
+            "duckdns_tokens = token\n",
+            "[duckdns_tokens]\nfirst =\n",
+        ):
+            with self.subTest(content=content):
+                authenticator = Authenticator(
+                    _config(
+                        duckdns_token=None,
+                        duckdns_credentials=self._write_credentials(content),
+                    ),
+                    name="duckdns",
+                )
+
+                with self.assertRaises(PluginError):
+                    authenticator._setup_credentials()
+
+
+if __name__ == "__main__":
+    unittest.main()